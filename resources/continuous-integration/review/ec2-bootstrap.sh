@@ -14,6 +14,11 @@ docker run --name concrexit_migrate \
   --mount source=concrexit_data,target=/usr/src/app/website/ \
   thalia/concrexit:@version@ migrate
 
+docker run --name concrexit_createcachetable \
+  --rm \
+  --mount source=concrexit_data,target=/usr/src/app/website/ \
+  thalia/concrexit:@version@ createcachetable
+
 docker run --name concrexit_superuser \
   --rm \
   --mount source=concrexit_data,target=/usr/src/app/website/ \
@@ -14,6 +14,7 @@ cd /usr/src/app/website/
 
 ./manage.py collectstatic --no-input
 ./manage.py migrate --no-input
+./manage.py createcachetable
 ./manage.py compress --force
 
 >&2 echo "Running site with uwsgi"
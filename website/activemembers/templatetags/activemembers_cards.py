@@ -25,8 +25,8 @@ def membergroup_card(group, language):
     )
 
 
-@register.inclusion_tag("includes/grid_item.html")
-def membergroup_member_card(membership):
+@register.inclusion_tag("includes/grid_item.html", takes_context=True)
+def membergroup_member_card(context, membership):
     meta_text = ""
 
     if "role" in membership and membership["role"]:
@@ -46,4 +46,6 @@ def membergroup_member_card(membership):
         until_text = f"{_('until')} {membership['until']}"
         meta_text += f'<p class="px-1"><em>{until_text}</em></p>'
 
-    return member_card(member=membership["member"], meta_text=meta_text, ribbon=ribbon)
+    return member_card(
+        context, member=membership["member"], meta_text=meta_text, ribbon=ribbon
+    )
@@ -9,7 +9,6 @@ from django.utils import timezone
 from django.utils.text import slugify
 from django.utils.translation import get_language
 from django.views.generic import TemplateView, DetailView
-from django_sendfile import sendfile
 
 from documents.models import (
     AnnualDocument,
@@ -18,6 +17,7 @@ from documents.models import (
     Document,
 )
 from utils.snippets import datetime_to_lectureyear
+from utils.media.sendfile import sendfile
 
 
 class DocumentsIndexView(TemplateView):
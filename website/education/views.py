@@ -12,9 +12,9 @@ from django.utils import timezone
 from django.utils.decorators import method_decorator
 from django.utils.translation import gettext_lazy as _, get_language
 from django.views.generic import ListView, DetailView, CreateView, TemplateView
-from django_sendfile import sendfile
 
 from members.decorators import membership_required
+from utils.media.sendfile import sendfile
 from .forms import AddExamForm, AddSummaryForm
 from .models import Category, Course, Exam, Summary
 
@@ -80,6 +80,16 @@ class LectureYearFilter(admin.SimpleListFilter):
         return queryset.filter(start__gte=year_start, end__lte=year_end)
 
 
+def _get_member_groups(request):
+    """
+    :return: the member groups of the member of a request, none if the
+             user is not a member
+    """
+    if not request.member:
+        return MemberGroup.objects.none()
+    return request.member.get_member_groups()
+
+
 @admin.register(models.Event)
 class EventAdmin(DoNextTranslatedModelAdmin):
     """Manage the events"""
@@ -150,7 +160,7 @@ class EventAdmin(DoNextTranslatedModelAdmin):
 
     def has_change_permission(self, request, event=None):
         """Only allow access to the change form if the user is an organiser"""
-        if event is not None and not services.is_organiser(request.member, event):
+        if event is not None and not services.is_request_organiser(request, event):
             return False
         return super().has_change_permission(request, event)
 
@@ -203,7 +213,7 @@ class EventAdmin(DoNextTranslatedModelAdmin):
     @staticmethod
     def _change_published(request, queryset, published):
         if not request.user.is_superuser:
-            queryset = queryset.filter(organiser__in=request.member.get_member_groups())
+            queryset = queryset.filter(organiser__in=_get_member_groups(request))
         queryset.update(published=published)
 
     def save_formset(self, request, form, formset, change):
@@ -245,7 +255,7 @@ class EventAdmin(DoNextTranslatedModelAdmin):
                 request.user.is_superuser
                 or request.user.has_perm("events.override_organiser")
             ):
-                kwargs["queryset"] = request.member.get_member_groups()
+                kwargs["queryset"] = _get_member_groups(request)
             else:
                 # Hide old boards and inactive committees for new events
                 if "add" in request.path:
@@ -309,30 +319,30 @@ class RegistrationAdmin(DoNextTranslatedModelAdmin):
     form = RegistrationAdminForm
 
     def save_model(self, request, registration, form, change):
-        if not services.is_organiser(request.member, registration.event):
+        if not services.is_request_organiser(request, registration.event):
             raise PermissionDenied
         return super().save_model(request, registration, form, change)
 
     def has_view_permission(self, request, registration=None):
         """Only give view permission if the user is an organiser"""
-        if registration is not None and not services.is_organiser(
-            request.member, registration.event
+        if registration is not None and not services.is_request_organiser(
+            request, registration.event
         ):
             return False
         return super().has_view_permission(request, registration)
 
     def has_change_permission(self, request, registration=None):
         """Only give change permission if the user is an organiser"""
-        if registration is not None and not services.is_organiser(
-            request.member, registration.event
+        if registration is not None and not services.is_request_organiser(
+            request, registration.event
         ):
             return False
         return super().has_change_permission(request, registration)
 
     def has_delete_permission(self, request, registration=None):
         """Only give delete permission if the user is an organiser"""
-        if registration is not None and not services.is_organiser(
-            request.member, registration.event
+        if registration is not None and not services.is_request_organiser(
+            request, registration.event
         ):
             return False
         return super().has_delete_permission(request, registration)
@@ -365,7 +375,7 @@ class RegistrationAdmin(DoNextTranslatedModelAdmin):
                 or request.user.has_perm("events.override_organiser")
             ):
                 kwargs["queryset"] = kwargs["queryset"].filter(
-                    organiser__in=request.member.get_member_groups()
+                    organiser__in=_get_member_groups(request)
                 )
         elif db_field.name == "member":
             # Filter the queryset to current members only
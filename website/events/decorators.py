@@ -35,7 +35,7 @@ class OrganiserOnly(object):
             except Event.DoesNotExist:
                 pass
 
-        if event and services.is_organiser(request.member, event):
+        if event and services.is_request_organiser(request, event):
             return self.view_function(request, *args, **kwargs)
 
         raise PermissionDenied
@@ -1,5 +1,6 @@
 from collections import OrderedDict
 
+from django.db.models import Count, Q
 from django.utils import timezone
 from django.utils.datetime_safe import date
 from django.utils.translation import gettext_lazy as _, get_language
@@ -10,6 +11,7 @@ from events.models import EventRegistration, RegistrationInformationField, Event
 from payments.models import Payment
 from payments.services import create_payment, delete_payment
 from utils.snippets import datetime_to_lectureyear
+from utils.statistics import cached_statistics
 
 
 def is_user_registered(member, event):
@@ -81,6 +83,22 @@ def is_organiser(member, event):
     return False
 
 
+def is_request_organiser(request, event):
+    """
+    Check if the user of a request may manage an event, users that are not
+    a member, like staff accounts without a profile, only if they may
+    override the organiser
+    :param request: the request
+    :param event: the event
+    :return: True if the user may manage the event
+    """
+    if not request.member:
+        return request.user.is_superuser or request.user.has_perm(
+            "events.override_organiser"
+        )
+    return is_organiser(request.member, event)
+
+
 def create_registration(member, event):
     """
     Creates a new user registration for an event
@@ -307,22 +325,44 @@ def update_registration_by_organiser(registration, member, data):
     registration.save()
 
 
-def generate_category_statistics():
+@cached_statistics("event_categories")
+def _count_category_events():
     """
-    Generate statistics about events, number of events per category
-    :return: Dict with key, value resp. being category, event count.
+    Count the events per category in each of the last five lecture years
+    :return: dict of the lecture years to dicts of category keys to counts
     """
     year = datetime_to_lectureyear(timezone.now())
 
-    data = {}
+    counts = {}
     for i in range(5):
         year_start = date(year=year - i, month=9, day=1)
         year_end = date(year=year - i + 1, month=9, day=1)
-        data[str(year - i)] = {
-            str(display): Event.objects.filter(
-                category=key, start__gte=year_start, end__lte=year_end
-            ).count()
-            for key, display in Event.EVENT_CATEGORIES
+        counts[f"year_{i}"] = Count(
+            "pk", filter=Q(start__gte=year_start, end__lte=year_end)
+        )
+    rows = {
+        row["category"]: row
+        for row in Event.objects.filter(start__gte=date(year=year - 4, month=9, day=1))
+        .values("category")
+        .annotate(**counts)
+        .order_by()
+    }
+
+    return {
+        str(year - i): {
+            key: rows[key][f"year_{i}"] if key in rows else 0
+            for key, _ in Event.EVENT_CATEGORIES
         }
+        for i in range(5)
+    }
 
-    return data
+
+def generate_category_statistics():
+    """
+    Generate statistics about events, number of events per category
+    :return: Dict with key, value resp. being category, event count.
+    """
+    return {
+        year: {str(display): counts[key] for key, display in Event.EVENT_CATEGORIES}
+        for year, counts in _count_category_events().items()
+    }
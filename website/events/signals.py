@@ -0,0 +1,13 @@
+"""The signals checked by the events package"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from utils.statistics import clear_statistics
+
+
+# This receiver keeps a cache correct, so it is never suspended
+@receiver(post_save, sender="events.Event", dispatch_uid="events_event_save")
+@receiver(post_delete, sender="events.Event", dispatch_uid="events_event_delete")
+def clear_event_statistics_cache(sender, instance, **kwargs):
+    """Remove the cached statistics of the event categories"""
+    clear_statistics("event_categories")
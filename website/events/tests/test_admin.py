@@ -2,6 +2,7 @@ import datetime
 from unittest import mock
 
 from django.contrib.admin import AdminSite
+from django.contrib.auth.models import User
 from django.core.exceptions import DisallowedRedirect
 from django.http import HttpResponseRedirect
 from django.test import TestCase, RequestFactory, override_settings
@@ -205,6 +206,27 @@ class EventAdminTest(TestCase):
         res = self.admin.has_change_permission(request, self.event)
         self.assertEqual(res, False)
 
+    @mock.patch("utils.admin.DoNextTranslatedModelAdmin.has_change_permission")
+    def test_has_change_permission_not_a_member(self, permission_mock):
+        permission_mock.return_value = True
+
+        request = self.rf.get("/admin/events/event/1/change/")
+        request.member = None
+        request.user = User.objects.create(username="admin", is_superuser=True)
+        self.assertTrue(self.admin.has_change_permission(request, self.event))
+
+        request.user = User.objects.create(username="staff", is_staff=True)
+        self.assertFalse(self.admin.has_change_permission(request, self.event))
+
+    def test_change_published_not_a_member(self):
+        request = self.rf.post("/admin/events/event/")
+        request.member = None
+        request.user = User.objects.create(username="staff", is_staff=True)
+        self.admin.make_unpublished(request, Event.objects.all())
+
+        self.event.refresh_from_db()
+        self.assertTrue(self.event.published)
+
     @override_settings(LANGUAGE_CODE="en")
     def test_event_date(self):
         self.assertEqual(self.admin.event_date(self.event), "Sunday 01 jan 2017, 2:00")
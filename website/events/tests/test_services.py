@@ -4,7 +4,7 @@ from unittest import mock
 from django.contrib.auth.models import AnonymousUser, Permission
 from django.http import HttpRequest
 from django.test import TestCase, override_settings
-from django.utils import timezone
+from django.utils import timezone, translation
 from freezegun import freeze_time
 
 from activemembers.models import Committee, MemberGroupMembership
@@ -12,6 +12,7 @@ from events import services
 from events.exceptions import RegistrationError
 from events.models import Event, EventRegistration, RegistrationInformationField
 from members.models import Member
+from utils.statistics import clear_statistics
 
 
 @freeze_time("2017-01-01")
@@ -517,3 +518,28 @@ class ServicesTest(TestCase):
             # Test that the ordering is correct
             labels = [field["label"] for field in fields.values()]
             self.assertEqual(labels, sorted(labels))
+
+    # Cache locally to count only the queries that compute the statistics
+    @override_settings(STATISTICS_CACHE="default")
+    def test_generate_category_statistics(self):
+        clear_statistics("event_categories")
+        Event.objects.filter(pk=self.event.pk).update(category=Event.CATEGORY_LEISURE)
+        with self.assertNumQueries(1):
+            data = services.generate_category_statistics()
+            services.generate_category_statistics()
+        self.assertEqual(list(data), ["2016", "2015", "2014", "2013", "2012"])
+        self.assertEqual(data["2016"]["Leisure"], 1)
+        self.assertEqual(sum(sum(year.values()) for year in data.values()), 1)
+
+        # The cached statistics are shown in the language of the request
+        with translation.override("nl"), self.assertNumQueries(0):
+            data = services.generate_category_statistics()
+        self.assertEqual(data["2016"]["Vrije tijd"], 1)
+
+        # Changing an event clears the cache
+        self.event.refresh_from_db()
+        self.event.category = Event.CATEGORY_CAREER
+        self.event.save()
+        data = services.generate_category_statistics()
+        self.assertEqual(data["2016"]["Leisure"], 0)
+        self.assertEqual(data["2016"]["Career"], 1)
@@ -0,0 +1,11 @@
+from rest_framework import filters
+
+from members import services
+
+
+class MemberSearchFilter(filters.SearchFilter):
+    """Searches members with the search index of the members"""
+
+    def filter_queryset(self, request, queryset, view):
+        query = " ".join(self.get_search_terms(request))
+        return services.search_members(queryset, query)
@@ -1,4 +1,6 @@
 """DRF serializers defined by the members package"""
+from collections import namedtuple
+
 from django.templatetags.static import static
 from django.urls import reverse
 from rest_framework import serializers
@@ -9,14 +11,21 @@ from members.services import member_achievements, member_societies
 from thaliawebsite.api.services import create_image_thumbnail_dict
 
 
+# A birthday of a member on a specific date
+MemberBirthday = namedtuple("MemberBirthday", ["member", "birthday"])
+
+
 class MemberBirthdaySerializer(CalenderJSSerializer):
-    """Serializer that renders the member birthdays to the CalendarJS format"""
+    """
+    Serializer that renders the member birthdays to the CalendarJS format
+    Renders instances of :class:`MemberBirthday`
+    """
 
     class Meta(CalenderJSSerializer.Meta):
         model = Member
 
     def _start(self, instance):
-        return instance.profile.birthday
+        return instance.birthday
 
     def _end(self, instance):
         pass
@@ -28,20 +37,20 @@ class MemberBirthdaySerializer(CalenderJSSerializer):
         return True
 
     def _url(self, instance):
-        return reverse("members:profile", kwargs={"pk": instance.pk})
+        return reverse("members:profile", kwargs={"pk": instance.member.pk})
 
     def _title(self, instance):
-        return instance.profile.display_name()
+        return instance.member.profile.display_name()
 
     def _description(self, instance):
-        membership = instance.current_membership
+        membership = instance.member.current_membership
         if membership and membership.type == "honorary":
             return membership.get_type_display()
         return ""
 
     def _class_names(self, instance):
         class_names = ["birthday-event"]
-        membership = instance.current_membership
+        membership = instance.member.current_membership
         if membership and membership.type == "honorary":
             class_names.append("honorary")
         return class_names
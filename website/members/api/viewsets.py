@@ -1,12 +1,14 @@
 """DRF viewsets defined by the members package"""
-import copy
+from calendar import isleap
 
 from rest_framework import permissions
 from rest_framework import viewsets, filters, mixins
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
+from members.api.filters import MemberSearchFilter
 from members.api.serializers import (
+    MemberBirthday,
     MemberBirthdaySerializer,
     MemberListSerializer,
     ProfileRetrieveSerializer,
@@ -20,12 +22,12 @@ class MemberViewset(viewsets.ReadOnlyModelViewSet, mixins.UpdateModelMixin):
     """Viewset that renders or edits a member"""
 
     queryset = Member.objects.all()
+    # The search ranks the results, so an explicit ordering is applied after
     filter_backends = (
+        MemberSearchFilter,
         filters.OrderingFilter,
-        filters.SearchFilter,
     )
     ordering_fields = ("profile__starting_year", "first_name", "last_name")
-    search_fields = ("profile__nickname", "first_name", "last_name", "username")
     lookup_field = "pk"
 
     def get_serializer_class(self):
@@ -69,33 +71,34 @@ class MemberViewset(viewsets.ReadOnlyModelViewSet, mixins.UpdateModelMixin):
 
     def _get_birthdays(self, member, start, end):
         birthdays = []
+        birthday = member.profile.birthday
 
-        start_year = max(start.year, member.profile.birthday.year)
+        start_year = max(start.year, birthday.year)
         for year in range(start_year, end.year + 1):
-            bday = copy.deepcopy(member)
-            try:
-                bday.profile.birthday = bday.profile.birthday.replace(year=year)
-            except ValueError as e:
-                if bday.profile.birthday.month == 2 and bday.profile.birthday.day == 29:
-                    bday.profile.birthday = bday.profile.birthday.replace(
-                        year=year, day=28
-                    )
-                else:
-                    raise e
-            if start.date() <= bday.profile.birthday <= end.date():
-                birthdays.append(bday)
+            if birthday.month == 2 and birthday.day == 29 and not isleap(year):
+                date = birthday.replace(year=year, day=28)
+            else:
+                date = birthday.replace(year=year)
+            if start.date() <= date <= end.date():
+                birthdays.append(MemberBirthday(member, date))
         return birthdays
 
     @action(detail=False)
     def birthdays(self, request):
         start, end = extract_date_range(request)
 
-        queryset = Member.current_members.with_birthdays_in_range(start, end).filter(
-            profile__show_birthday=True
+        queryset = (
+            Member.current_members.with_birthdays_in_range(start, end)
+            .filter(profile__show_birthday=True)
+            .select_related("profile")
+            .prefetch_related("membership_set")
         )
 
-        all_birthdays = [self._get_birthdays(m, start, end) for m in queryset.all()]
-        birthdays = [x for sublist in all_birthdays for x in sublist]
+        birthdays = [
+            birthday
+            for member in queryset
+            for birthday in self._get_birthdays(member, start, end)
+        ]
 
         serializer = MemberBirthdaySerializer(birthdays, many=True)
         return Response(serializer.data)
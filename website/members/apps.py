@@ -6,3 +6,7 @@ from django.utils.translation import gettext_lazy as _
 class MembersConfig(AppConfig):
     name = "members"
     verbose_name = _("Members")
+
+    def ready(self):
+        """Imports the signals when the app is ready"""
+        from . import signals
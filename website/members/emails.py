@@ -3,20 +3,44 @@ from datetime import timedelta
 import logging
 
 from django.conf import settings
-from django.core.mail import EmailMultiAlternatives
 from django.template.loader import get_template
 from django.core import mail
 from django.template import loader
 from django.template.defaultfilters import floatformat
 from django.urls import reverse
 from django.utils import timezone, translation
+from django.utils.functional import Promise
 from django.utils.translation import gettext as _
 
+from members.mailing import send_mailing
 from members.models import Member, Membership
+from utils.snippets import datetime_to_lectureyear
 
 logger = logging.getLogger(__name__)
 
 
+def _get_mailing_name(name):
+    """
+    Get the name of the mailing of the current lecture year, so an interrupted
+    mailing is only resumed in the lecture year that it was started in
+    :param name: the name of the kind of mailing
+    :return: the name of the mailing
+    """
+    return f"{name}_{datetime_to_lectureyear(timezone.now())}"
+
+
+def _get_membership_announcement_context(member):
+    return {"name": member.get_full_name()}
+
+
+def _render_membership_announcement(context):
+    return (
+        "[THALIA] {}".format(_("Membership announcement")),
+        loader.render_to_string("members/email/membership_announcement.txt", context),
+        None,
+    )
+
+
 def send_membership_announcement(dry_run=False):
     """
     Sends an email to all members with a never ending membership
@@ -32,33 +56,58 @@ def send_membership_announcement(dry_run=False):
         .distinct()
     )
 
-    with mail.get_connection() as connection:
-        for member in members:
-            logger.info("Sent email to %s (%s)", member.get_full_name(), member.email)
-            if not dry_run:
-                with translation.override(member.profile.language):
-                    email_body = loader.render_to_string(
-                        "members/email/membership_announcement.txt",
-                        {"name": member.get_full_name()},
-                    )
-                    mail.EmailMessage(
-                        "[THALIA] {}".format(_("Membership announcement")),
-                        email_body,
-                        settings.DEFAULT_FROM_EMAIL,
-                        [member.email],
-                        bcc=[settings.BOARD_NOTIFICATION_ADDRESS],
-                        connection=connection,
-                    ).send()
-
-        if not dry_run:
-            mail.mail_managers(
-                _("Membership announcement sent"),
-                loader.render_to_string(
-                    "members/email/membership_announcement_notification.txt",
-                    {"members": members},
-                ),
-                connection=connection,
-            )
+    mailing = send_mailing(
+        _get_mailing_name("membership_announcement"),
+        members,
+        _get_membership_announcement_context,
+        _render_membership_announcement,
+        bcc=[settings.BOARD_NOTIFICATION_ADDRESS],
+        dry_run=dry_run,
+    )
+
+    if not dry_run:
+        mail.mail_managers(
+            _("Membership announcement sent"),
+            loader.render_to_string(
+                "members/email/membership_announcement_notification.txt",
+                {"members": _get_recipients(mailing)},
+            ),
+        )
+
+
+def _get_information_request_context(member):
+    email_context = {
+        k: x if x else ""
+        for k, x in {
+            "name": member.first_name,
+            "username": member.username,
+            "full_name": member.get_full_name(),
+            "address_street": member.profile.address_street,
+            "address_street2": member.profile.address_street2,
+            "address_postal_code": member.profile.address_postal_code,
+            "address_city": member.profile.address_city,
+            "address_country": member.profile.get_address_country_display(),
+            "phone_number": member.profile.phone_number,
+            "birthday": member.profile.birthday,
+            "email": member.email,
+            "student_number": member.profile.student_number,
+            "starting_year": member.profile.starting_year,
+            "programme": member.profile.get_programme_display(),
+        }.items()
+    }
+    email_context["lang_code"] = member.profile.language
+    # Lazy translations are translated now, in the language of the member
+    return {
+        k: str(x) if isinstance(x, Promise) else x for k, x in email_context.items()
+    }
+
+
+def _render_information_request(context):
+    return (
+        "[THALIA] " + _("Membership information check"),
+        get_template("members/email/information_check.txt").render(context),
+        get_template("members/email/information_check.html").render(context),
+    )
 
 
 def send_information_request(dry_run=False):
@@ -69,55 +118,38 @@ def send_information_request(dry_run=False):
     """
     members = Member.current_members.all().exclude(email="")
 
-    with mail.get_connection() as connection:
-        for member in members:
-            logger.info("Sent email to %s (%s)", member.get_full_name(), member.email)
-            if not dry_run:
-                with translation.override(member.profile.language):
-                    email_context = {
-                        k: x if x else ""
-                        for k, x in {
-                            "name": member.first_name,
-                            "username": member.username,
-                            "full_name": member.get_full_name(),
-                            "address_street": member.profile.address_street,
-                            "address_street2": member.profile.address_street2,
-                            "address_postal_code": member.profile.address_postal_code,
-                            "address_city": member.profile.address_city,
-                            "address_country": member.profile.get_address_country_display(),
-                            "phone_number": member.profile.phone_number,
-                            "birthday": member.profile.birthday,
-                            "email": member.email,
-                            "student_number": member.profile.student_number,
-                            "starting_year": member.profile.starting_year,
-                            "programme": member.profile.get_programme_display(),
-                        }.items()
-                    }
-                    email_context["lang_code"] = member.profile.language
-                    html_template = get_template("members/email/information_check.html")
-                    text_template = get_template("members/email/information_check.txt")
-                    subject = "[THALIA] " + _("Membership information check")
-                    html_message = html_template.render(email_context)
-                    text_message = text_template.render(email_context)
-
-                    msg = EmailMultiAlternatives(
-                        subject,
-                        text_message,
-                        settings.DEFAULT_FROM_EMAIL,
-                        [member.email],
-                    )
-                    msg.attach_alternative(html_message, "text/html")
-                    msg.send()
-
-        if not dry_run:
-            mail.mail_managers(
-                _("Membership information check sent"),
-                loader.render_to_string(
-                    "members/email/information_check_notification.txt",
-                    {"members": members},
-                ),
-                connection=connection,
-            )
+    mailing = send_mailing(
+        _get_mailing_name("information_request"),
+        members,
+        _get_information_request_context,
+        _render_information_request,
+        dry_run=dry_run,
+    )
+
+    if not dry_run:
+        mail.mail_managers(
+            _("Membership information check sent"),
+            loader.render_to_string(
+                "members/email/information_check_notification.txt",
+                {"members": _get_recipients(mailing)},
+            ),
+        )
+
+
+def _get_expiration_announcement_context(member):
+    return {
+        "name": member.get_full_name(),
+        "membership_price": floatformat(settings.MEMBERSHIP_PRICES["year"], 2),
+        "renewal_url": "{}{}".format(settings.BASE_URL, reverse("registrations:renew")),
+    }
+
+
+def _render_expiration_announcement(context):
+    return (
+        "[THALIA] {}".format(_("Membership expiration announcement")),
+        loader.render_to_string("members/email/expiration_announcement.txt", context),
+        None,
+    )
 
 
 def send_expiration_announcement(dry_run=False):
@@ -135,41 +167,32 @@ def send_expiration_announcement(dry_run=False):
         .distinct()
     )
 
-    with mail.get_connection() as connection:
-        for member in members:
-            logger.info("Sent email to %s (%s)", member.get_full_name(), member.email)
-            if not dry_run:
-                with translation.override(member.profile.language):
-                    email_body = loader.render_to_string(
-                        "members/email/expiration_announcement.txt",
-                        {
-                            "name": member.get_full_name(),
-                            "membership_price": floatformat(
-                                settings.MEMBERSHIP_PRICES["year"], 2
-                            ),
-                            "renewal_url": "{}{}".format(
-                                settings.BASE_URL, reverse("registrations:renew")
-                            ),
-                        },
-                    )
-                    mail.EmailMessage(
-                        "[THALIA] {}".format(_("Membership expiration announcement")),
-                        email_body,
-                        settings.DEFAULT_FROM_EMAIL,
-                        [member.email],
-                        bcc=[settings.BOARD_NOTIFICATION_ADDRESS],
-                        connection=connection,
-                    ).send()
-
-        if not dry_run:
-            mail.mail_managers(
-                _("Membership expiration announcement sent"),
-                loader.render_to_string(
-                    "members/email/expiration_announcement_notification.txt",
-                    {"members": members},
-                ),
-                connection=connection,
-            )
+    mailing = send_mailing(
+        _get_mailing_name("expiration_announcement"),
+        members,
+        _get_expiration_announcement_context,
+        _render_expiration_announcement,
+        bcc=[settings.BOARD_NOTIFICATION_ADDRESS],
+        dry_run=dry_run,
+    )
+
+    if not dry_run:
+        mail.mail_managers(
+            _("Membership expiration announcement sent"),
+            loader.render_to_string(
+                "members/email/expiration_announcement_notification.txt",
+                {"members": _get_recipients(mailing)},
+            ),
+        )
+
+
+def _get_recipients(mailing):
+    """
+    :return: the members that received the email of a mailing
+    """
+    return Member.objects.filter(
+        mailingdelivery__mailing=mailing, mailingdelivery__sent_at__isnull=False
+    ).order_by("mailingdelivery__pk")
 
 
 def send_welcome_message(user, password, language):
@@ -0,0 +1,221 @@
+"""
+Send an email to many members at once
+
+A mailing first records every recipient in a delivery journal, the
+:class:`members.models.MailingDelivery` objects of a
+:class:`members.models.Mailing`. The emails are then rendered in a pool of
+worker processes and sent in batches that are spread over a few connections
+to the mail server. After every batch the journal records which members
+received the email. If a run is interrupted, the next run of a mailing with
+the same name resumes it and only sends the email to the members that did
+not receive it yet, at most the emails of the interrupted batch are sent
+twice. The name of a mailing therefore identifies its run, like the lecture
+year of a yearly mailing, so a later run does not resume a stale mailing.
+
+To try a mailing without sending real emails, start a local SMTP server
+that prints the emails, like ``python -m smtpd -n -c DebuggingServer
+localhost:1025``, and use the SMTP email backend with `EMAIL_HOST` localhost
+and `EMAIL_PORT` 1025.
+"""
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import ExitStack
+from smtplib import SMTPRecipientsRefused
+
+from django.conf import settings
+from django.core import mail
+from django.db import transaction
+from django.utils import timezone, translation
+
+from members.models import Mailing, MailingDelivery
+
+logger = logging.getLogger(__name__)
+
+
+def _render_email(render, language, context):
+    """
+    Render an email in the language of its recipient, in a worker process
+    :return: the result of `render`
+    """
+    with translation.override(language):
+        return render(context)
+
+
+def _send_emails(connection, emails):
+    """
+    Send emails over a connection until the connection fails
+    :return: tuple of a list with for every email that was handled an error
+             message or None if it was sent, and the exception that stopped
+             sending the remaining emails or None
+    """
+    results = []
+    for email in emails:
+        try:
+            connection.send_messages([email])
+        except SMTPRecipientsRefused as e:
+            results.append(str(e))
+        except Exception as e:
+            return results, e
+        else:
+            results.append(None)
+    return results, None
+
+
+def _get_mailing(name, members):
+    """
+    Get the unfinished mailing with a name or create it
+    :return: the mailing
+    """
+    mailing = Mailing.objects.filter(name=name, finished_at=None).first()
+    if mailing is None:
+        with transaction.atomic():
+            mailing = Mailing.objects.create(name=name)
+            MailingDelivery.objects.bulk_create(
+                [MailingDelivery(mailing=mailing, member=member) for member in members]
+            )
+    return mailing
+
+
+def _get_pending_deliveries(mailing):
+    return (
+        mailing.deliveries.filter(sent_at=None, error="")
+        .select_related("member__profile")
+        .order_by("pk")
+    )
+
+
+def send_mailing(name, members, get_context, render, bcc=None, dry_run=False):
+    """
+    Send an email to members, resuming the unfinished mailing with the
+    same name if there is one
+
+    :param name: the name of the mailing, which identifies the run that an
+                 interrupted mailing is resumed in
+    :param members: queryset of the members to send the email to, this is
+                    ignored when an unfinished mailing is resumed
+    :param get_context: function that gets the context of the email of a
+                        member, it is called in the language of the member
+                        and the context must be picklable
+    :param render: module level function that renders an email from its
+                   context, it returns a tuple of the subject, the text and
+                   the HTML or None
+    :param bcc: list of addresses that receive a copy of every email
+    :param dry_run: does not really send emails if True
+    :return: the mailing, or None for a dry run
+    """
+    if dry_run:
+        mailing = Mailing.objects.filter(name=name, finished_at=None).first()
+        if mailing is not None:
+            members = [delivery.member for delivery in _get_pending_deliveries(mailing)]
+        for member in members:
+            logger.info("Sent email to %s (%s)", member.get_full_name(), member.email)
+        return None
+
+    mailing = _get_mailing(name, members)
+    deliveries = list(_get_pending_deliveries(mailing))
+    if deliveries:
+        _send_deliveries(deliveries, get_context, render, bcc)
+
+    if not _get_pending_deliveries(mailing).exists():
+        mailing.finished_at = timezone.now()
+        mailing.save()
+    return mailing
+
+
+def _send_deliveries(deliveries, get_context, render, bcc):
+    """
+    Render and send the emails of deliveries in rate limited batches
+    :raises Exception: if a connection to the mail server failed, after the
+                       deliveries that were handled are recorded
+    """
+    batch_size = settings.MAILING_BATCH_SIZE
+    connection_count = settings.MAILING_CONNECTIONS
+    start = time.monotonic()
+
+    with ExitStack() as stack:
+        renderer = None
+        if settings.MAILING_WORKERS != 0:
+            renderer = stack.enter_context(
+                ProcessPoolExecutor(
+                    max_workers=settings.MAILING_WORKERS or os.cpu_count() or 1
+                )
+            )
+        sender = stack.enter_context(ThreadPoolExecutor(max_workers=connection_count))
+        connections = [
+            stack.enter_context(mail.get_connection()) for _ in range(connection_count)
+        ]
+
+        for offset in range(0, len(deliveries), batch_size):
+            batch = deliveries[offset : offset + batch_size]
+            jobs = []
+            for delivery in batch:
+                language = delivery.member.profile.language
+                with translation.override(language):
+                    jobs.append((render, language, get_context(delivery.member)))
+            if renderer is None:
+                rendered = [_render_email(*job) for job in jobs]
+            else:
+                rendered = list(renderer.map(_render_email, *zip(*jobs)))
+
+            emails = []
+            for delivery, (subject, text, html) in zip(batch, rendered):
+                email = mail.EmailMultiAlternatives(
+                    subject,
+                    text,
+                    settings.DEFAULT_FROM_EMAIL,
+                    [delivery.member.email],
+                    bcc=bcc,
+                )
+                if html is not None:
+                    email.attach_alternative(html, "text/html")
+                emails.append(email)
+
+            # Every connection sends a consecutive part of the batch
+            part_size = -(-len(emails) // connection_count)
+            futures = [
+                sender.submit(
+                    _send_emails, connection, emails[index : index + part_size]
+                )
+                for connection, index in zip(
+                    connections, range(0, len(emails), part_size)
+                )
+            ]
+            results = []
+            failure = None
+            for future, index in zip(futures, range(0, len(emails), part_size)):
+                part_results, exception = future.result()
+                results += zip(batch[index : index + part_size], part_results)
+                failure = failure or exception
+
+            _record_results(results)
+            if failure is not None:
+                raise failure
+
+            if settings.MAILING_RATE:
+                sent = offset + len(batch)
+                time.sleep(
+                    max(0, sent / settings.MAILING_RATE - (time.monotonic() - start))
+                )
+
+
+def _record_results(results):
+    """
+    Record which deliveries were sent and why others failed
+    :param results: list of tuples of a delivery and an error message or
+                    None if it was sent
+    """
+    sent = []
+    for delivery, error in results:
+        if error is None:
+            sent.append(delivery.pk)
+            logger.info(
+                "Sent email to %s (%s)",
+                delivery.member.get_full_name(),
+                delivery.member.email,
+            )
+        else:
+            logger.warning("Could not send email to %s: %s", delivery.member, error)
+            MailingDelivery.objects.filter(pk=delivery.pk).update(error=error)
+    MailingDelivery.objects.filter(pk__in=sent).update(sent_at=timezone.now())
@@ -0,0 +1,164 @@
+"""
+Provides the command to measure how fast the birthdays in a range are found
+"""
+import copy
+import operator
+import random
+import time
+from datetime import date, datetime, timedelta
+from functools import reduce
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from members.api.viewsets import MemberViewset
+from members.models import Member, Membership, Profile
+from members.models.profile import get_birthday_day
+
+
+def _or_birthdays_in_range(from_date, to_date):
+    """Select the members with a birthday in a range, like we used to"""
+    queryset = Member.current_members.filter(profile__birthday__lte=to_date)
+    dates = [
+        from_date + timedelta(days=i) for i in range((to_date - from_date).days + 1)
+    ]
+    query = reduce(
+        operator.or_,
+        [
+            Q(profile__birthday__month=d.month, profile__birthday__day=d.day)
+            for d in dates
+        ],
+    )
+    return queryset.filter(query)
+
+
+def _copied_birthdays(member, start, end):
+    """Create a copy of a member for every birthday, like we used to"""
+    birthdays = []
+    start_year = max(start.year, member.profile.birthday.year)
+    for year in range(start_year, end.year + 1):
+        bday = copy.deepcopy(member)
+        try:
+            bday.profile.birthday = bday.profile.birthday.replace(year=year)
+        except ValueError:
+            bday.profile.birthday = bday.profile.birthday.replace(year=year, day=28)
+        if start.date() <= bday.profile.birthday <= end.date():
+            birthdays.append(bday)
+    return birthdays
+
+
+def _measure(lookup, build, ranges):
+    """
+    Find the birthdays in every range
+    :return: tuple of the seconds per range spent on the query and on
+             building the results, and the number of queries per range
+    """
+    query_time = 0
+    build_time = 0
+    found = 0
+    with CaptureQueriesContext(connection) as queries:
+        for start, end in ranges:
+            begin = time.perf_counter()
+            members = list(
+                lookup(start, end)
+                .select_related("profile")
+                .prefetch_related("membership_set")
+            )
+            query_time += time.perf_counter() - begin
+
+            begin = time.perf_counter()
+            for member in members:
+                found += len(build(member, start, end))
+            build_time += time.perf_counter() - begin
+    return (
+        query_time / len(ranges),
+        build_time / len(ranges),
+        len(queries) / len(ranges),
+        found,
+    )
+
+
+class Command(BaseCommand):
+    """Command to compare the old and the indexed birthday lookup"""
+
+    help = (
+        "Creates a number of temporary members and finds their birthdays "
+        "for every month of a year, with the old query of all days in the "
+        "range and with the indexed day of the year. Nothing is saved. "
+        "Only runs with DEBUG enabled, so it never locks a production database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--count", type=int, default=10000, help="Number of members to create",
+        )
+
+    def _create_members(self, count):
+        rng = random.Random(0)
+        users = User.objects.bulk_create(
+            User(username=f"benchmark-birthday-{i}", first_name="Benchmark")
+            for i in range(count)
+        )
+        if not connection.features.can_return_rows_from_bulk_insert:
+            users = User.objects.filter(username__startswith="benchmark-birthday-")
+
+        profiles = []
+        memberships = []
+        for user in users:
+            birthday = date(1990, 1, 1) + timedelta(days=rng.randrange(365 * 10))
+            profiles.append(
+                Profile(
+                    user=user,
+                    birthday=birthday,
+                    birthday_day=get_birthday_day(birthday),
+                )
+            )
+            memberships.append(
+                Membership(user=user, type="member", since=date(2015, 9, 1))
+            )
+        Profile.objects.bulk_create(profiles)
+        Membership.objects.bulk_create(memberships)
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG:
+            raise CommandError(
+                "This creates many temporary users, only run it with DEBUG enabled"
+            )
+
+        ranges = []
+        for month in range(1, 13):
+            start = timezone.make_aware(datetime(2019, month, 1))
+            end = timezone.make_aware(
+                datetime(2019 + month // 12, month % 12 + 1, 1)
+            ) - timedelta(days=1)
+            ranges.append((start, end))
+
+        with transaction.atomic():
+            self._create_members(options["count"])
+            results = {
+                "all days": _measure(_or_birthdays_in_range, _copied_birthdays, ranges),
+                "day of the year": _measure(
+                    Member.current_members.with_birthdays_in_range,
+                    MemberViewset._get_birthdays.__get__(MemberViewset()),
+                    ranges,
+                ),
+            }
+            transaction.set_rollback(True)
+
+        self.stdout.write(
+            f"Found the birthdays of {options['count']} members for every month"
+        )
+        for name, (query_time, build_time, queries, found) in results.items():
+            self.stdout.write(
+                f"{name}: {query_time * 1000:.1f} ms query, "
+                f"{build_time * 1000:.1f} ms building results and "
+                f"{queries:.0f} queries per month, {found} birthdays"
+            )
+        old = sum(results["all days"][:2])
+        new = sum(results["day of the year"][:2])
+        self.stdout.write(f"The day of the year lookup is {old / new:.1f}x as fast")
@@ -13,7 +13,12 @@ class Command(BaseCommand):
             help="Dry run instead of saving data",
         )
 
+    def _report_progress(self, done, total):
+        self.stdout.write(f"Minimised the data of {done}/{total} members")
+
     def handle(self, *args, **options):
-        processed = services.execute_data_minimisation(options["dry-run"])
+        processed = services.execute_data_minimisation(
+            options["dry-run"], progress=self._report_progress
+        )
         for p in processed:
             self.stdout.write("Removed data for {}".format(p))
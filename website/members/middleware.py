@@ -1,14 +1,34 @@
 """Middleware provided by the members package"""
+from django.contrib.auth.models import User
+from django.db.models import prefetch_related_objects
 from django.utils.functional import SimpleLazyObject
 
-from members.models import Member
+from members.models import Member, Profile
 
 
 def get_member(request):
-    try:
-        return Member.objects.get(pk=request.user.pk)
-    except Member.DoesNotExist:
+    """
+    Get the member of the user of a request, with the profile and
+    memberships loaded, so they are not queried again during the request
+    :param request: the request
+    :return: the member or None if the user is not a member
+    """
+    user = request.user
+    if not user.is_authenticated:
         return None
+    profile = Profile.objects.filter(user_id=user.pk).first()
+    if profile is None:
+        return None
+
+    # Reuse the user that was loaded by authentication instead of
+    # fetching the same row again
+    fields = [field.attname for field in User._meta.concrete_fields]
+    member = Member.from_db(
+        user._state.db, fields, [getattr(user, field) for field in fields]
+    )
+    member.profile = profile
+    prefetch_related_objects([member], "membership_set")
+    return member
 
 
 class MemberMiddleware:
@@ -0,0 +1,32 @@
+# Generated by Django 3.0.6 on 2026-10-18 17:57
+
+from datetime import date, timedelta
+
+from django.db import migrations, models
+
+
+def compute_birthday_days(apps, schema_editor):
+    """Store the day of the year of all birthdays, one update per day"""
+    Profile = apps.get_model("members", "Profile")
+    day = date(2000, 1, 1)
+    while day.year == 2000:
+        Profile.objects.filter(birthday__month=day.month, birthday__day=day.day).update(
+            birthday_day=day.timetuple().tm_yday
+        )
+        day += timedelta(days=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('members', '0038_auto_20200513_2143'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='birthday_day',
+            field=models.PositiveSmallIntegerField(db_index=True, editable=False, null=True, verbose_name='day of the birthday'),
+        ),
+        migrations.RunPython(compute_birthday_days, migrations.RunPython.noop),
+    ]
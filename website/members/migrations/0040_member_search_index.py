@@ -0,0 +1,100 @@
+# Generated by Django 3.0.6 on 2026-10-18 18:10
+
+import re
+import unicodedata
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# A copy of the tokenizer of utils.search when this migration was written,
+# so the index it builds does not change with the tokenizer
+WORD_PATTERN = re.compile(r"[^\W_]+(?:-[^\W_]+)*")
+MAX_TERM_LENGTH = 64
+MIN_FUZZY_LENGTH = 4
+
+
+def normalize(text):
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def tokenize(text):
+    return [word[:MAX_TERM_LENGTH] for word in WORD_PATTERN.findall(normalize(text))]
+
+
+def get_index_terms(texts):
+    words = set()
+    for text in texts:
+        words.update(tokenize(text))
+
+    terms = {(word, False) for word in words}
+    for word in words:
+        for start in range(1, len(word)):
+            if word[start] != "-" and (word[start:], False) not in terms:
+                terms.add((word[start:], True))
+    return terms
+
+
+def get_fuzzy_terms(texts):
+    terms = set()
+    for text in texts:
+        for word in tokenize(text):
+            if len(word) >= MIN_FUZZY_LENGTH and word.replace("-", "").isalpha():
+                terms.update(
+                    word[:index] + word[index + 1 :] for index in range(len(word))
+                )
+    return terms
+
+
+def build_search_index(apps, schema_editor):
+    """Add the search terms of all existing users"""
+    User = apps.get_model("auth", "User")
+    Profile = apps.get_model("members", "Profile")
+    MemberSearchTerm = apps.get_model("members", "MemberSearchTerm")
+    nicknames = dict(
+        Profile.objects.filter(
+            nickname__isnull=False, display_name_preference__contains="nick"
+        ).values_list("user_id", "nickname")
+    )
+    for user in User.objects.all():
+        texts = [user.first_name or "", user.last_name or "", user.username]
+        texts.append(nicknames.get(user.pk) or "")
+        MemberSearchTerm.objects.bulk_create(
+            [
+                MemberSearchTerm(member_id=user.pk, term=term, suffix=suffix)
+                for term, suffix in get_index_terms(texts)
+            ]
+            + [
+                MemberSearchTerm(member_id=user.pk, term=term, fuzzy=True)
+                for term in get_fuzzy_terms(texts)
+            ]
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('members', '0039_profile_birthday_day'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MemberSearchTerm',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(db_index=True, max_length=64, verbose_name='term')),
+                ('suffix', models.BooleanField(default=False, help_text='Whether the term is the end of a word instead of a word.', verbose_name='suffix')),
+                ('fuzzy', models.BooleanField(default=False, help_text='Whether the term is a word with one letter deleted.', verbose_name='fuzzy')),
+                ('member', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='members.Member', verbose_name='member')),
+            ],
+            options={
+                'verbose_name': 'member search term',
+                'verbose_name_plural': 'member search terms',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='membersearchterm',
+            index=models.Index(fields=['member', 'term'], name='members_mem_member__1978c8_idx'),
+        ),
+        migrations.RunPython(build_search_index, migrations.RunPython.noop),
+    ]
@@ -2,3 +2,5 @@ from .member import *
 from .profile import *
 from .membership import *
 from .email_change import *
+from .search_term import *
+from .mailing import *
@@ -0,0 +1,51 @@
+from django.db import models
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+
+class Mailing(models.Model):
+    """A bulk mailing to members, see `members.mailing`"""
+
+    name = models.CharField(verbose_name=_("name"), max_length=100)
+
+    created_at = models.DateTimeField(_("created at"), default=timezone.now)
+
+    finished_at = models.DateTimeField(_("finished at"), blank=True, null=True)
+
+    def __str__(self):
+        return "{} ({:%Y-%m-%d})".format(self.name, self.created_at)
+
+    class Meta:
+        verbose_name = _("mailing")
+        verbose_name_plural = _("mailings")
+
+
+class MailingDelivery(models.Model):
+    """The delivery of a bulk mailing to a single member"""
+
+    mailing = models.ForeignKey(
+        Mailing,
+        on_delete=models.CASCADE,
+        related_name="deliveries",
+        verbose_name=_("mailing"),
+    )
+
+    member = models.ForeignKey(
+        "members.Member", on_delete=models.CASCADE, verbose_name=_("member"),
+    )
+
+    sent_at = models.DateTimeField(_("sent at"), blank=True, null=True)
+
+    error = models.TextField(
+        verbose_name=_("error"),
+        help_text=_("Why the mail server did not accept the email."),
+        blank=True,
+    )
+
+    def __str__(self):
+        return "{}: {}".format(self.mailing, self.member)
+
+    class Meta:
+        verbose_name = _("mailing delivery")
+        verbose_name_plural = _("mailing deliveries")
+        unique_together = ("mailing", "member")
@@ -1,7 +1,6 @@
+import calendar
 import logging
 import operator
-from datetime import timedelta
-from functools import reduce
 
 from django.conf import settings
 from django.contrib.auth.models import User, UserManager
@@ -11,6 +10,7 @@ from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 from activemembers.models import MemberGroup, MemberGroupMembership
+from members.models.profile import get_birthday_day
 from payments.models import BankAccount
 
 logger = logging.getLogger(__name__)
@@ -78,16 +78,21 @@ class CurrentMemberManager(MemberManager):
             # Everyone that's born before to_date has a birthday
             return queryset
 
-        delta = to_date - from_date
-        dates = [from_date + timedelta(days=i) for i in range(delta.days + 1)]
-        monthdays = [
-            {"profile__birthday__month": d.month, "profile__birthday__day": d.day}
-            for d in dates
-        ]
-        # Don't get me started (basically, we are making a giant OR query with
-        # all days and months that are in the range)
-        query = reduce(operator.or_, [Q(**d) for d in monthdays])
-        return queryset.filter(query)
+        first_day = get_birthday_day(from_date)
+        last_day = get_birthday_day(to_date)
+        if (to_date.month, to_date.day) == (2, 28) and not calendar.isleap(
+            to_date.year
+        ):
+            # Birthdays on February 29 are celebrated on February 28
+            last_day += 1
+
+        if first_day <= last_day:
+            return queryset.filter(profile__birthday_day__range=(first_day, last_day))
+        # The range includes the end of the year
+        return queryset.filter(
+            Q(profile__birthday_day__gte=first_day)
+            | Q(profile__birthday_day__lte=last_day)
+        )
 
 
 class Member(User):
@@ -115,9 +120,20 @@ class Member(User):
             return None
         return membership
 
+    def _get_prefetched_memberships(self):
+        """
+        Get the memberships of this user if they were prefetched, like
+        for the member of a request (:func:`members.middleware.get_member`)
+        :return: the memberships or None if they were not prefetched
+        """
+        return getattr(self, "_prefetched_objects_cache", {}).get("membership_set")
+
     @property
     def latest_membership(self):
         """Get the most recent membership of this user"""
+        memberships = self._get_prefetched_memberships()
+        if memberships is not None:
+            return max(memberships, key=operator.attrgetter("since"), default=None)
         if not self.membership_set.exists():
             return None
         return self.membership_set.latest("since")
@@ -125,6 +141,9 @@ class Member(User):
     @property
     def earliest_membership(self):
         """Get the earliest membership of this user"""
+        memberships = self._get_prefetched_memberships()
+        if memberships is not None:
+            return min(memberships, key=operator.attrgetter("since"), default=None)
         if not self.membership_set.exists():
             return None
         return self.membership_set.earliest("since")
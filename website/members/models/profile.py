@@ -1,10 +1,13 @@
 import logging
 import os
+from datetime import date
+from io import BytesIO
 
 from PIL import Image
 from django.conf import settings
 from django.core import validators
 from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
 from django.core.files.storage import DefaultStorage
 from django.db import models
 from django.utils import timezone
@@ -32,6 +35,22 @@ def _profile_image_path(_instance, _filename):
     return f"public/avatars/{get_random_string(length=16)}"
 
 
+def get_birthday_day(birthday):
+    """
+    Get the day of the year of a birthday as if it were in a leap year,
+    so every date has the same number in every year
+
+    >>> get_birthday_day(date(1993, 3, 1))
+    61
+    >>> get_birthday_day(date(1992, 2, 29))
+    60
+
+    :param birthday: the date
+    :return: the day of the year, from 1 to 366
+    """
+    return date(2000, birthday.month, birthday.day).timetuple().tm_yday
+
+
 class Profile(models.Model):
     """This class holds extra information about a member"""
 
@@ -144,6 +163,12 @@ class Profile(models.Model):
 
     birthday = models.DateField(verbose_name=_("Birthday"), null=True)
 
+    # Indexed to find the birthdays in a range of dates,
+    # see `members.models.CurrentMemberManager.with_birthdays_in_range`
+    birthday_day = models.PositiveSmallIntegerField(
+        "day of the birthday", null=True, editable=False, db_index=True
+    )
+
     show_birthday = models.BooleanField(
         verbose_name=_("Display birthday"),
         help_text=_(
@@ -339,10 +364,11 @@ class Profile(models.Model):
 
             # Create new filename to store compressed image
             image_name, _ext = os.path.splitext(original_image_name)
-            image_name = storage.get_available_name(f"{image_name}.jpg")
-            with storage.open(image_name, "wb") as new_image_file:
-                image.convert("RGB").save(new_image_file, "JPEG")
-            self.photo.name = image_name
+            new_image_file = BytesIO()
+            image.convert("RGB").save(new_image_file, "JPEG")
+            self.photo.name = storage.save(
+                f"{image_name}.jpg", ContentFile(new_image_file.getvalue())
+            )
             super().save(*args, **kwargs)
 
             # delete original upload.
@@ -0,0 +1,36 @@
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+
+class MemberSearchTerm(models.Model):
+    """A term in the search index of the members, see `utils.search`"""
+
+    member = models.ForeignKey(
+        "members.Member",
+        on_delete=models.CASCADE,
+        related_name="search_terms",
+        verbose_name=_("member"),
+    )
+
+    term = models.CharField(verbose_name=_("term"), max_length=64, db_index=True)
+
+    suffix = models.BooleanField(
+        verbose_name=_("suffix"),
+        help_text=_("Whether the term is the end of a word instead of a word."),
+        default=False,
+    )
+
+    fuzzy = models.BooleanField(
+        verbose_name=_("fuzzy"),
+        help_text=_("Whether the term is a word with one letter deleted."),
+        default=False,
+    )
+
+    def __str__(self):
+        return self.term
+
+    class Meta:
+        verbose_name = _("member search term")
+        verbose_name_plural = _("member search terms")
+        # The ranking looks up the terms of every member that is found
+        indexes = [models.Index(fields=["member", "term"])]
@@ -1,14 +1,26 @@
 """Services defined in the members package"""
-from datetime import date
-from typing import Callable, List, Dict, Any
+from bisect import bisect_right
+from datetime import date, datetime, timedelta
+from typing import Callable, List, Dict, Any, Optional, Tuple
 
-from django.db.models import Q, Count
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Exists, F, OuterRef, Q, QuerySet, Subquery
 from django.utils import timezone
 from django.utils.translation import gettext
 
 from members import emails
-from members.models import Membership, Member
+from members.models import Membership, Member, MemberSearchTerm, Profile
+from payments.models import BankAccount
+from utils.search import (
+    get_fuzzy_terms,
+    get_index_terms,
+    get_keyword_filter,
+    get_keyword_rank,
+    tokenize,
+)
 from utils.snippets import datetime_to_lectureyear
+from utils.statistics import cached_statistics, clear_statistics
 
 
 def _member_group_memberships(
@@ -52,6 +64,145 @@ def _member_group_memberships(
     return data
 
 
+def merge_periods(periods) -> List[Tuple[date, Optional[date]]]:
+    """
+    Merge overlapping and adjacent periods
+    :param periods: iterable of (since, until) tuples, until is inclusive
+                    and None for a period without end
+    :return: sorted list of disjoint (since, until) tuples
+    """
+    merged = []
+    for since, until in sorted(periods, key=lambda period: period[0]):
+        if merged and (
+            merged[-1][1] is None or since <= merged[-1][1] + timedelta(days=1)
+        ):
+            last_since, last_until = merged[-1]
+            if until is None or last_until is None:
+                merged[-1] = (last_since, None)
+            else:
+                merged[-1] = (last_since, max(until, last_until))
+        else:
+            merged.append((since, until))
+    return merged
+
+
+def get_membership_periods(member) -> List[Tuple[date, Optional[date]]]:
+    """
+    Get the periods in which a member held any membership
+
+    The memberships are not queried again if they were prefetched with the
+    member, like those of `request.member`. They are not cached between
+    requests, so a membership that was changed by another process is never
+    missed.
+    :param member: the member
+    :return: sorted list of disjoint (since, until) tuples, until is
+             inclusive and None for a period without end
+    """
+    return merge_periods(
+        (membership.since, membership.until)
+        for membership in member.membership_set.all()
+    )
+
+
+def in_periods(periods, day) -> bool:
+    """
+    Check whether a day lies within one of the periods
+    :param periods: the result of `merge_periods`
+    :param day: the date to check
+    :return: True if the day is in one of the periods
+    """
+    if isinstance(day, datetime):
+        day = day.date()
+    index = bisect_right([since for since, _ in periods], day) - 1
+    if index < 0:
+        return False
+    until = periods[index][1]
+    return until is None or day <= until
+
+
+def periods_filter(periods, field) -> Q:
+    """
+    Build a filter that matches dates within one of the periods
+    :param periods: the result of `merge_periods`
+    :param field: the name of the date field to filter on
+    :return: the Q object, which matches nothing if there are no periods
+    """
+    query = Q(pk__in=[])
+    for since, until in periods:
+        if until is None:
+            query |= Q(**{f"{field}__gte": since})
+        else:
+            query |= Q(**{f"{field}__range": (since, until)})
+    return query
+
+
+def update_member_search_index(user) -> None:
+    """
+    Update the search terms of a member to match their names
+
+    The nickname is only indexed if the member shows it, so members cannot
+    be found by a nickname that is not displayed anywhere.
+    :param user: the user or member
+    """
+    texts = [user.first_name, user.last_name, user.username]
+    profile = Profile.objects.filter(user_id=user.pk).first()
+    if profile and profile.nickname and "nick" in profile.display_name_preference:
+        texts.append(profile.nickname)
+
+    terms = {(term, suffix, False) for term, suffix in get_index_terms(texts)}
+    terms |= {(term, False, True) for term in get_fuzzy_terms(texts)}
+    existing = {
+        (term, suffix, fuzzy): pk
+        for pk, term, suffix, fuzzy in MemberSearchTerm.objects.filter(
+            member_id=user.pk
+        ).values_list("pk", "term", "suffix", "fuzzy")
+    }
+
+    removed = [pk for term, pk in existing.items() if term not in terms]
+    if removed:
+        MemberSearchTerm.objects.filter(pk__in=removed).delete()
+    MemberSearchTerm.objects.bulk_create(
+        [
+            MemberSearchTerm(member_id=user.pk, term=term, suffix=suffix, fuzzy=fuzzy)
+            for term, suffix, fuzzy in terms - existing.keys()
+        ]
+    )
+
+
+def search_members(members, query) -> QuerySet:
+    """
+    Find the members whose names contain every keyword of a query
+
+    Members are ordered by relevance: keywords that are complete words rank
+    higher than keywords that start a word, which rank higher than keywords
+    in the middle of a word. Longer keywords also find names with a single
+    typo, which rank lowest. Members with the same rank are ordered by name.
+    :param members: the queryset of members to search in
+    :param query: the keywords separated by spaces
+    :return: the filtered and ordered queryset, every member is annotated
+             with its `search_rank`
+    """
+    keywords = list(dict.fromkeys(tokenize(query)))
+    if not keywords:
+        return members
+
+    terms = MemberSearchTerm.objects.filter(member=OuterRef("pk"))
+    ranks = {}
+    for index, keyword in enumerate(keywords):
+        members = members.filter(
+            pk__in=MemberSearchTerm.objects.filter(
+                get_keyword_filter(keyword, fuzzy=True)
+            ).values("member")
+        )
+        ranks[f"search_rank_{index}"] = get_keyword_rank(terms, keyword, fuzzy=True)
+
+    return (
+        members.annotate(**ranks)
+        .annotate(search_rank=sum(F(name) for name in ranks))
+        .order_by("-search_rank", "first_name", "last_name")
+    )
+
+
 def member_achievements(member) -> List:
     """
     Derives a list of achievements of a member
@@ -88,21 +239,31 @@ def member_societies(member) -> List:
     return sorted(societies.values(), key=lambda x: x["earliest"])
 
 
+@cached_statistics("memberships")
+def _count_current_memberships() -> List[Tuple[str, Optional[int], int]]:
+    """
+    Count the current memberships per type and starting year in one query
+    :return: list of (type, starting year, count) tuples
+    """
+    return [
+        (row["type"], row["user__profile__starting_year"], row["count"])
+        for row in Membership.objects.filter(since__lte=date.today())
+        .filter(Q(until__isnull=True) | Q(until__gt=date.today()))
+        .values("type", "user__profile__starting_year")
+        .annotate(count=Count("pk"))
+        .order_by()
+    ]
+
+
 def gen_stats_member_type() -> Dict[str, int]:
     """
     Generate a dictionary where every key is a member type with
     the value being the number of current members of that type
     """
-
-    data = {}
-    for key, display in Membership.MEMBERSHIP_TYPES:
-        data[str(display)] = (
-            Membership.objects.filter(since__lte=date.today())
-            .filter(Q(until__isnull=True) | Q(until__gt=date.today()))
-            .filter(type=key)
-            .count()
-        )
-    return data
+    counts = {key: 0 for key, _ in Membership.MEMBERSHIP_TYPES}
+    for key, _, count in _count_current_memberships():
+        counts[key] += count
+    return {str(display): counts[key] for key, display in Membership.MEMBERSHIP_TYPES}
 
 
 def gen_stats_year() -> Dict[str, Dict[str, int]]:
@@ -111,36 +272,30 @@ def gen_stats_year() -> Dict[str, Dict[str, int]]:
     of Thalia members in a year. The sixth element contains all the multi-year
     students.
     """
-    stats_year = {}
     current_year = datetime_to_lectureyear(date.today())
-
-    for i in range(5):
-        new = {}
-        for key, _ in Membership.MEMBERSHIP_TYPES:
-            new[key] = (
-                Membership.objects.filter(user__profile__starting_year=current_year - i)
-                .filter(since__lte=date.today())
-                .filter(Q(until__isnull=True) | Q(until__gt=date.today()))
-                .filter(type=key)
-                .count()
-            )
-        stats_year[str(current_year - i)] = new
-
-    # Add multi year members
-    new = {}
-    for key, _ in Membership.MEMBERSHIP_TYPES:
-        new[key] = (
-            Membership.objects.filter(user__profile__starting_year__lt=current_year - 4)
-            .filter(since__lte=date.today())
-            .filter(Q(until__isnull=True) | Q(until__gt=date.today()))
-            .filter(type=key)
-            .count()
-        )
-    stats_year[str(gettext("Older"))] = new
+    years = [str(current_year - i) for i in range(5)]
+    older = str(gettext("Older"))
+
+    stats_year = {
+        year: {key: 0 for key, _ in Membership.MEMBERSHIP_TYPES}
+        for year in years + [older]
+    }
+    for key, starting_year, count in _count_current_memberships():
+        if starting_year is None or starting_year > current_year:
+            continue
+        if starting_year < current_year - 4:
+            stats_year[older][key] += count
+        else:
+            stats_year[str(starting_year)][key] += count
 
     return stats_year
 
 
+def clear_membership_statistics() -> None:
+    """Remove the cached statistics of the current memberships"""
+    clear_statistics("memberships")
+
+
 def verify_email_change(change_request) -> None:
     """
     Mark the email change request as verified
@@ -182,50 +337,65 @@ def process_email_change(change_request) -> None:
     emails.send_email_change_completion_message(change_request)
 
 
-def execute_data_minimisation(dry_run=False, members=None) -> List[Member]:
+def execute_data_minimisation(
+    dry_run=False, members=None, progress=None
+) -> List[Member]:
     """
     Clean the profiles of members/users of whom the last membership ended
     at least 31 days ago
 
+    The members are selected with one query and their profiles are updated
+    in batches of ``settings.DATA_MINIMISATION_BATCH_SIZE``, each in its
+    own transaction.
     :param dry_run: does not really remove data if True
     :param members: queryset of members to process, optional
+    :param progress: function that is called with the number of processed
+                     members and the total after every batch, optional
     :return: list of processed members
     """
-    if not members:
-        members = Member.objects
-    members = (
-        members.annotate(membership_count=Count("membership"))
-        .exclude(
-            (
-                Q(membership__until__isnull=True)
-                | Q(membership__until__gt=timezone.now().date())
-            )
-            & Q(membership_count__gt=0)
+    if members is None:
+        members = Member.objects.all()
+    deletion_period = timezone.now().date() - timezone.timedelta(days=31)
+    memberships = Membership.objects.filter(user=OuterRef("pk"))
+    processed_members = list(
+        members.annotate(
+            has_memberships=Exists(memberships),
+            has_current_memberships=Exists(
+                memberships.filter(
+                    Q(until__isnull=True) | Q(until__gt=timezone.now().date())
+                )
+            ),
+            latest_until=Subquery(memberships.order_by("-since").values("until")[:1]),
         )
-        .distinct()
-        .prefetch_related("membership_set", "profile")
+        .filter(has_current_memberships=False)
+        .filter(Q(has_memberships=False) | Q(latest_until__lte=deletion_period))
+        .order_by("pk")
     )
-    deletion_period = timezone.now().date() - timezone.timedelta(days=31)
-    processed_members = []
-    for member in members:
-        if (
-            member.latest_membership is None
-            or member.latest_membership.until <= deletion_period
-        ):
-            processed_members.append(member)
-            profile = member.profile
-            profile.student_number = None
-            profile.phone_number = None
-            profile.address_street = None
-            profile.address_street2 = None
-            profile.address_postal_code = None
-            profile.address_city = None
-            profile.address_country = None
-            profile.birthday = None
-            profile.emergency_contact_phone_number = None
-            profile.emergency_contact = None
-            member.bank_accounts.all().delete()
-            if not dry_run:
-                profile.save()
+    if dry_run:
+        return processed_members
+
+    total = len(processed_members)
+    batch_size = settings.DATA_MINIMISATION_BATCH_SIZE
+    for start in range(0, total, batch_size):
+        batch = [member.pk for member in processed_members[start : start + batch_size]]
+        with transaction.atomic():
+            # The update skips the signals, so the day of the birthday
+            # is cleared together with the birthday
+            Profile.objects.filter(user__in=batch).update(
+                student_number=None,
+                phone_number=None,
+                address_street=None,
+                address_street2=None,
+                address_postal_code=None,
+                address_city=None,
+                address_country=None,
+                birthday=None,
+                birthday_day=None,
+                emergency_contact_phone_number=None,
+                emergency_contact=None,
+            )
+            BankAccount.objects.filter(owner__in=batch).delete()
+        if progress:
+            progress(min(start + batch_size, total), total)
 
     return processed_members
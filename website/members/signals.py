@@ -0,0 +1,59 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from members.models.profile import get_birthday_day
+from members.services import (
+    clear_membership_statistics,
+    update_member_search_index,
+)
+
+# The fields of users and profiles that are stored in the search index
+USER_SEARCH_FIELDS = {"first_name", "last_name", "username"}
+PROFILE_SEARCH_FIELDS = {"nickname", "display_name_preference"}
+
+
+# These receivers keep a cache correct, so they are never suspended
+@receiver(
+    post_save, sender="members.Membership", dispatch_uid="members_membership_save"
+)
+@receiver(
+    post_delete, sender="members.Membership", dispatch_uid="members_membership_delete"
+)
+def clear_membership_statistics_cache(sender, instance, **kwargs):
+    """Remove the cached membership statistics"""
+    clear_membership_statistics()
+
+
+@receiver(post_save, sender="members.Profile", dispatch_uid="members_profile_save")
+@receiver(post_delete, sender="members.Profile", dispatch_uid="members_profile_delete")
+def clear_profile_statistics_cache(sender, instance, **kwargs):
+    """Remove the cached membership statistics, which count starting years"""
+    clear_membership_statistics()
+
+
+# The birthday index must always match the birthdays, including those
+# of fixtures, so this is never suspended
+@receiver(pre_save, sender="members.Profile", dispatch_uid="members_profile_birthday")
+def update_birthday_day(sender, instance, **kwargs):
+    """Store the day of the year of the birthday of a profile"""
+    instance.birthday_day = (
+        get_birthday_day(instance.birthday) if instance.birthday else None
+    )
+
+
+# The search index must always match the names, so these are never suspended
+@receiver(post_save, sender="auth.User", dispatch_uid="members_user_save_index")
+@receiver(post_save, sender="members.Member", dispatch_uid="members_member_save_index")
+def update_user_search_index(sender, instance, update_fields, **kwargs):
+    """Update the search index of a user whose names may have changed"""
+    if update_fields is None or USER_SEARCH_FIELDS & set(update_fields):
+        update_member_search_index(instance)
+
+
+@receiver(
+    post_save, sender="members.Profile", dispatch_uid="members_profile_save_index"
+)
+def update_profile_search_index(sender, instance, update_fields, **kwargs):
+    """Update the search index of a user whose nickname may have changed"""
+    if update_fields is None or PROFILE_SEARCH_FIELDS & set(update_fields):
+        update_member_search_index(instance.user)
@@ -5,13 +5,13 @@ from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
 
 from thaliawebsite.templatetags.grid_item import grid_item
-from utils.media.services import get_thumbnail_url
+from utils.media.services import get_accept_header, get_thumbnail_url
 
 register = template.Library()
 
 
-@register.inclusion_tag("includes/grid_item.html")
-def member_card(member, meta_text=None, ribbon=None):
+@register.inclusion_tag("includes/grid_item.html", takes_context=True)
+def member_card(context, member, meta_text=None, ribbon=None):
     if meta_text is None and member.profile.starting_year:
         meta_text = '<p class="px-1">{}: {}</p>'.format(
             _("Cohort"), member.profile.starting_year
@@ -20,7 +20,9 @@ def member_card(member, meta_text=None, ribbon=None):
     image_url = static("members/images/default-avatar.jpg")
     if member.profile.photo:
         image_url = get_thumbnail_url(
-            member.profile.photo, settings.THUMBNAIL_SIZES["medium"]
+            member.profile.photo,
+            settings.THUMBNAIL_SIZES["medium"],
+            accept=get_accept_header(context),
         )
 
     return grid_item(
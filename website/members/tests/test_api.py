@@ -0,0 +1,72 @@
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from members.models import Member, Membership, Profile
+
+
+@override_settings(SUSPEND_SIGNALS=True)
+class MemberBirthdaysTest(TestCase):
+    """Test the birthdays in the calendar"""
+
+    fixtures = ["members.json"]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(Member.objects.get(pk=1))
+
+    def _get(self, start, end):
+        response = self.client.get(
+            "/api/v1/members/birthdays/", {"start": start, "end": end}
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_birthdays(self):
+        birthdays = self._get("2016-01-01T00:00:00", "2018-12-31T00:00:00")
+        self.assertEqual(
+            [(birthday["start"], birthday["title"]) for birthday in birthdays],
+            [
+                ("2016-03-02", "Thom Wiggers"),
+                ("2017-03-02", "Thom Wiggers"),
+                ("2018-03-02", "Thom Wiggers"),
+            ],
+        )
+        self.assertEqual(birthdays[0]["classNames"], ["birthday-event"])
+        self.assertEqual(birthdays[0]["url"], "/members/profile/1")
+        self.assertEqual(self._get("2017-03-03T00:00:00", "2017-12-31T00:00:00"), [])
+
+    def test_leap_day(self):
+        profile = Profile.objects.get(user__pk=1)
+        profile.birthday = profile.birthday.replace(year=1992, month=2, day=29)
+        profile.save()
+        birthdays = self._get("2016-02-01T00:00:00", "2017-03-31T00:00:00")
+        self.assertEqual(
+            [birthday["start"] for birthday in birthdays], ["2016-02-29", "2017-02-28"]
+        )
+
+    def test_queries(self):
+        Membership.objects.filter(user__pk=1).update(type="honorary")
+        with self.assertNumQueries(2):
+            birthdays = self._get("2017-03-01T00:00:00", "2017-03-31T00:00:00")
+        self.assertEqual(birthdays[0]["classNames"], ["birthday-event", "honorary"])
+
+
+@override_settings(SUSPEND_SIGNALS=True)
+class MemberSearchTest(TestCase):
+    """Test searching the current members"""
+
+    fixtures = ["members.json"]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(Member.objects.get(pk=1))
+
+    def _search(self, query, **params):
+        response = self.client.get("/api/v1/members/", {"search": query, **params})
+        self.assertEqual(response.status_code, 200)
+        return [member["pk"] for member in response.json()]
+
+    def test_search(self):
+        self.assertEqual(self._search("wiggers"), [1])
+        self.assertEqual(self._search("wigers"), [1])
+        self.assertEqual(self._search("wiggers nobody"), [])
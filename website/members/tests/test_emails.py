@@ -4,10 +4,12 @@ from django.utils import timezone
 from freezegun import freeze_time
 
 from members import emails
-from members.models import Member, Profile, Membership
+from members.models import Mailing, Member, Profile, Membership
 
 
-@override_settings(SUSPEND_SIGNALS=True)
+@override_settings(
+    SUSPEND_SIGNALS=True, MAILING_WORKERS=0, MAILING_CONNECTIONS=1, MAILING_RATE=None
+)
 class EmailsTest(TestCase):
     @classmethod
     def setUpTestData(cls):
@@ -179,6 +181,45 @@ class EmailsTest(TestCase):
         self.assertEqual(mail.outbox[0].to, ["test4@example.org"])
         self.assertEqual(mail.outbox[1].to, ["test5@example.org"])
 
+    @freeze_time("2017-10-01")
+    def test_resume_membership_announcement(self):
+        # Only the unfinished mailing of this lecture year is resumed
+        stale = Mailing.objects.create(name="membership_announcement_2016")
+        stale.deliveries.create(member=self.year_member_nl)
+        mailing = Mailing.objects.create(name="membership_announcement_2017")
+        mailing.deliveries.create(member=self.year_member_en)
+
+        emails.send_membership_announcement()
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ["test2@example.org"])
+        mailing.refresh_from_db()
+        self.assertIsNotNone(mailing.finished_at)
+
+        # The next run in this lecture year sends the email to all members
+        emails.send_membership_announcement()
+
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(mail.outbox[1].to, ["test4@example.org"])
+        self.assertEqual(mail.outbox[2].to, ["test5@example.org"])
+        stale.refresh_from_db()
+        self.assertIsNone(stale.finished_at)
+
+    @freeze_time("2018-10-01")
+    def test_stale_membership_announcement(self):
+        stale = Mailing.objects.create(name="membership_announcement_2017")
+        stale.deliveries.create(member=self.year_member_nl)
+
+        emails.send_membership_announcement()
+
+        # The stale mailing is not resumed and the current members get the email
+        self.assertNotIn(["test1@example.org"], [email.to for email in mail.outbox])
+        self.assertIn(["test4@example.org"], [email.to for email in mail.outbox])
+        self.assertEqual(
+            Mailing.objects.get(finished_at__isnull=False).name,
+            "membership_announcement_2018",
+        )
+
     @freeze_time("2017-10-01")
     def test_send_information_request(self):
         emails.send_information_request()
@@ -0,0 +1,180 @@
+import socketserver
+import threading
+from datetime import date
+from unittest import mock
+
+from django.test import TransactionTestCase, override_settings
+
+from members.mailing import send_mailing
+from members.models import Mailing, MailingDelivery, Member, Membership, Profile
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    """Speak just enough SMTP to receive emails"""
+
+    def _reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        server = self.server
+        self._reply("220 localhost")
+        recipients = []
+        while True:
+            line = self.rfile.readline().decode().strip()
+            if not line:
+                return
+            command = line[:4].upper()
+            if command in ("EHLO", "HELO"):
+                self._reply("250 localhost")
+            elif command == "MAIL":
+                with server.lock:
+                    if len(server.messages) >= server.fail_after:
+                        self._reply("421 Too many emails")
+                        return
+                recipients = []
+                self._reply("250 OK")
+            elif command == "RCPT":
+                address = line.split(":", 1)[1].strip("<> ")
+                if address in server.refused:
+                    self._reply("550 No such user")
+                else:
+                    recipients.append(address)
+                    self._reply("250 OK")
+            elif command == "DATA":
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                data = []
+                while True:
+                    data_line = self.rfile.readline().decode()
+                    if data_line.rstrip("\r\n") == ".":
+                        break
+                    data.append(data_line)
+                with server.lock:
+                    server.messages.append((recipients, "".join(data)))
+                self._reply("250 OK")
+            elif command == "QUIT":
+                self._reply("221 Bye")
+                return
+            else:
+                recipients = []
+                self._reply("250 OK")
+
+
+class SMTPServer(socketserver.ThreadingTCPServer):
+    """Local stand-in for the mail server that remembers all emails"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, refused=(), fail_after=float("inf")):
+        super().__init__(("localhost", 0), SMTPHandler)
+        self.lock = threading.Lock()
+        self.messages = []
+        self.refused = set(refused)
+        self.fail_after = fail_after
+
+    @property
+    def recipients(self):
+        return [recipients[0] for recipients, _ in self.messages]
+
+
+def _get_context(member):
+    return {"name": member.first_name}
+
+
+def _render(context):
+    return "Hello", f"Hello {context['name']}", f"<p>Hello {context['name']}</p>"
+
+
+@override_settings(
+    SUSPEND_SIGNALS=True,
+    EMAIL_BACKEND="django.core.mail.backends.smtp.EmailBackend",
+    EMAIL_HOST="localhost",
+    EMAIL_USE_TLS=False,
+    MAILING_WORKERS=2,
+    MAILING_BATCH_SIZE=4,
+    MAILING_CONNECTIONS=2,
+    MAILING_RATE=None,
+)
+class SendMailingTest(TransactionTestCase):
+    """Test sending a mailing to a local SMTP server"""
+
+    def setUp(self):
+        for i in range(10):
+            member = Member.objects.create(
+                username=f"member{i}",
+                first_name=f"Member{i}",
+                email=f"member{i}@example.org",
+            )
+            Profile.objects.create(user=member)
+            Membership.objects.create(
+                user=member, type=Membership.MEMBER, since=date(2000, 1, 1)
+            )
+        self.members = Member.current_members.order_by("pk")
+        self.addresses = [member.email for member in self.members]
+
+    def _send(self, server, **kwargs):
+        with override_settings(EMAIL_PORT=server.server_address[1]):
+            return send_mailing("test", self.members, _get_context, _render, **kwargs)
+
+    def _start_server(self, **kwargs):
+        server = SMTPServer(**kwargs)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server
+
+    def test_send(self):
+        server = self._start_server()
+        mailing = self._send(server, bcc=["board@example.org"])
+
+        self.assertIsNotNone(mailing.finished_at)
+        self.assertCountEqual(server.recipients, self.addresses)
+        for recipients, data in server.messages:
+            self.assertEqual(recipients[1:], ["board@example.org"])
+            self.assertIn("text/html", data)
+        self.assertFalse(mailing.deliveries.filter(sent_at=None).exists())
+
+    def test_resume(self):
+        server = self._start_server(fail_after=5)
+        with self.assertRaises(Exception):
+            self._send(server)
+
+        mailing = Mailing.objects.get()
+        self.assertIsNone(mailing.finished_at)
+        sent = mailing.deliveries.exclude(sent_at=None)
+        # The connections send at the same time, so either may fail first
+        self.assertIn(sent.count(), (5, 6))
+        self.assertEqual(sent.count(), len(server.messages))
+
+        server.fail_after = float("inf")
+        self.assertEqual(self._send(server), mailing)
+        mailing.refresh_from_db()
+        self.assertIsNotNone(mailing.finished_at)
+        # Every member received the email exactly once
+        self.assertCountEqual(server.recipients, self.addresses)
+
+        # A new mailing with the same name is sent again
+        self.assertNotEqual(self._send(server), mailing)
+        self.assertEqual(len(server.messages), 20)
+
+    def test_refused_recipient(self):
+        server = self._start_server(refused=["member3@example.org"])
+        mailing = self._send(server)
+
+        self.assertIsNotNone(mailing.finished_at)
+        self.assertCountEqual(
+            server.recipients, set(self.addresses) - {"member3@example.org"}
+        )
+        delivery = mailing.deliveries.get(member__email="member3@example.org")
+        self.assertIsNone(delivery.sent_at)
+        self.assertIn("No such user", delivery.error)
+
+    def test_dry_run(self):
+        server = self._start_server()
+        with mock.patch("members.mailing.logger") as logger:
+            self.assertIsNone(self._send(server, dry_run=True))
+
+        self.assertEqual(logger.info.call_count, 10)
+        self.assertEqual(server.messages, [])
+        self.assertFalse(Mailing.objects.exists())
+        self.assertFalse(MailingDelivery.objects.exists())
@@ -0,0 +1,53 @@
+from datetime import date
+
+from django.contrib.auth.models import AnonymousUser, User
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+
+from members.middleware import MemberMiddleware
+from members.models import Member, Membership
+
+
+@override_settings(SUSPEND_SIGNALS=True)
+class MemberMiddlewareTest(TestCase):
+    """Test the member that the middleware adds to requests"""
+
+    fixtures = ["members.json"]
+
+    def setUp(self):
+        self.middleware = MemberMiddleware(lambda request: HttpResponse())
+
+    def _get_member(self, user):
+        request = RequestFactory().get("/")
+        request.user = user
+        self.middleware(request)
+        return request.member
+
+    def test_member(self):
+        user = User.objects.get(pk=1)
+        Membership.objects.create(user=user, type="benefactor", since=date(2000, 1, 1))
+        with self.assertNumQueries(2):
+            member = self._get_member(user)
+            self.assertIsInstance(member, Member)
+            self.assertEqual(member.pk, 1)
+            self.assertEqual(member.get_full_name(), user.get_full_name())
+            self.assertEqual(member.profile.user_id, 1)
+            for _ in range(3):
+                self.assertEqual(member.current_membership.type, "benefactor")
+                self.assertEqual(member.latest_membership.type, "benefactor")
+                self.assertEqual(member.earliest_membership.type, "member")
+                self.assertTrue(member.has_active_membership())
+
+    def test_memberships_match_queries(self):
+        for user in User.objects.exclude(profile=None):
+            with self.subTest(user=user.username):
+                member = self._get_member(user)
+                queried = Member.objects.get(pk=user.pk)
+                self.assertEqual(member.current_membership, queried.current_membership)
+                self.assertEqual(member.latest_membership, queried.latest_membership)
+
+    def test_not_a_member(self):
+        # The lazy member behaves like None
+        self.assertFalse(self._get_member(AnonymousUser()))
+        user = User.objects.create(username="noprofile")
+        self.assertFalse(self._get_member(user))
@@ -1,6 +1,8 @@
 from datetime import datetime
+from io import StringIO
 import doctest
 
+from django.core.management import CommandError, call_command
 from django.test import TestCase, override_settings
 from django.utils import timezone
 
@@ -11,6 +13,7 @@ from members.models import Profile, Member
 def load_tests(loader, tests, ignore):
     """Load doctests"""
     tests.addTests(doctest.DocTestSuite(models))
+    return tests
 
 
 @override_settings(SUSPEND_SIGNALS=True)
@@ -58,6 +61,30 @@ class MemberBirthdayTest(TestCase):
     def test_person_born_in_range_spanning_one_year(self):
         self._assert_thom("1992-12-31", "1993-04-01")
 
+    def test_benchmark_command(self):
+        with self.assertRaises(CommandError):
+            call_command("benchmarkbirthdays", "--count", "50")
+        self.assertFalse(Member.objects.filter(first_name="Benchmark").exists())
+
+        out = StringIO()
+        with override_settings(DEBUG=True):
+            call_command("benchmarkbirthdays", "--count", "50", stdout=out)
+        self.assertIn("Found the birthdays of 50 members", out.getvalue())
+        self.assertIn("day of the year: ", out.getvalue())
+        self.assertFalse(Member.objects.filter(first_name="Benchmark").exists())
+
+    def test_leap_day_birthday(self):
+        profile = Profile.objects.get(user__first_name="Thom")
+        profile.birthday = datetime(1992, 2, 29).date()
+        profile.save()
+
+        # Celebrated on February 28 when there is no leap day
+        self._assert_thom("2017-02-28", "2017-02-28")
+        self._assert_thom("2016-12-01", "2017-02-28")
+        self._assert_none("2017-03-01", "2017-03-31")
+        self._assert_thom("2016-02-29", "2016-02-29")
+        self._assert_none("2016-02-28", "2016-02-28")
+
     def test_person_born_in_range_spanning_multiple_years(self):
         self._assert_thom("1992-12-31", "1995-01-01")
 
@@ -1,4 +1,5 @@
 from datetime import timedelta, date
+from django.db.models import prefetch_related_objects
 from django.test import TestCase, override_settings
 from django.utils import timezone
 from unittest import mock
@@ -8,9 +9,12 @@ from freezegun import freeze_time
 from members import services
 from members.models import Member, Membership, Profile, EmailChange
 from members.services import gen_stats_year, gen_stats_member_type
+from payments.models import BankAccount
 from utils.snippets import datetime_to_lectureyear
 
 
+# Cache locally to count only the queries that compute the statistics
+@override_settings(STATISTICS_CACHE="default")
 @freeze_time("2020-01-01")
 class StatisticsTest(TestCase):
     @classmethod
@@ -23,6 +27,9 @@ class StatisticsTest(TestCase):
         profiles = [Profile(user_id=i) for i in range(10)]
         Profile.objects.bulk_create(profiles)
 
+    def setUp(self):
+        services.clear_membership_statistics()
+
     def sum_members(self, members, type=None):
         if type is None:
             return sum(sum(i.values()) for i in members.values())
@@ -155,8 +162,114 @@ class StatisticsTest(TestCase):
         # one >5 year student
         self.assertEqual(1, result["Older"][Membership.MEMBER])
 
+    def test_gen_stats_cached(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(10, self.sum_member_types(gen_stats_member_type()))
+            gen_stats_year()
+
+        # A new membership clears the cache
+        Membership.objects.create(user_id=0, type=Membership.BENEFACTOR)
+        with self.assertNumQueries(1):
+            result = gen_stats_member_type()
+            gen_stats_member_type()
+        self.assertEqual(11, self.sum_member_types(result))
+
+        # A new starting year clears the cache
+        profile = Profile.objects.get(user_id=0)
+        profile.starting_year = datetime_to_lectureyear(date.today())
+        profile.save()
+        with self.assertNumQueries(1):
+            result = gen_stats_year()
+        self.assertEqual(2, self.sum_members(result))
+
 
 @override_settings(SUSPEND_SIGNALS=True)
+class MembershipPeriodsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.member = Member.objects.create(username="periods")
+
+    def test_merge_periods(self):
+        periods = services.merge_periods(
+            [
+                (date(2018, 9, 1), date(2019, 8, 31)),
+                (date(2016, 9, 1), date(2017, 8, 31)),
+                (date(2017, 9, 1), date(2018, 3, 1)),
+                (date(2020, 1, 1), None),
+                (date(2020, 9, 1), date(2021, 8, 31)),
+            ]
+        )
+        self.assertEqual(
+            periods,
+            [
+                (date(2016, 9, 1), date(2018, 3, 1)),
+                (date(2018, 9, 1), date(2019, 8, 31)),
+                (date(2020, 1, 1), None),
+            ],
+        )
+        self.assertEqual(services.merge_periods([]), [])
+
+    def test_in_periods(self):
+        periods = [
+            (date(2016, 9, 1), date(2018, 3, 1)),
+            (date(2020, 1, 1), None),
+        ]
+        for day, expected in [
+            (date(2016, 8, 31), False),
+            (date(2016, 9, 1), True),
+            (date(2018, 3, 1), True),
+            (date(2018, 3, 2), False),
+            (date(2030, 1, 1), True),
+        ]:
+            with self.subTest(day=day):
+                self.assertEqual(services.in_periods(periods, day), expected)
+                membership = Membership.objects.create(
+                    user=self.member, type=Membership.MEMBER, since=day
+                )
+                self.assertEqual(
+                    Membership.objects.filter(
+                        services.periods_filter(periods, "since"), pk=membership.pk
+                    ).exists(),
+                    expected,
+                )
+
+    def test_get_membership_periods_prefetched(self):
+        Membership.objects.create(
+            user=self.member,
+            type=Membership.MEMBER,
+            since=date(2016, 9, 1),
+            until=date(2017, 8, 31),
+        )
+        member = Member._base_manager.get(pk=self.member.pk)
+        prefetch_related_objects([member], "membership_set")
+        with self.assertNumQueries(0):
+            periods = services.get_membership_periods(member)
+        self.assertEqual(periods, [(date(2016, 9, 1), date(2017, 8, 31))])
+
+    def test_get_membership_periods_changed_elsewhere(self):
+        membership = Membership.objects.create(
+            user=self.member,
+            type=Membership.MEMBER,
+            since=date(2016, 9, 1),
+            until=date(2017, 8, 31),
+        )
+        self.assertEqual(
+            services.get_membership_periods(self.member),
+            [(date(2016, 9, 1), date(2017, 8, 31))],
+        )
+
+        # Another process changes the memberships, without signals that
+        # could reach this process
+        Membership.objects.filter(pk=membership.pk).update(until=date(2016, 12, 31))
+        self.assertEqual(
+            services.get_membership_periods(self.member),
+            [(date(2016, 9, 1), date(2016, 12, 31))],
+        )
+
+        Membership.objects.filter(pk=membership.pk).delete()
+        self.assertEqual(services.get_membership_periods(self.member), [])
+
+
 class EmailChangeTest(TestCase):
     fixtures = ["members.json"]
 
@@ -265,6 +378,32 @@ class DataMinimisationTest(TestCase):
             self.m1.refresh_from_db()
             self.assertIsNone(self.m1.profile.student_number)
 
+    @override_settings(DATA_MINIMISATION_BATCH_SIZE=1)
+    def test_removes_data(self):
+        profile = self.m1.profile
+        profile.birthday = date(1995, 3, 2)
+        profile.save()
+        BankAccount.objects.create(
+            owner=self.m1, initials="T", last_name="Example", iban="NL91ABNA0417164300"
+        )
+
+        services.execute_data_minimisation(True)
+        self.assertTrue(self.m1.bank_accounts.exists())
+
+        progress = mock.Mock()
+        # One query selects the members, every batch updates the profiles
+        # and deletes the bank accounts in a savepoint
+        with self.assertNumQueries(1 + 2 * 4):
+            processed = services.execute_data_minimisation(False, progress=progress)
+        self.assertEqual(processed, [self.m1, self.m2])
+        progress.assert_has_calls([mock.call(1, 2), mock.call(2, 2)])
+
+        profile.refresh_from_db()
+        self.assertIsNone(profile.birthday)
+        self.assertIsNone(profile.birthday_day)
+        self.assertIsNone(profile.student_number)
+        self.assertFalse(self.m1.bank_accounts.exists())
+
     def test_provided_queryset(self):
         processed = services.execute_data_minimisation(True, members=Member.objects)
         self.assertEqual(len(processed), 2)
@@ -303,3 +442,77 @@ class DataMinimisationTest(TestCase):
             processed = services.execute_data_minimisation(True)
             self.assertEqual(len(processed), 1)
             m.delete()
+
+
+class SearchMembersTest(TestCase):
+    def _create_member(self, first_name, last_name, nickname=None, preference="full"):
+        member = Member.objects.create(
+            username=f"member{Member.objects.count()}",
+            first_name=first_name,
+            last_name=last_name,
+        )
+        Profile.objects.create(
+            user=member, nickname=nickname, display_name_preference=preference
+        )
+        return member
+
+    def _search(self, query):
+        return list(services.search_members(Member.objects.all(), query))
+
+    def test_search(self):
+        john = self._create_member("John", "Doe", "Johnny")
+        jane = self._create_member("Jane", "Doe", "Janie", "fullnick")
+        bram = self._create_member("Bram", "van Çelik")
+
+        for query, expected in [
+            ("", [bram, jane, john]),
+            ("doe", [jane, john]),
+            ("JOHN doe", [john]),
+            ("celik", [bram]),
+            ("van", [bram]),
+            ("jan", [jane]),
+            ("janie", [jane]),
+            # The nickname of John is not shown, so it is not indexed
+            ("johnny", []),
+            ("john jane", []),
+        ]:
+            with self.subTest(query=query):
+                self.assertEqual(self._search(query), expected)
+
+    def test_fuzzy(self):
+        john = self._create_member("John", "Doe")
+        jonathan = self._create_member("Jonathan", "Smith")
+
+        for query in ["jhon", "jahn", "johnn"]:
+            with self.subTest(query=query):
+                self.assertIn(john, self._search(query))
+        # Short keywords are only matched as prefixes
+        self.assertEqual(self._search("jon"), [jonathan])
+        self.assertEqual(self._search("jonh"), [john])
+        self.assertEqual(self._search("smiht"), [jonathan])
+        self.assertEqual(self._search("smooth"), [])
+
+    def test_ranking(self):
+        word = self._create_member("Anna", "Berg")
+        prefix = self._create_member("Anna", "Bergman")
+        substring = self._create_member("Anna", "Ijsberg")
+        fuzzy = self._create_member("Anna", "Borg")
+
+        members = self._search("berg")
+        self.assertEqual(members, [word, prefix, substring, fuzzy])
+        self.assertEqual([member.search_rank for member in members], [3, 2, 1, 0])
+
+    def test_index_updated(self):
+        member = self._create_member("John", "Doe", "Johnny")
+        member.last_name = "Smith"
+        member.save()
+        self.assertEqual(self._search("smith"), [member])
+        self.assertEqual(self._search("doe"), [])
+
+        member.profile.display_name_preference = "nickname"
+        member.profile.save()
+        self.assertEqual(self._search("johnny"), [member])
+
+        # Logging in does not change the index
+        with self.assertNumQueries(1):
+            member.save(update_fields=["last_login"])
@@ -100,19 +100,6 @@ class MembersIndex(ListView):
             memberships_query = Q(until__gt=datetime.now().date()) | Q(until=None)
             memberships_query &= Q(type=Membership.HONORARY)
 
-        if self.keywords:
-            for key in self.keywords:
-                # Works because relevant options all have `nick` in their key
-                members_query &= (
-                    (
-                        Q(profile__nickname__icontains=key)
-                        & Q(profile__display_name_preference__contains="nick")
-                    )
-                    | Q(first_name__icontains=key)
-                    | Q(last_name__icontains=key)
-                    | Q(username__icontains=key)
-                )
-
         if self.query_filter == "former":
             memberships_query = Q(type=Membership.MEMBER) | Q(type=Membership.HONORARY)
             memberships = Membership.objects.filter(memberships_query)
@@ -125,7 +112,10 @@ class MembersIndex(ListView):
         else:
             memberships = Membership.objects.filter(memberships_query)
             members_query &= Q(pk__in=memberships.values("user__pk"))
-        return Member.objects.filter(members_query).order_by("first_name")
+        members = Member.objects.filter(members_query)
+        if self.keywords:
+            return services.search_members(members, " ".join(self.keywords))
+        return members.order_by("first_name")
 
     def get_context_data(self, **kwargs) -> dict:
         context = super().get_context_data(**kwargs)
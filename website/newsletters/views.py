@@ -6,11 +6,11 @@ from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import permission_required
 from django.shortcuts import get_object_or_404, redirect, render
 from django.utils.translation import activate, get_language_info
-from django_sendfile import sendfile
 
 from newsletters import services
 from newsletters.models import Newsletter
 from partners.models import Partner
+from utils.media.sendfile import sendfile
 
 
 def preview(request, pk, lang=None):
@@ -1,8 +1,10 @@
 from django.contrib import admin
 from django.contrib import messages
 from django.db.models import Count
+from django.urls import path
 from django.utils.translation import gettext_lazy as _
 
+from photos import admin_views
 from utils.translation import TranslatedModelAdmin
 from .forms import AlbumForm
 from .models import Album, Photo
@@ -11,7 +13,16 @@ from .services import extract_archive, save_photo
 
 class AlbumAdmin(TranslatedModelAdmin):
     list_display = ("title", "date", "num_photos", "hidden", "shareable")
-    fields = ("title", "slug", "date", "hidden", "shareable", "album_archive", "_cover")
+    fields = (
+        "title",
+        "slug",
+        "date",
+        "hidden",
+        "shareable",
+        "album_archive",
+        "skip_near_duplicates",
+        "_cover",
+    )
     search_fields = ("title", "date")
     list_filter = ("hidden", "shareable")
     date_hierarchy = "date"
@@ -33,7 +44,12 @@ class AlbumAdmin(TranslatedModelAdmin):
 
         archive = form.cleaned_data.get("album_archive", None)
         if archive is not None:
-            extract_archive(request, obj, archive)
+            extract_archive(
+                request,
+                obj,
+                archive,
+                form.cleaned_data.get("skip_near_duplicates", False),
+            )
 
             messages.add_message(
                 request,
@@ -48,6 +64,19 @@ class PhotoAdmin(admin.ModelAdmin):
     list_filter = ("album", "hidden")
     exclude = ("_digest",)
 
+    def get_urls(self):
+        urls = super().get_urls()
+        custom_urls = [
+            path(
+                "near-duplicates/",
+                self.admin_site.admin_view(
+                    admin_views.NearDuplicatesView.as_view(admin=self)
+                ),
+                name="photos_photo_near_duplicates",
+            ),
+        ]
+        return custom_urls + urls
+
     def save_model(self, request, obj, form, change):
         super().save_model(request, obj, form, change)
         if change and obj.original_file == obj.file.path:
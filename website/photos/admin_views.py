@@ -0,0 +1,39 @@
+"""Admin views provided by the photos package"""
+from django.contrib.admin.views.decorators import staff_member_required
+from django.contrib.auth.decorators import permission_required
+from django.utils.decorators import method_decorator
+from django.utils.translation import gettext_lazy as _
+from django.views.generic import TemplateView
+
+from photos.models import Photo
+from photos.services import find_near_duplicates
+
+
+@method_decorator(staff_member_required, "dispatch")
+@method_decorator(permission_required("photos.change_photo"), "dispatch")
+class NearDuplicatesView(TemplateView):
+    """
+    Renders a report of all pairs of photos that look alike
+    """
+
+    template_name = "photos/admin/near_duplicates.html"
+    admin = None
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        pairs = find_near_duplicates(Photo.objects.all())
+        photos = Photo.objects.select_related("album").in_bulk(
+            {pk for first, second, _distance in pairs for pk in (first, second)}
+        )
+        context.update(
+            {
+                **self.admin.admin_site.each_context(self.request),
+                "opts": Photo._meta,
+                "title": _("Near-duplicate photos"),
+                "pairs": [
+                    (photos[first], photos[second], distance)
+                    for first, second, distance in pairs
+                ],
+            }
+        )
+        return context
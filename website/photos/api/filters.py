@@ -0,0 +1,11 @@
+from rest_framework import filters
+
+from photos import services
+
+
+class AlbumSearchFilter(filters.SearchFilter):
+    """Searches albums with the search index of the albums"""
+
+    def filter_queryset(self, request, queryset, view):
+        query = " ".join(self.get_search_terms(request))
+        return services.search_albums(queryset, query)
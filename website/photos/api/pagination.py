@@ -0,0 +1,20 @@
+from rest_framework.pagination import Cursor, CursorPagination
+
+
+class AlbumPhotosPagination(CursorPagination):
+    """Pages through the photos of an album in the order of their files"""
+
+    page_size = 48
+    ordering = "file"
+
+    def get_link_after(self, url, photo):
+        """
+        Get the link to the page that follows a photo
+        :param url: the url of the photos of the album
+        :param photo: the last photo that was already shown
+        :return: the url of the next page
+        """
+        self.base_url = url
+        return self.encode_cursor(
+            Cursor(offset=0, reverse=False, position=photo.file.name)
+        )
@@ -1,3 +1,4 @@
+from django.urls import reverse
 from rest_framework import serializers
 
 from thaliawebsite.api.services import create_image_thumbnail_dict
@@ -18,7 +19,45 @@ class PhotoRetrieveSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Photo
-        fields = ("pk", "rotation", "hidden", "album", "file")
+        fields = (
+            "pk",
+            "rotation",
+            "hidden",
+            "album",
+            "file",
+            "width",
+            "height",
+            "taken_at",
+            "file_size",
+        )
+
+
+class AlbumPhotoSerializer(PhotoRetrieveSerializer):
+    """Serializes the photos of a single album, which is in the context"""
+
+    download = serializers.SerializerMethodField("_download")
+
+    def _download(self, obj):
+        album = self.context["album"]
+        if album.shareable:
+            url = reverse(
+                "photos:shared-download", args=[album.slug, album.access_token, obj]
+            )
+        else:
+            url = reverse("photos:download", args=[album.slug, obj])
+        return self.context["request"].build_absolute_uri(url)
+
+    class Meta:
+        model = Photo
+        fields = (
+            "pk",
+            "rotation",
+            "file",
+            "download",
+            "width",
+            "height",
+            "taken_at",
+        )
 
 
 class PhotoCreateSerializer(serializers.ModelSerializer):
@@ -65,8 +104,20 @@ class AlbumListSerializer(serializers.ModelSerializer):
     accessible = serializers.SerializerMethodField("_accessible")
 
     def _accessible(self, obj):
+        # Use the annotation of get_annotated_accessible_albums if possible
+        if hasattr(obj, "accessible"):
+            return obj.accessible
         return services.is_album_accessible(self.context["request"], obj)
 
     class Meta:
         model = Album
-        fields = ("pk", "title", "date", "hidden", "shareable", "accessible", "cover")
+        fields = (
+            "pk",
+            "title",
+            "date",
+            "hidden",
+            "shareable",
+            "accessible",
+            "cover",
+            "photo_count",
+        )
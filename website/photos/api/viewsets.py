@@ -1,23 +1,26 @@
-from rest_framework import permissions, filters
-from rest_framework.exceptions import PermissionDenied
+from rest_framework import permissions
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotAuthenticated, PermissionDenied
 from rest_framework.mixins import CreateModelMixin, UpdateModelMixin
 from rest_framework.viewsets import ModelViewSet, GenericViewSet
 
 from photos import services
 from photos.api import serializers
+from photos.api.filters import AlbumSearchFilter
+from photos.api.pagination import AlbumPhotosPagination
 from photos.models import Album, Photo
 
 
 class AlbumsViewSet(ModelViewSet):
     permission_classes = (permissions.IsAuthenticated,)
     queryset = Album.objects.all()
-    filter_backends = (filters.SearchFilter,)
-    search_fields = ("title_en", "title_nl", "date", "slug")
+    filter_backends = (AlbumSearchFilter,)
 
     def get_queryset(self):
-        return services.get_annotated_accessible_albums(
-            self.request, Album.objects.all()
-        )
+        albums = Album.objects.all()
+        if self.action == "list":
+            albums = albums.select_related("_cover", "default_cover")
+        return services.get_annotated_accessible_albums(self.request, albums)
 
     def create(self, request, *args, **kwargs):
         if self.request.user.has_perm("photos.create_album"):
@@ -34,6 +37,32 @@ class AlbumsViewSet(ModelViewSet):
             return serializers.AlbumListSerializer
         return serializers.AlbumSerializer
 
+    @action(
+        detail=True,
+        permission_classes=(permissions.AllowAny,),
+        pagination_class=AlbumPhotosPagination,
+    )
+    def photos(self, request, pk=None, **kwargs):
+        """
+        The visible photos of an album, one page at a time.
+        Shared albums can be viewed by anyone with the `token`.
+        """
+        album = self.get_object()
+        token = request.query_params.get("token")
+        if token is not None:
+            services.check_shared_album_token(album, token)
+        elif not request.user.is_authenticated:
+            raise NotAuthenticated
+        elif not services.is_album_accessible(request, album):
+            raise PermissionDenied
+
+        photos = album.photo_set.filter(hidden=False)
+        page = self.paginate_queryset(photos)
+        serializer = serializers.AlbumPhotoSerializer(
+            page, many=True, context={"request": request, "album": album}
+        )
+        return self.get_paginated_response(serializer.data)
+
 
 class PhotosViewSet(GenericViewSet, CreateModelMixin, UpdateModelMixin):
     queryset = Photo.objects.all()
@@ -20,5 +20,14 @@ class AlbumForm(forms.ModelForm):
         validators=[ArchiveFileTypeValidator()],
     )
 
+    skip_near_duplicates = forms.BooleanField(
+        required=False,
+        label=_("Skip near-duplicates"),
+        help_text=_(
+            "Also skip uploaded photos that look like a photo in any album, "
+            "such as recompressed or resized copies."
+        ),
+    )
+
     class Meta:
         exclude = ["dirname"]
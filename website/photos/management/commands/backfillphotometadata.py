@@ -0,0 +1,111 @@
+"""
+Provides the command to store the metadata of existing photos
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from PIL import Image, UnidentifiedImageError
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from photos.models import Photo
+from photos.services import get_photo_metadata
+
+HEADER_FIELDS = ["width", "height", "taken_at", "file_size"]
+
+
+def read_photo_metadata(photos):
+    """
+    Read the metadata of the files of stored photos
+
+    Only the headers of the files are read, unless the perceptual hash is
+    needed, which decodes the whole image. This does not touch the
+    database, so it is safe to run in a separate process.
+    :param photos: list of tuples of the pk and file path of photos and
+                   whether their perceptual hash is needed
+    :return: tuple of a list of (pk, metadata) and the paths of the
+             files that could not be read
+    """
+    results = []
+    failed = []
+    for pk, path, perceptual_hash in photos:
+        try:
+            with Image.open(path) as image:
+                metadata = get_photo_metadata(
+                    image, image, os.path.getsize(path), perceptual_hash
+                )
+                results.append((pk, metadata))
+        except (OSError, UnidentifiedImageError):
+            failed.append(path)
+    return results, failed
+
+
+class Command(BaseCommand):
+    """Command to store the metadata of photos uploaded before it was stored"""
+
+    help = (
+        "Stores the dimensions, capture time, file size and perceptual hash "
+        "of photos that do not have them yet. Albums are processed in parallel."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            default=False,
+            help="Also read the metadata of photos that already have it",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Number of worker processes, defaults to the number of CPUs",
+        )
+
+    def handle(self, *args, **options):
+        photos = Photo.objects.all()
+        if not options["all"]:
+            photos = photos.filter(Q(width__isnull=True) | Q(perceptual_hash=""))
+
+        albums = {}
+        for pk, album, name, perceptual_hash in photos.values_list(
+            "pk", "album", "file", "perceptual_hash"
+        ):
+            albums.setdefault(album, []).append(
+                (pk, default_storage.path(name), options["all"] or not perceptual_hash,)
+            )
+        total = sum(len(album) for album in albums.values())
+
+        start = time.monotonic()
+        done = 0
+        stored = 0
+        with ProcessPoolExecutor(max_workers=options["workers"]) as executor:
+            futures = [
+                executor.submit(read_photo_metadata, album) for album in albums.values()
+            ]
+            for future in as_completed(futures):
+                results, failed = future.result()
+                for path in failed:
+                    self.stderr.write(f"Could not read {path}")
+
+                # Photos that only needed their headers keep their hash
+                updated = {False: [], True: []}
+                for pk, metadata in results:
+                    updated["perceptual_hash" in metadata].append(
+                        Photo(pk=pk, **metadata)
+                    )
+                Photo.objects.bulk_update(updated[False], HEADER_FIELDS)
+                Photo.objects.bulk_update(
+                    updated[True], HEADER_FIELDS + ["perceptual_hash"]
+                )
+                stored += len(results)
+
+                done += len(results) + len(failed)
+                self.stdout.write(f"Processed {done}/{total} photos")
+
+        self.stdout.write(
+            f"Stored the metadata of {stored} photos in "
+            f"{time.monotonic() - start:.1f} seconds"
+        )
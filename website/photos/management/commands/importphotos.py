@@ -1,52 +1,160 @@
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 
-from django.core.files import File
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.utils.dateparse import parse_date
 from django.utils.text import slugify
 
-from photos.models import Album, Photo
+from photos.models import Album
+from photos.services import save_photos_pipelined
+
+# Name of the file in an album folder that lists the imported files
+CHECKPOINT_FILENAME = ".importphotos"
 
 
 class Command(BaseCommand):
     help = (
-        "Imports a photo album based on a directory of images. "
-        "This is done per album, to avoid having to have sufficient "
-        "storage space available for two copies of every album."
+        "Imports photo albums based on directories of images. "
+        "The photos of all albums are processed in a pool of worker "
+        "processes. Every handled file is recorded in a checkpoint file "
+        "in its directory, so an interrupted import continues where it "
+        "stopped when it is run again."
     )
 
     def add_arguments(self, parser):
-        parser.add_argument("folder", help="Specify album folder.")
+        parser.add_argument(
+            "folders",
+            nargs="+",
+            help="Album folders, named like `album_20180905_Title`",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Number of worker processes, defaults to the number of CPUs",
+        )
 
     def handle(self, *args, **options):
-        if not os.path.isdir(options["folder"]):
-            raise Exception("You must specify a directory to import")
+        for folder in options["folders"]:
+            if not os.path.isdir(folder):
+                raise CommandError(f"{folder} is not a directory")
 
-        foldername = os.path.relpath(options["folder"])
-        album, date, title = foldername.split("_", maxsplit=2)
-        date = parse_date("{}-{}-{}".format(date[:4], date[4:6], date[6:]))
-        slug = slugify("-".join([str(date), title]))
+        workers = options["workers"] or os.cpu_count() or 1
+        start = time.monotonic()
+        total_files = 0
+        total_bytes = 0
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for folder in options["folders"]:
+                files, size = self._import_album(executor, workers, folder)
+                total_files += files
+                total_bytes += size
 
-        if Album.objects.filter(title=title, date=date).exists():
+        if len(options["folders"]) > 1:
             self.stdout.write(
-                "An album with title ({}) and"
-                " date ({}) already exists.".format(title, date)
+                "Processed {} files from {} folders{}".format(
+                    total_files,
+                    len(options["folders"]),
+                    self._throughput(total_files, total_bytes, start),
+                )
             )
-            return
+
+    def _throughput(self, files, size, start):
+        duration = max(time.monotonic() - start, 1e-6)
+        return " in {:.1f} seconds ({:.1f} files/s, {:.1f} MB/s)".format(
+            duration, files / duration, size / duration / 1024 / 1024
+        )
+
+    def _get_album(self, folder, checkpoint_path):
+        foldername = os.path.basename(os.path.normpath(folder))
+        _album, date, title = foldername.split("_", maxsplit=2)
+        date = parse_date("{}-{}-{}".format(date[:4], date[4:6], date[6:]))
+        slug = slugify("-".join([str(date), title]))
+
+        album = Album.objects.filter(title_en=title, date=date).first()
+        if album is not None:
+            if not os.path.exists(checkpoint_path):
+                self.stdout.write(
+                    "An album with title ({}) and"
+                    " date ({}) already exists.".format(title, date)
+                )
+                return None
+            self.stdout.write("Resuming album '{}' ({})".format(title, str(date)))
+            return album
 
         self.stdout.write("Importing album '{}' ({})".format(title, str(date)))
-        album = Album(title=title, date=date, slug=slug)
+        album = Album(title_en=title, title_nl=title, date=date, slug=slug)
         album.save()
+        # Create the checkpoint right away, so the import of this
+        # album is resumed if it is interrupted before the first photo
+        open(checkpoint_path, "a").close()
+        return album
 
-        n = 0
-        for filename in os.listdir(options["folder"]):
-            try:
-                photo = Photo(album=album)
-                file = open(os.path.join(options["folder"], filename), "rb")
-                photo.file.save(filename, File(file))
-                photo.save()
-                n += 1
-            except Exception:
-                self.stdout.write("Could not import {}".format(filename))
-
-        self.stdout.write("Imported {} photos from {}".format(n, options["folder"]))
+    def _import_album(self, executor, workers, folder):
+        """
+        Import the files of a folder that have not been imported yet
+        :return: tuple of the number of files and bytes that were read
+        """
+        checkpoint_path = os.path.join(folder, CHECKPOINT_FILENAME)
+        album = self._get_album(folder, checkpoint_path)
+        if album is None:
+            return 0, 0
+
+        with open(checkpoint_path) as checkpoint:
+            done = {line.rstrip("\n") for line in checkpoint}
+        filenames = [
+            filename
+            for filename in sorted(os.listdir(folder))
+            if not filename.startswith(".")
+            and filename not in done
+            and os.path.isfile(os.path.join(folder, filename))
+        ]
+        if done:
+            self.stdout.write(
+                "Skipping {} files that were imported before".format(len(done))
+            )
+
+        start = time.monotonic()
+        read_files = 0
+        read_bytes = 0
+        imported = 0
+
+        def read():
+            nonlocal read_files, read_bytes
+            for filename in filenames:
+                try:
+                    with open(os.path.join(folder, filename), "rb") as file:
+                        data = file.read()
+                except OSError:
+                    report(filename, "Could not import {}".format(filename))
+                    continue
+                read_files += 1
+                read_bytes += len(data)
+                yield filename, data
+
+        with open(checkpoint_path, "a") as checkpoint:
+
+            def report(filename, warning):
+                nonlocal imported
+                if warning is None:
+                    imported += 1
+                else:
+                    self.stdout.write(warning)
+                checkpoint.write(filename + "\n")
+                checkpoint.flush()
+
+            save_photos_pipelined(
+                executor,
+                album,
+                read(),
+                len(filenames),
+                report,
+                max_pending=2 * workers,
+            )
+
+        self.stdout.write(
+            "Imported {} photos from {}{}".format(
+                imported, folder, self._throughput(read_files, read_bytes, start)
+            )
+        )
+        return read_files, read_bytes
@@ -0,0 +1,33 @@
+# Generated by Django 3.0.6 on 2026-10-18 17:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('photos', '0011_album_new_album_notification'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photo',
+            name='file_size',
+            field=models.PositiveIntegerField(editable=False, null=True, verbose_name='file size'),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='height',
+            field=models.PositiveIntegerField(editable=False, null=True, verbose_name='height'),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='taken_at',
+            field=models.DateTimeField(editable=False, null=True, verbose_name='taken at'),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='width',
+            field=models.PositiveIntegerField(editable=False, null=True, verbose_name='width'),
+        ),
+    ]
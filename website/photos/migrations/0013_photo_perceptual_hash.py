@@ -0,0 +1,18 @@
+# Generated by Django 3.0.6 on 2026-10-18 17:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('photos', '0012_photo_metadata'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photo',
+            name='perceptual_hash',
+            field=models.CharField(blank=True, editable=False, max_length=16, verbose_name='perceptual hash'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 3.0.6 on 2026-10-18 17:15
+
+import os
+
+from django.db import migrations, models
+
+
+def initialise_photo_sequence(apps, schema_editor):
+    """Continue after the highest number that is in use in every album"""
+    Album = apps.get_model("photos", "Album")
+    Photo = apps.get_model("photos", "Photo")
+    for album in Album.objects.all():
+        sequence = 0
+        for name in Photo.objects.filter(album=album).values_list("file", flat=True):
+            number = os.path.splitext(os.path.basename(name))[0]
+            if number.isdigit():
+                sequence = max(sequence, int(number) + 1)
+        sequence = max(sequence, Photo.objects.filter(album=album).count())
+        Album.objects.filter(pk=album.pk).update(photo_sequence=sequence)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('photos', '0013_photo_perceptual_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='album',
+            name='photo_sequence',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='photo sequence'),
+        ),
+        migrations.RunPython(initialise_photo_sequence, migrations.RunPython.noop),
+    ]
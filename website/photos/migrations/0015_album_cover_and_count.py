@@ -0,0 +1,48 @@
+# Generated by Django 3.0.6 on 2026-10-18 17:19
+
+import random
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def compute_album_summaries(apps, schema_editor):
+    """Store the photo count and pick the same cover as before for every album"""
+    Album = apps.get_model("photos", "Album")
+    Photo = apps.get_model("photos", "Photo")
+    for album in Album.objects.all():
+        photos = list(
+            Photo.objects.filter(album=album).order_by("file").values_list(
+                "pk", "hidden"
+            )
+        )
+        visible = [pk for pk, hidden in photos if not hidden]
+        cover = None
+        if photos:
+            cover = random.Random(album.dirname).choice(photos)[0]
+            if cover not in visible:
+                cover = random.Random(album.dirname).choice(visible) if visible else None
+        Album.objects.filter(pk=album.pk).update(
+            default_cover=cover, photo_count=len(visible)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('photos', '0014_album_photo_sequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='album',
+            name='default_cover',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='photos.Photo', verbose_name='default cover image'),
+        ),
+        migrations.AddField(
+            model_name='album',
+            name='photo_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='number of visible photos'),
+        ),
+        migrations.RunPython(compute_album_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 3.0.6 on 2026-10-18 17:26
+
+import re
+import unicodedata
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# A copy of the tokenizer of utils.search when this migration was written,
+# so the index it builds does not change with the tokenizer
+WORD_PATTERN = re.compile(r"[^\W_]+(?:-[^\W_]+)*")
+MAX_TERM_LENGTH = 64
+
+
+def normalize(text):
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def tokenize(text):
+    return [word[:MAX_TERM_LENGTH] for word in WORD_PATTERN.findall(normalize(text))]
+
+
+def get_index_terms(texts):
+    words = set()
+    for text in texts:
+        words.update(tokenize(text))
+
+    terms = {(word, False) for word in words}
+    for word in words:
+        for start in range(1, len(word)):
+            if word[start] != "-" and (word[start:], False) not in terms:
+                terms.add((word[start:], True))
+    return terms
+
+
+def build_search_index(apps, schema_editor):
+    """Add the search terms of all existing albums"""
+    Album = apps.get_model("photos", "Album")
+    AlbumSearchTerm = apps.get_model("photos", "AlbumSearchTerm")
+    for album in Album.objects.all():
+        terms = get_index_terms([album.title_en or "", album.title_nl or ""])
+        terms.add((album.date.isoformat(), False))
+        AlbumSearchTerm.objects.bulk_create(
+            [
+                AlbumSearchTerm(album=album, term=term, suffix=suffix)
+                for term, suffix in terms
+            ]
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('photos', '0015_album_cover_and_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlbumSearchTerm',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(db_index=True, max_length=64, verbose_name='term')),
+                ('suffix', models.BooleanField(default=False, help_text='Whether the term is the end of a word instead of a word.', verbose_name='suffix')),
+                ('album', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='photos.Album', verbose_name='album')),
+            ],
+            options={
+                'verbose_name': 'album search term',
+                'verbose_name_plural': 'album search terms',
+            },
+        ),
+        migrations.RunPython(build_search_index, migrations.RunPython.noop),
+    ]
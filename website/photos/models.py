@@ -1,13 +1,12 @@
 import hashlib
 import logging
 import os
-import random
 
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
 from django.urls import reverse
 from django.utils import timezone
-from django.utils.functional import cached_property
 from django.utils.translation import gettext_lazy as _
 
 from members.models import Member
@@ -21,7 +20,9 @@ logger = logging.getLogger(__name__)
 
 
 def photo_uploadto(instance, filename):
-    num = instance.album.photo_set.count()
+    num = instance.file_number
+    if num is None:
+        num = instance.album.allocate_photo_numbers()[0]
     extension = os.path.splitext(filename)[1]
     new_filename = str(num).zfill(4) + extension
     return os.path.join(Album.photosdir, instance.album.dirname, new_filename)
@@ -46,8 +47,29 @@ class Photo(models.Model):
 
     _digest = models.CharField("digest", max_length=40,)
 
+    perceptual_hash = models.CharField(
+        "perceptual hash", max_length=16, blank=True, editable=False
+    )
+
+    width = models.PositiveIntegerField(_("width"), null=True, editable=False)
+
+    height = models.PositiveIntegerField(_("height"), null=True, editable=False)
+
+    taken_at = models.DateTimeField(_("taken at"), null=True, editable=False)
+
+    file_size = models.PositiveIntegerField(_("file size"), null=True, editable=False)
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        # Number used for the filename of a new file, allocated in bulk when
+        # adding many photos. A number is allocated on upload if it is None.
+        self.file_number = None
+        # The album and visibility as stored, to update the album summary.
+        # Deferred fields are not loaded for this, they are None.
+        self.stored_album_state = (
+            self.__dict__.get("album_id"),
+            self.__dict__.get("hidden"),
+        )
         if self.file:
             self.original_file = self.file.path
         else:
@@ -86,18 +108,38 @@ class Album(models.Model, metaclass=ModelTranslateMeta):
 
     shareable = models.BooleanField(verbose_name=_("shareable"), default=False)
 
+    default_cover = models.ForeignKey(
+        Photo,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        editable=False,
+        related_name="+",
+        verbose_name=_("default cover image"),
+    )
+
+    photo_count = models.PositiveIntegerField(
+        verbose_name=_("number of visible photos"), default=0, editable=False
+    )
+
+    photo_sequence = models.PositiveIntegerField(
+        verbose_name=_("photo sequence"), default=0, editable=False
+    )
+
+    computed_fields = ("photo_sequence", "default_cover", "photo_count")
+
     photosdir = "photos"
     photospath = os.path.join(settings.MEDIA_ROOT, photosdir)
 
-    @cached_property
+    @property
     def cover(self):
-        cover = None
+        """
+        The cover image that was chosen, or a random photo of the album
+        :return: the photo, or None if there are no visible photos
+        """
         if self._cover is not None:
             return self._cover
-        elif self.photo_set.exists():
-            random.seed(self.dirname)
-            cover = random.choice(self.photo_set.all())
-        return cover
+        return self.default_cover
 
     def __str__(self):
         return "{} {}".format(self.date.strftime("%Y-%m-%d"), self.title)
@@ -105,10 +147,36 @@ class Album(models.Model, metaclass=ModelTranslateMeta):
     def get_absolute_url(self):
         return reverse("photos:album", args=[str(self.slug)])
 
+    def allocate_photo_numbers(self, count=1):
+        """
+        Reserve the numbers for the filenames of new photos
+
+        The sequence is incremented atomically in the database,
+        so concurrent uploads never get the same numbers.
+        :param count: the number of photos
+        :return: range of the reserved numbers
+        """
+        with transaction.atomic():
+            Album.objects.filter(pk=self.pk).update(
+                photo_sequence=F("photo_sequence") + count
+            )
+            self.photo_sequence = Album.objects.values_list(
+                "photo_sequence", flat=True
+            ).get(pk=self.pk)
+        return range(self.photo_sequence - count, self.photo_sequence)
+
     def save(self, *args, **kwargs):
         # dirname is only set for new objects, to avoid ever changing it
         if self.pk is None:
             self.dirname = self.slug
+        elif not self._state.adding and kwargs.get("update_fields") is None:
+            # These fields are only changed with queries that update them in
+            # place, an outdated instance must never overwrite them
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.computed_fields
+            ]
 
         if not self.hidden and (
             self.new_album_notification is None or not self.new_album_notification.sent
@@ -157,3 +225,29 @@ class Album(models.Model, metaclass=ModelTranslateMeta):
 
     class Meta:
         ordering = ("-date", "title_en")
+
+
+class AlbumSearchTerm(models.Model):
+    """A term in the search index of the albums, see `utils.search`"""
+
+    album = models.ForeignKey(
+        Album,
+        on_delete=models.CASCADE,
+        related_name="search_terms",
+        verbose_name=_("album"),
+    )
+
+    term = models.CharField(verbose_name=_("term"), max_length=64, db_index=True)
+
+    suffix = models.BooleanField(
+        verbose_name=_("suffix"),
+        help_text=_("Whether the term is the end of a word instead of a word."),
+        default=False,
+    )
+
+    def __str__(self):
+        return self.term
+
+    class Meta:
+        verbose_name = _("album search term")
+        verbose_name_plural = _("album search terms")
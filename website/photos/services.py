@@ -1,47 +1,56 @@
 import hashlib
 import logging
+import multiprocessing
 import os
+import random
+import sys
 import tarfile
-from zipfile import ZipInfo, is_zipfile, ZipFile
+import tempfile
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from zipfile import ZipInfo, is_zipfile, ZipFile, ZIP_STORED
 
+import django
 from django.conf import settings
 from django.contrib import messages
 from django.core.files import File
-from django.db.models import When, Value, BooleanField, ExpressionWrapper, Q, Case
+from django.core.files.base import ContentFile
+from django.db.models import (
+    When,
+    Value,
+    BooleanField,
+    ExpressionWrapper,
+    Case,
+    F,
+    OuterRef,
+    Q,
+    Subquery,
+)
 from django.http import Http404
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
-from PIL.JpegImagePlugin import JpegImageFile
-from PIL import ExifTags, Image, UnidentifiedImageError
-
-from photos.models import Photo
+from PIL import Image, UnidentifiedImageError
+
+from members.services import get_membership_periods, in_periods, periods_filter
+from photos.models import Album, AlbumSearchTerm, Photo
+from utils.media.images import (
+    get_exif_taken_at,
+    get_perceptual_hash,
+    resize_image,
+)
+from utils.media.services import pregenerate_thumbnails
+from utils.search import (
+    get_index_terms,
+    get_keyword_filter,
+    get_keyword_rank,
+    tokenize,
+)
 
 logger = logging.getLogger(__name__)
 
 
-def photo_determine_rotation(pil_image):
-    EXIF_ORIENTATION = {
-        1: 0,
-        2: 0,
-        3: 180,
-        4: 180,
-        5: 90,
-        6: 90,
-        7: 270,
-        8: 270,
-    }
-
-    if isinstance(pil_image, JpegImageFile) and pil_image._getexif():
-        exif = {
-            ExifTags.TAGS[k]: v
-            for k, v in pil_image._getexif().items()
-            if k in ExifTags.TAGS
-        }
-        if exif.get("Orientation"):
-            return EXIF_ORIENTATION[exif.get("Orientation")]
-    return 0
-
-
 def check_shared_album_token(album, token):
     if token != album.access_token:
         raise Http404("Invalid token.")
@@ -53,8 +62,7 @@ def is_album_accessible(request, album):
     elif request.member and request.member.current_membership is None:
         # This user is currently not a member, so need to check if he/she
         # can view this album by checking the membership
-        filter = Q(since__lte=album.date) & Q(until__gte=album.date)
-        return request.member.membership_set.filter(filter).count() > 0
+        return in_periods(get_membership_periods(request.member), album.date)
     return False
 
 
@@ -65,12 +73,7 @@ def get_annotated_accessible_albums(request, albums):
             accessible=ExpressionWrapper(Value(True), output_field=BooleanField())
         )
     elif request.member and request.member.current_membership is None:
-        albums_filter = Q(pk__in=[])
-        for membership in request.member.membership_set.all():
-            albums_filter |= Q(date__gte=membership.since) & Q(
-                date__lte=membership.until
-            )
-
+        albums_filter = periods_filter(get_membership_periods(request.member), "date")
         albums = albums.annotate(
             accessible=Case(
                 When(albums_filter, then=Value(True)),
@@ -86,51 +89,223 @@ def get_annotated_accessible_albums(request, albums):
     return albums
 
 
-def extract_archive(request, album, archive):
+def update_album_summary(album_pk):
+    """
+    Compute the number of visible photos and the default cover of an album
+
+    The default cover is a random visible photo, which stays the
+    cover as long as it is visible. This reads all photos of the album,
+    changes to single photos use :func:`change_album_summary`.
+    :param album_pk: the primary key of the album
+    """
+    album = Album.objects.filter(pk=album_pk).values("dirname", "default_cover")
+    album = album.first()
+    if album is None:
+        return
+
+    photos = list(
+        Photo.objects.filter(album=album_pk, hidden=False)
+        .order_by("file")
+        .values_list("pk", flat=True)
+    )
+    cover = album["default_cover"]
+    if cover not in photos:
+        cover = random.Random(album["dirname"]).choice(photos) if photos else None
+
+    Album.objects.filter(pk=album_pk).update(
+        default_cover=cover, photo_count=len(photos)
+    )
+
+
+def change_album_summary(album_pk, difference, removed_pk=None):
+    """
+    Change the number of visible photos of an album without counting them,
+    and replace the default cover if it is not visible anymore
+
+    :param album_pk: the primary key of the album
+    :param difference: the number of photos that became visible, negative
+                       if photos were hidden or removed
+    :param removed_pk: the primary key of the photo that was hidden or
+                       removed, or None
+    """
+    replace = Q(default_cover=None)
+    if removed_pk is not None:
+        replace |= Q(default_cover=removed_pk)
+    first_visible = (
+        Photo.objects.filter(album=album_pk, hidden=False)
+        .order_by("file")
+        .values("pk")[:1]
+    )
+    Album.objects.filter(pk=album_pk).update(
+        photo_count=F("photo_count") + difference,
+        default_cover=Case(
+            When(replace, then=Subquery(first_visible)), default=F("default_cover")
+        ),
+    )
+
+
+def update_album_summary_on_save(photo, created):
+    """
+    Update the summaries of the albums of a saved photo, if it was added
+    to, moved between or hidden in albums
+    :param photo: the saved photo
+    :param created: True if the photo is new
+    """
+    if created:
+        album_pk, hidden = None, True
+    else:
+        album_pk, hidden = photo.stored_album_state
+    photo.stored_album_state = (photo.album_id, photo.hidden)
+
+    if hidden is None or (album_pk is None and not created):
+        # The photo was loaded without these fields
+        update_album_summary(photo.album_id)
+        return
+
+    was_visible = not hidden
+    is_visible = not photo.hidden
+    moved = album_pk != photo.album_id
+    if was_visible and (moved or not is_visible):
+        change_album_summary(album_pk, -1, photo.pk)
+    if is_visible and (moved or not was_visible):
+        change_album_summary(photo.album_id, 1)
+
+
+def update_album_summary_on_delete(photo):
+    """
+    Update the summary of the album of a deleted photo
+    :param photo: the deleted photo
+    """
+    album_pk, hidden = photo.stored_album_state
+    if hidden is None or album_pk is None:
+        # The photo was loaded without these fields
+        update_album_summary(photo.album_id)
+    elif not hidden:
+        change_album_summary(album_pk, -1, photo.pk)
+
+
+def update_album_search_index(album):
+    """
+    Update the search terms of an album to match its titles and date
+    :param album: the album
+    """
+    # Dates are only indexed as a whole, so they can be found by their
+    # prefix like 2018-09, but a single digit does not match every date
+    date = Album._meta.get_field("date").to_python(album.date)
+    terms = get_index_terms([album.title_en or "", album.title_nl or ""])
+    terms.add((date.isoformat(), False))
+    existing = set(album.search_terms.values_list("term", "suffix"))
+
+    removed = existing - terms
+    if removed:
+        album.search_terms.filter(term__in=[term for term, _ in removed]).delete()
+    AlbumSearchTerm.objects.bulk_create(
+        [
+            AlbumSearchTerm(album=album, term=term, suffix=suffix)
+            for term, suffix in terms - existing
+        ]
+    )
+
+
+def search_albums(albums, query):
+    """
+    Find the albums whose titles or date contain every keyword of a query
+
+    Albums are ordered by relevance: keywords that are complete words rank
+    higher than keywords that start a word, which rank higher than keywords
+    in the middle of a word. Albums with the same rank are ordered by date.
+    :param albums: the queryset of albums to search in
+    :param query: the keywords separated by spaces
+    :return: the filtered and ordered queryset, every album is annotated
+             with its `search_rank`
+    """
+    keywords = list(dict.fromkeys(tokenize(query)))
+    if not keywords:
+        return albums
+
+    terms = AlbumSearchTerm.objects.filter(album=OuterRef("pk"))
+    ranks = {}
+    for index, keyword in enumerate(keywords):
+        albums = albums.filter(
+            pk__in=AlbumSearchTerm.objects.filter(get_keyword_filter(keyword)).values(
+                "album"
+            )
+        )
+        ranks[f"search_rank_{index}"] = get_keyword_rank(terms, keyword)
+
+    return (
+        albums.annotate(**ranks)
+        .annotate(search_rank=sum(F(name) for name in ranks))
+        .order_by("-search_rank", "-date")
+    )
+
+
+def extract_archive(request, album, archive, skip_near_duplicates=False):
+    """
+    Add the photos in a zip or tar archive to an album
+    :param request: the request, used to report warnings per file
+    :param album: the album to add the photos to
+    :param archive: the uploaded archive file
+    :param skip_near_duplicates: also skip photos that look like a photo
+                                 in any album, not only exact copies
+    """
+    near_duplicates = None
+    if skip_near_duplicates:
+        near_duplicates = NearDuplicateIndex.from_photos(Photo.objects.all())
+
     iszipfile = is_zipfile(archive)
     archive.seek(0)
 
     if iszipfile:
         with ZipFile(archive) as zip_file:
-            for photo in sorted(zip_file.infolist(), key=lambda x: x.filename):
-                extract_photo(request, zip_file, photo, album)
+            photos = sorted(zip_file.infolist(), key=lambda x: x.filename)
+            _extract_photos(request, zip_file, photos, album, near_duplicates)
     else:
         # is_tarfile only supports filenames, so we cannot use that
         try:
             with tarfile.open(fileobj=archive) as tar_file:
-                for photo in sorted(tar_file.getmembers(), key=lambda x: x.name):
-                    extract_photo(request, tar_file, photo, album)
+                photos = sorted(tar_file.getmembers(), key=lambda x: x.name)
+                _extract_photos(request, tar_file, photos, album, near_duplicates)
         except tarfile.ReadError:
             raise ValueError(_("The uploaded file is not a zip or tar file."))
 
 
-def extract_photo(request, archive_file, photo, album):
+def _extract_photos(request, archive_file, photos, album, near_duplicates):
+    if settings.PHOTO_UPLOAD_WORKERS == 0:
+        numbers = album.allocate_photo_numbers(len(photos))
+        for photo, number in zip(photos, numbers):
+            extract_photo(request, archive_file, photo, album, near_duplicates, number)
+    else:
+        extract_photos_pipelined(request, archive_file, photos, album, near_duplicates)
+
+
+def _archive_member(archive_file, photo):
     # zipfile and tarfile are inconsistent
     if isinstance(photo, ZipInfo):
-        photo_filename = photo.filename
-        extract_file = archive_file.open
-    elif isinstance(photo, tarfile.TarInfo):
-        photo_filename = photo.name
-        extract_file = archive_file.extractfile
-    else:
-        raise TypeError("'photo' must be a ZipInfo or TarInfo object.")
+        return photo.filename, archive_file.open
+    if isinstance(photo, tarfile.TarInfo):
+        return photo.name, archive_file.extractfile
+    raise TypeError("'photo' must be a ZipInfo or TarInfo object.")
+
+
+def extract_photo(
+    request, archive_file, photo, album, near_duplicates=None, file_number=None
+):
+    photo_filename, extract_file = _archive_member(archive_file, photo)
 
     # Ignore directories
     if not os.path.basename(photo_filename):
         return
 
-    # Generate unique filename
-    num = album.photo_set.count()
-    filename, extension = os.path.splitext(photo_filename)
-    new_filename = str(num).zfill(4) + extension
-
     photo_obj = Photo()
     photo_obj.album = album
+    # The filename is generated from this number by photo_uploadto
+    photo_obj.file_number = file_number
     try:
         with extract_file(photo) as f:
-            photo_obj.file.save(new_filename, File(f))
+            photo_obj.file.save(os.path.basename(photo_filename), File(f))
 
-        if not save_photo(photo_obj):
+        if not save_photo(photo_obj, near_duplicates):
             messages.add_message(
                 request, messages.WARNING, _("{} is duplicate.").format(photo_filename)
             )
@@ -143,7 +318,343 @@ def extract_photo(request, archive_file, photo, album):
         photo_obj.delete()
 
 
-def save_photo(photo_obj):
+def get_photo_metadata(original, resized, file_size, perceptual_hash=True):
+    """
+    Collect the metadata of a photo that is stored on :class:`Photo`
+    :param original: the original PIL image, read for its EXIF data
+    :param resized: the PIL image as it is stored
+    :param file_size: the size of the stored file in bytes
+    :param perceptual_hash: False to skip the perceptual hash, so only
+                            the headers of the images are read
+    :return: dict of :class:`Photo` field values
+    """
+    taken_at = get_exif_taken_at(original)
+    if taken_at is not None:
+        # Cameras record the local time without a timezone
+        taken_at = timezone.make_aware(taken_at, is_dst=False)
+
+    metadata = {
+        "width": resized.width,
+        "height": resized.height,
+        "taken_at": taken_at,
+        "file_size": file_size,
+    }
+    if perceptual_hash:
+        metadata["perceptual_hash"] = get_perceptual_hash(resized)
+    return metadata
+
+
+class NearDuplicateIndex:
+    """
+    Index of perceptual hashes to find photos that look alike
+
+    This uses multi-index hashing: the 64 bit hashes are split into
+    ``max_distance + 1`` chunks that each have their own lookup table.
+    Two hashes that differ in at most ``max_distance`` bits must have at
+    least one identical chunk, so a lookup only has to compare the
+    hashes that share a chunk instead of all of them.
+    """
+
+    def __init__(self, max_distance=None):
+        if max_distance is None:
+            max_distance = settings.PHOTO_NEAR_DUPLICATE_DISTANCE
+        self.max_distance = max_distance
+        count = max_distance + 1
+        self._chunks = [
+            (64 * i // count, 64 * (i + 1) // count - 64 * i // count)
+            for i in range(count)
+        ]
+        self._tables = [defaultdict(list) for _ in self._chunks]
+
+    @classmethod
+    def from_photos(cls, photos, max_distance=None):
+        """
+        Create an index of photos
+        :param photos: queryset of the photos to index
+        :param max_distance: the maximum number of bits in which near-duplicates
+                             differ, defaults to `PHOTO_NEAR_DUPLICATE_DISTANCE`
+        :return: the index, with the pks of the photos as keys
+        """
+        index = cls(max_distance)
+        for pk, perceptual_hash in photos.exclude(perceptual_hash="").values_list(
+            "pk", "perceptual_hash"
+        ):
+            index.add(pk, perceptual_hash)
+        return index
+
+    def _split(self, value):
+        return [(value >> shift) & ((1 << bits) - 1) for shift, bits in self._chunks]
+
+    def add(self, key, perceptual_hash):
+        """
+        Add a hash to the index
+        :param key: the key to return when the hash is found
+        :param perceptual_hash: the hash as hexadecimal string
+        """
+        value = int(perceptual_hash, 16)
+        for table, chunk in zip(self._tables, self._split(value)):
+            table[chunk].append((key, value))
+
+    def find(self, perceptual_hash):
+        """
+        Find the near-duplicates of a hash
+        :param perceptual_hash: the hash as hexadecimal string
+        :return: list of tuples of the key and the number of differing
+                 bits of the near-duplicates, most similar first
+        """
+        value = int(perceptual_hash, 16)
+        found = {}
+        for table, chunk in zip(self._tables, self._split(value)):
+            for key, other in table.get(chunk, ()):
+                if key not in found:
+                    distance = bin(value ^ other).count("1")
+                    if distance <= self.max_distance:
+                        found[key] = distance
+        return sorted(found.items(), key=lambda item: item[1])
+
+
+def find_near_duplicates(photos):
+    """
+    Find the pairs of photos that look alike
+    :param photos: queryset of the photos to check
+    :return: list of tuples of the pks of both photos and the number of bits
+             in which their perceptual hashes differ
+    """
+    index = NearDuplicateIndex()
+    pairs = []
+    for pk, perceptual_hash in (
+        photos.exclude(perceptual_hash="")
+        .order_by("pk")
+        .values_list("pk", "perceptual_hash")
+    ):
+        for other, distance in index.find(perceptual_hash):
+            pairs.append((other, pk, distance))
+        index.add(pk, perceptual_hash)
+    return pairs
+
+
+def process_photo_data(data, size):
+    """
+    Hash, decode and resize the contents of a single uploaded photo
+
+    This does not touch the database or the storage, so it is safe
+    to run in a separate process.
+
+    :param data: the bytes of the original image file
+    :param size: the maximum size of the resized image
+    :return: tuple of the sha1 digest of the original, a dict of
+             :class:`Photo` field values with the rotation and other
+             metadata, and the bytes of the resized JPEG image
+    """
+    digest = hashlib.sha1(data).hexdigest()
+
+    original = Image.open(BytesIO(data))
+    image, rotation = resize_image(original, size)
+
+    output = BytesIO()
+    image.save(output, "JPEG")
+    metadata = get_photo_metadata(original, image, output.tell())
+    metadata["rotation"] = rotation
+    return digest, metadata, output.getvalue()
+
+
+def _read_archive_members(request, archive_file, photos):
+    for photo in photos:
+        photo_filename, extract_file = _archive_member(archive_file, photo)
+
+        # Ignore directories
+        if not os.path.basename(photo_filename):
+            continue
+
+        try:
+            with extract_file(photo) as f:
+                yield photo_filename, f.read()
+        except (OSError, AttributeError):
+            messages.add_message(
+                request, messages.WARNING, _("Ignoring {}").format(photo_filename)
+            )
+
+
+def _get_upload_workers():
+    """
+    :return: the number of processes that handle an uploaded archive,
+             never more than the number of CPUs
+    """
+    cpu_count = os.cpu_count() or 1
+    if settings.PHOTO_UPLOAD_WORKERS is None:
+        return cpu_count
+    return min(settings.PHOTO_UPLOAD_WORKERS, cpu_count)
+
+
+def _get_upload_process_context():
+    """
+    Get the multiprocessing context to start the workers of an upload in
+
+    The web server runs requests in threads, and forking a process while
+    other threads hold locks can deadlock the child. So the workers are
+    forked from a separate server process that has no other threads.
+    :return: the multiprocessing context
+    """
+    context = multiprocessing.get_context("forkserver")
+    # uWSGI sets sys.executable to its own binary
+    if not os.path.basename(sys.executable).startswith("python"):
+        context.set_executable(os.path.join(sys.exec_prefix, "bin", "python3"))
+    return context
+
+
+def extract_photos_pipelined(
+    request, archive_file, photos, album, near_duplicates=None
+):
+    """
+    Extract the photos from an archive using a pool of worker processes
+
+    :param request: the request, used to report warnings per file
+    :param archive_file: the opened ZipFile or TarFile
+    :param photos: list of ZipInfo or TarInfo objects to extract
+    :param album: the album to add the photos to
+    :param near_duplicates: a :class:`NearDuplicateIndex` of the photos
+                            that new photos may not look like, or None
+    """
+
+    def report(photo_filename, warning):
+        if warning is not None:
+            messages.add_message(request, messages.WARNING, warning)
+
+    with ProcessPoolExecutor(
+        max_workers=_get_upload_workers(),
+        mp_context=_get_upload_process_context(),
+        # The workers import this module, which needs the apps to be loaded
+        initializer=django.setup,
+    ) as executor:
+        save_photos_pipelined(
+            executor,
+            album,
+            _read_archive_members(request, archive_file, photos),
+            len(photos),
+            report,
+            near_duplicates,
+        )
+
+
+def save_photos_pipelined(
+    executor, album, files, count, report, near_duplicates=None, max_pending=None
+):
+    """
+    Add photos to an album, processing them in a pool of worker processes
+
+    Files are hashed, decoded and resized in parallel. The results are
+    consumed in order, checked for duplicates and committed as
+    :class:`Photo` rows in batches of ``settings.PHOTO_UPLOAD_BATCH_SIZE``.
+
+    :param executor: the ProcessPoolExecutor to process the files in
+    :param album: the album to add the photos to
+    :param files: iterable of tuples of the filename and the bytes of a photo
+    :param count: the maximum number of files, to reserve their filenames
+    :param report: called with the filename and a warning, or None when
+                   the photo has been committed, once for every file
+    :param near_duplicates: a :class:`NearDuplicateIndex` of the photos
+                            that new photos may not look like, or None
+    :param max_pending: the maximum number of files that are read but not
+                        processed yet, defaults to twice the number of workers
+    """
+    if max_pending is None:
+        max_pending = 2 * _get_upload_workers()
+    batch_size = settings.PHOTO_UPLOAD_BATCH_SIZE
+
+    digests = set(album.photo_set.values_list("_digest", flat=True))
+    numbers = iter(album.allocate_photo_numbers(count))
+    batch = []
+    batch_filenames = []
+    # The photos of the batch have no pk yet, so they are compared
+    # with each other separately
+    batch_near_duplicates = None
+    if near_duplicates is not None:
+        batch_near_duplicates = NearDuplicateIndex(near_duplicates.max_distance)
+
+    def commit():
+        nonlocal batch_near_duplicates
+        names = [photo.file.name for photo in batch]
+        _commit_photos(batch)
+        if near_duplicates is not None:
+            for pk, perceptual_hash in Photo.objects.filter(
+                album=album, file__in=names
+            ).values_list("pk", "perceptual_hash"):
+                near_duplicates.add(pk, perceptual_hash)
+            batch_near_duplicates = NearDuplicateIndex(near_duplicates.max_distance)
+        for photo_filename in batch_filenames:
+            report(photo_filename, None)
+        batch_filenames.clear()
+
+    def handle_result(photo_filename, future):
+        try:
+            digest, metadata, data = future.result()
+        except (OSError, AttributeError, UnidentifiedImageError):
+            report(photo_filename, _("Ignoring {}").format(photo_filename))
+            return
+
+        if digest in digests:
+            report(photo_filename, _("{} is duplicate.").format(photo_filename))
+            return
+        if near_duplicates is not None:
+            perceptual_hash = metadata["perceptual_hash"]
+            if near_duplicates.find(perceptual_hash) or batch_near_duplicates.find(
+                perceptual_hash
+            ):
+                report(photo_filename, _("{} is duplicate.").format(photo_filename))
+                return
+            batch_near_duplicates.add(photo_filename, perceptual_hash)
+        digests.add(digest)
+
+        new_filename = "{}.jpg".format(str(next(numbers)).zfill(4))
+        logger.info("Trying to save %s to %s", photo_filename, new_filename)
+        name = Photo._meta.get_field("file").storage.save(
+            os.path.join(Album.photosdir, album.dirname, new_filename),
+            ContentFile(data),
+        )
+        batch.append(Photo(album=album, file=name, _digest=digest, **metadata))
+        batch_filenames.append(photo_filename)
+
+        if len(batch) >= batch_size:
+            commit()
+
+    # Keep a bounded number of photos in flight so we never hold
+    # all files in memory
+    pending = deque()
+    for photo_filename, data in files:
+        pending.append(
+            (
+                photo_filename,
+                executor.submit(process_photo_data, data, settings.PHOTO_UPLOAD_SIZE),
+            )
+        )
+        if len(pending) >= max_pending:
+            handle_result(*pending.popleft())
+
+    while pending:
+        handle_result(*pending.popleft())
+
+    if batch:
+        commit()
+
+
+def _commit_photos(batch):
+    # bulk_create does not send post_save, so schedule the thumbnails
+    # and update the album here
+    Photo.objects.bulk_create(batch)
+    for photo in batch:
+        pregenerate_thumbnails(photo.file)
+    change_album_summary(batch[0].album_id, len(batch))
+    batch.clear()
+
+
+def save_photo(photo_obj, near_duplicates=None):
+    """
+    Hash, resize and save an uploaded photo, unless it is a duplicate
+    :param photo_obj: the photo, with the uploaded file as its file
+    :param near_duplicates: a :class:`NearDuplicateIndex` of the photos
+                            this photo may not look like, or None
+    :return: False if the photo was a duplicate and has been deleted
+    """
     hash_sha1 = hashlib.sha1()
     for chunk in iter(lambda: photo_obj.file.read(4096), b""):
         hash_sha1.update(chunk)
@@ -151,9 +662,8 @@ def save_photo(photo_obj):
     digest = hash_sha1.hexdigest()
     photo_obj._digest = digest
 
-    original_path = photo_obj.file.path
-    image = Image.open(original_path)
-    os.remove(original_path)
+    image = Image.open(photo_obj.file.path)
+    photo_obj.file.storage.delete(photo_obj.file.name)
 
     if (
         Photo.objects.filter(album=photo_obj.album, _digest=digest)
@@ -163,20 +673,149 @@ def save_photo(photo_obj):
         photo_obj.delete()
         return False
 
-    image_path, _ext = os.path.splitext(original_path)
-    image_path = "{}.jpg".format(image_path)
-
-    photo_obj.rotation = photo_determine_rotation(image)
+    original = image
+    image, photo_obj.rotation = resize_image(original, settings.PHOTO_UPLOAD_SIZE)
 
-    # Image.thumbnail does not upscale an image that is smaller
-    image.thumbnail(settings.PHOTO_UPLOAD_SIZE, Image.ANTIALIAS)
+    if near_duplicates is not None and near_duplicates.find(get_perceptual_hash(image)):
+        photo_obj.delete()
+        return False
 
-    logger.info("Trying to save to %s", image_path)
-    image.convert("RGB").save(image_path, "JPEG")
-    photo_obj.original_file = image_path
     image_name, _ext = os.path.splitext(photo_obj.file.name)
-    photo_obj.file.name = "{}.jpg".format(image_name)
+    logger.info("Trying to save to %s.jpg", image_name)
+    data = BytesIO()
+    image.save(data, "JPEG")
+    # Save through the storage, so the photo is deduplicated
+    # if the storage supports that
+    photo_obj.file.name = photo_obj.file.storage.save(
+        "{}.jpg".format(image_name), ContentFile(data.getvalue())
+    )
+    for field, value in get_photo_metadata(original, image, data.tell()).items():
+        setattr(photo_obj, field, value)
+    photo_obj.original_file = photo_obj.file.path
 
     photo_obj.save()
+    if near_duplicates is not None:
+        near_duplicates.add(photo_obj.pk, photo_obj.perceptual_hash)
 
     return True
+
+
+def get_album_download_digest(photos):
+    """
+    Calculate a digest of the photos that are part of an album download
+
+    The digest changes whenever a photo is added, removed, hidden or
+    replaced, so it can be used to version cached album archives.
+
+    :param photos: queryset of the photos in the download
+    :return: hex digest
+    """
+    hash_sha1 = hashlib.sha1()
+    for name, digest in photos.values_list("file", "_digest"):
+        hash_sha1.update("{}:{}\n".format(name, digest).encode("utf-8"))
+    return hash_sha1.hexdigest()
+
+
+def get_album_download_cache_path(album, photos):
+    """
+    Get the location of the cached archive of the current version of an album
+
+    :param album: the album
+    :param photos: queryset of the photos in the download
+    :return: path of the cached zip file or None if caching is disabled
+    """
+    if not settings.PHOTO_ALBUM_DOWNLOAD_CACHE_DIR:
+        return None
+    return os.path.join(
+        settings.PHOTO_ALBUM_DOWNLOAD_CACHE_DIR,
+        album.dirname,
+        "{}.zip".format(get_album_download_digest(photos)),
+    )
+
+
+class _ZipStreamBuffer:
+    """Unseekable file-like object that collects the bytes written by ZipFile"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_album_zip(photos, chunk_size=64 * 1024):
+    """
+    Generate a zip archive of photos while reading them
+
+    The photos are stored without compression, since JPEGs
+    are already compressed.
+
+    :param photos: iterable of the photos to add to the archive
+    :param chunk_size: number of bytes to read from a photo at once
+    :return: generator of chunks of the archive
+    """
+    buffer = _ZipStreamBuffer()
+    with ZipFile(buffer, "w", compression=ZIP_STORED) as zip_file:
+        for photo in photos:
+            path = photo.file.path
+            if not os.path.isfile(path):
+                continue
+
+            zip_info = ZipInfo.from_file(path, arcname=os.path.basename(path))
+            zip_info.compress_type = ZIP_STORED
+            with open(path, "rb") as source, zip_file.open(zip_info, "w") as dest:
+                for chunk in iter(lambda: source.read(chunk_size), b""):
+                    dest.write(chunk)
+                    data = buffer.pop()
+                    if data:
+                        yield data
+            data = buffer.pop()
+            if data:
+                yield data
+    yield buffer.pop()
+
+
+def cache_album_zip(chunks, cache_path):
+    """
+    Write the chunks of an album archive to the cache while passing them on
+
+    The archive is written to a temporary file that is only moved into
+    place once it is complete. Older versions of the archive of the same
+    album are removed at that point.
+
+    :param chunks: iterable of chunks of the archive
+    :param cache_path: the final location of the cached archive
+    :return: generator of the same chunks
+    """
+    cache_dir = os.path.dirname(cache_path)
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as temp_file:
+            for chunk in chunks:
+                temp_file.write(chunk)
+                yield chunk
+        # mkstemp only makes the file readable by us, but it is served by nginx
+        os.chmod(temp_path, settings.FILE_UPLOAD_PERMISSIONS or 0o644)
+        os.replace(temp_path, cache_path)
+    except BaseException:
+        # Includes GeneratorExit when a client disconnects
+        os.remove(temp_path)
+        raise
+
+    for filename in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, filename)
+        if path != cache_path and filename.endswith(".zip"):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
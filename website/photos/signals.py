@@ -1,5 +1,11 @@
-from django.db.models.signals import pre_delete
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
 
+from photos.services import (
+    update_album_search_index,
+    update_album_summary_on_delete,
+    update_album_summary_on_save,
+)
 from utils.models.signals import suspendingreceiver
 
 
@@ -9,3 +15,27 @@ from utils.models.signals import suspendingreceiver
 def pre_photo_delete(sender, instance, **kwargs):
     """Remove main photo file on deletion"""
     instance.file.delete()
+
+
+@suspendingreceiver(
+    post_save, sender="photos.Photo", dispatch_uid="photos_photo_save_summary"
+)
+def post_photo_save(sender, instance, created=False, raw=False, **kwargs):
+    """Update the cover and photo count of the album of a photo"""
+    if not raw:
+        update_album_summary_on_save(instance, created)
+
+
+@suspendingreceiver(
+    post_delete, sender="photos.Photo", dispatch_uid="photos_photo_delete_summary"
+)
+def post_photo_delete(sender, instance, **kwargs):
+    """Update the cover and photo count of the album of a deleted photo"""
+    update_album_summary_on_delete(instance)
+
+
+# The search index must always match the albums, so this is never suspended
+@receiver(post_save, sender="photos.Album", dispatch_uid="photos_album_save_index")
+def post_album_save(sender, instance, **kwargs):
+    """Update the search index of an album"""
+    update_album_search_index(instance)
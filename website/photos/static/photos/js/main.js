@@ -1,5 +1,7 @@
 $(function () {
-    $(".photo-card a").fancybox({
+    // Use a selector, so photos that are loaded later join the gallery
+    $().fancybox({
+        selector: ".photo-card a",
         buttons: [
             "download",
             "thumbs",
@@ -11,4 +13,74 @@ $(function () {
               .attr("href", current.opts.download);
         }
     });
+
+    var next = $("#photos-next");
+    if (next.length === 0) {
+        return;
+    }
+
+    var list = $("#photos-list");
+    var loading = false;
+
+    function photoCard(photo) {
+        var card = $("<div>").addClass("grid-item photo-card");
+        var anchor = $("<a>")
+            .addClass("d-flex")
+            .attr("href", photo.file.large)
+            .attr("data-rotation", photo.rotation)
+            .attr("data-fancybox", "gallery")
+            .attr("data-download", photo.download);
+        if (photo.rotation > 0) {
+            card.addClass("rotate" + photo.rotation);
+            anchor.attr("data-options", JSON.stringify({
+                slideClass: "rotate" + photo.rotation
+            }));
+        }
+        anchor.append(
+            $("<div>").addClass("image").append(
+                $("<img>").attr("alt", "").attr("src", photo.file.medium)
+            ),
+            $("<div>").addClass("name").append($("<span>")),
+            $("<div>").addClass(
+                "overlay d-flex justify-content-center flex-column text-center"
+            ).append($("<h5>").addClass("px-2"))
+        );
+        return $("<div>").addClass("col-4 col-md-3 my-3").append(
+            card.append(anchor)
+        );
+    }
+
+    function stop() {
+        next.remove();
+        $(window).off("scroll.photos");
+    }
+
+    function loadNextPage() {
+        var url = next.data("url");
+        if (loading || !url) {
+            return;
+        }
+        loading = true;
+        $.getJSON(url).done(function (data) {
+            list.append($.map(data.results, photoCard));
+            next.data("url", data.next);
+            if (!data.next) {
+                stop();
+            }
+        }).fail(stop).always(function () {
+            loading = false;
+            checkVisible();
+        });
+    }
+
+    function checkVisible() {
+        if (next.parent().length &&
+            next.offset().top < $(window).scrollTop() + 2 * $(window).height()) {
+            loadNextPage();
+        }
+    }
+
+    // Load the next page when the user is less than a screen away from it
+    $(window).on("scroll.photos", checkVisible);
+    checkVisible();
 });
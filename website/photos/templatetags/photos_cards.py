@@ -4,19 +4,21 @@ from django.template.defaultfilters import date
 from django.urls import reverse
 
 from thaliawebsite.templatetags.grid_item import grid_item
-from utils.media.services import get_thumbnail_url
+from utils.media.services import get_accept_header, get_thumbnail_url
 
 register = template.Library()
 
 
-@register.inclusion_tag("includes/grid_item.html")
-def album_card(album):
+@register.inclusion_tag("includes/grid_item.html", takes_context=True)
+def album_card(context, album):
     class_name = "album-card"
     image_url = ""
 
     if album.cover:
         image_url = get_thumbnail_url(
-            album.cover.file, settings.THUMBNAIL_SIZES["medium"]
+            album.cover.file,
+            settings.THUMBNAIL_SIZES["medium"],
+            accept=get_accept_header(context),
         )
         if album.cover.rotation > 0:
             class_name += " rotate{}".format(album.cover.rotation)
@@ -35,8 +37,8 @@ def album_card(album):
     )
 
 
-@register.inclusion_tag("includes/grid_item.html")
-def photo_card(photo):
+@register.inclusion_tag("includes/grid_item.html", takes_context=True)
+def photo_card(context, photo):
     class_name = "photo-card"
     anchor_attrs = f'data-rotation="{photo.rotation}" ' f'data-fancybox="gallery"'
 
@@ -52,7 +54,10 @@ def photo_card(photo):
             reverse("photos:download", args=[photo.album.slug, photo])
         )
 
-    image_url = get_thumbnail_url(photo.file, settings.THUMBNAIL_SIZES["medium"])
+    accept = get_accept_header(context)
+    image_url = get_thumbnail_url(
+        photo.file, settings.THUMBNAIL_SIZES["medium"], accept=accept
+    )
 
     if photo.rotation > 0:
         class_name += " rotate{}".format(photo.rotation)
@@ -62,7 +67,9 @@ def photo_card(photo):
 
     return grid_item(
         title="",
-        url=get_thumbnail_url(photo.file, settings.THUMBNAIL_SIZES["large"], fit=False),
+        url=get_thumbnail_url(
+            photo.file, settings.THUMBNAIL_SIZES["large"], fit=False, accept=accept
+        ),
         image_url=image_url,
         class_name=class_name,
         anchor_attrs=anchor_attrs,
@@ -160,3 +160,45 @@ class AlbumUploadTest(TestCase):
         )
 
         self.assertEqual(Photo.objects.first().rotation, 90)
+
+
+@override_settings(SUSPEND_SIGNALS=True)
+class NearDuplicatesReportTest(TestCase):
+    """Tests the report of near-duplicate photos in the admin."""
+
+    fixtures = ["members.json"]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.member = Member.objects.filter(last_name="Wiggers").first()
+        album = Album.objects.create(
+            title_en="test album",
+            title_nl="test album",
+            date="2017-04-12",
+            slug="2017-04-12-test-album",
+        )
+        cls.first = Photo.objects.create(
+            album=album, file="photos/a.jpg", perceptual_hash="00000000000000ff"
+        )
+        cls.second = Photo.objects.create(
+            album=album, file="photos/b.jpg", perceptual_hash="00000000000000fe"
+        )
+        Photo.objects.create(
+            album=album, file="photos/c.jpg", perceptual_hash="ffffffffffffff00"
+        )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.member)
+
+    def test_report(self):
+        response = self.client.get("/admin/photos/photo/near-duplicates/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.context["pairs"], [(self.first, self.second, 1)],
+        )
+        self.assertContains(response, "/admin/photos/photo/{}/".format(self.first.pk))
+
+    def test_changelist_links_to_report(self):
+        response = self.client.get("/admin/photos/photo/")
+        self.assertContains(response, "/admin/photos/photo/near-duplicates/")
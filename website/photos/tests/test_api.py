@@ -0,0 +1,84 @@
+from datetime import date
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from members.models import Member, Membership
+from photos.api.pagination import AlbumPhotosPagination
+from photos.models import Album, Photo
+
+
+@override_settings(SUSPEND_SIGNALS=True)
+class AlbumPhotosApiTest(TestCase):
+    """Tests the paginated photos of an album"""
+
+    fixtures = ["members.json"]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.member = Member.objects.filter(last_name="Wiggers").first()
+        Membership.objects.create(
+            type=Membership.MEMBER, user=cls.member, since=date(2015, 1, 1)
+        )
+        cls.album = Album.objects.create(
+            title_en="test album",
+            title_nl="test album",
+            date=date(year=2017, month=9, day=5),
+            slug="test-album",
+        )
+        cls.photos = Photo.objects.bulk_create(
+            Photo(album=cls.album, file=f"photos/test-album/{i:04}.jpg")
+            for i in range(60)
+        )
+        Photo.objects.create(
+            album=cls.album, file="photos/test-album/hidden.jpg", hidden=True
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse("album-photos", args=[self.album.pk])
+
+    def _get_all(self, url):
+        names = []
+        while url is not None:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            for photo in response.data["results"]:
+                self.assertIn("medium", photo["file"])
+                names.append(photo["download"].rsplit("/", 1)[1])
+            url = response.data["next"]
+        return names
+
+    def test_pages(self):
+        self.client.force_login(self.member)
+        response = self.client.get(self.url)
+        self.assertEqual(len(response.data["results"]), AlbumPhotosPagination.page_size)
+        self.assertEqual(
+            self._get_all(self.url), [f"{i:04}.jpg" for i in range(60)],
+        )
+
+    def test_link_after(self):
+        url = "http://testserver" + self.url
+        next_url = AlbumPhotosPagination().get_link_after(url, self.photos[9])
+        self.client.force_login(self.member)
+        self.assertEqual(
+            self._get_all(next_url), [f"{i:04}.jpg" for i in range(10, 60)]
+        )
+
+    def test_shared(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 403)
+
+        response = self.client.get(self.url, {"token": "wrong"})
+        self.assertEqual(response.status_code, 404)
+
+        self.assertEqual(
+            len(self._get_all(f"{self.url}?token={self.album.access_token}")), 60
+        )
+
+    def test_inaccessible(self):
+        self.member.membership_set.update(until=date(2016, 1, 1))
+        self.client.force_login(self.member)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 403)
@@ -0,0 +1,138 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from PIL import Image
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils.datetime_safe import datetime
+
+from photos.management.commands.backfillphotometadata import read_photo_metadata
+from photos.models import Album, Photo
+
+
+@override_settings(SUSPEND_SIGNALS=True)
+class BackfillPhotoMetadataTest(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media_settings = override_settings(MEDIA_ROOT=media_root)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+        album = Album.objects.create(
+            title_en="test album",
+            title_nl="test album",
+            date=datetime(year=2017, month=1, day=1),
+            slug="2017-01-01-test-album",
+        )
+        os.makedirs(os.path.join(media_root, "photos", album.dirname))
+        self.photos = []
+        for i, size in enumerate([(300, 200), (100, 400)]):
+            name = os.path.join("photos", album.dirname, f"{i}.jpg")
+            Image.new("RGB", size).save(os.path.join(media_root, name))
+            self.photos.append(Photo.objects.create(album=album, file=name))
+        self.missing = Photo.objects.create(
+            album=album, file=os.path.join("photos", album.dirname, "missing.jpg")
+        )
+
+    def test_backfill(self):
+        out = StringIO()
+        err = StringIO()
+        call_command("backfillphotometadata", "--workers", "1", stdout=out, stderr=err)
+
+        first, second = [Photo.objects.get(pk=p.pk) for p in self.photos]
+        self.assertEqual((first.width, first.height), (300, 200))
+        self.assertEqual((second.width, second.height), (100, 400))
+        self.assertEqual(first.file_size, os.path.getsize(first.file.path))
+        self.assertIsNone(first.taken_at)
+        self.assertIsNone(Photo.objects.get(pk=self.missing.pk).width)
+        self.assertIn("Stored the metadata of 2 photos", out.getvalue())
+        self.assertIn("missing.jpg", err.getvalue())
+
+    def test_backfill_headers(self):
+        Photo.objects.filter(pk=self.photos[0].pk).update(perceptual_hash="0" * 16)
+        call_command("backfillphotometadata", "--workers", "1", stdout=StringIO())
+
+        # The photo with a hash only needed its headers and keeps its hash
+        first, second = [Photo.objects.get(pk=p.pk) for p in self.photos]
+        self.assertEqual((first.width, first.perceptual_hash), (300, "0" * 16))
+        self.assertEqual(second.width, 100)
+        self.assertEqual(len(second.perceptual_hash), 16)
+
+    def test_read_headers_only(self):
+        path = self.photos[0].file.path
+        with mock.patch("photos.services.get_perceptual_hash") as hash_mock:
+            results, failed = read_photo_metadata([(self.photos[0].pk, path, False)])
+        hash_mock.assert_not_called()
+        self.assertNotIn("perceptual_hash", results[0][1])
+        self.assertEqual(failed, [])
+
+
+@override_settings(SUSPEND_SIGNALS=True, THUMBNAIL_PREGENERATE=False)
+class ImportPhotosTest(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media_settings = override_settings(MEDIA_ROOT=media_root)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+        source = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, source)
+        self.folder = os.path.join(source, "album_20180905_Test album")
+        os.makedirs(self.folder)
+        Image.new("RGB", (300, 200), "red").save(os.path.join(self.folder, "a.jpg"))
+        shutil.copy(
+            os.path.join(self.folder, "a.jpg"), os.path.join(self.folder, "b.jpg")
+        )
+        Image.new("RGB", (100, 400)).save(os.path.join(self.folder, "c.png"))
+        with open(os.path.join(self.folder, "d.txt"), "w") as file:
+            file.write("not an image")
+
+    def _import(self):
+        out = StringIO()
+        call_command("importphotos", self.folder, "--workers", "1", stdout=out)
+        return out.getvalue()
+
+    def test_import(self):
+        output = self._import()
+        album = Album.objects.get(slug="2018-09-05-test-album")
+        self.assertEqual(album.photo_set.count(), 2)
+        self.assertEqual(
+            set(album.photo_set.values_list("width", "height")),
+            {(300, 200), (100, 400)},
+        )
+        self.assertIn("b.jpg is duplicate.", output)
+        self.assertIn("Ignoring d.txt", output)
+        self.assertIn("Imported 2 photos from", output)
+        self.assertIn("files/s", output)
+
+        with open(os.path.join(self.folder, ".importphotos")) as checkpoint:
+            self.assertEqual(
+                sorted(checkpoint.read().split()), ["a.jpg", "b.jpg", "c.png", "d.txt"]
+            )
+
+    def test_resume(self):
+        self._import()
+        Image.new("RGB", (50, 50)).save(os.path.join(self.folder, "e.jpg"))
+
+        output = self._import()
+        album = Album.objects.get(slug="2018-09-05-test-album")
+        self.assertIn("Resuming album", output)
+        self.assertIn("Skipping 4 files", output)
+        self.assertIn("Imported 1 photos from", output)
+        self.assertEqual(album.photo_set.count(), 3)
+
+    def test_existing_album(self):
+        Album.objects.create(
+            title_en="Test album",
+            title_nl="Test album",
+            date=datetime(year=2018, month=9, day=5),
+            slug="2018-09-05-test-album",
+        )
+        output = self._import()
+        self.assertIn("already exists", output)
+        self.assertFalse(os.path.exists(os.path.join(self.folder, ".importphotos")))
@@ -0,0 +1,126 @@
+from django.test import TestCase, override_settings
+from django.utils.datetime_safe import datetime
+
+from photos.models import Album, Photo, photo_uploadto
+
+
+@override_settings(SUSPEND_SIGNALS=True)
+class AlbumPhotoSequenceTest(TestCase):
+    def setUp(self):
+        self.album = Album.objects.create(
+            title_en="test album",
+            title_nl="test album",
+            date=datetime(year=2017, month=1, day=1),
+            slug="2017-01-01-test-album",
+        )
+
+    def test_allocate_photo_numbers(self):
+        self.assertEqual(self.album.allocate_photo_numbers(3), range(0, 3))
+        self.assertEqual(self.album.allocate_photo_numbers(), range(3, 4))
+        # Another instance of the same album continues the same sequence
+        other = Album.objects.get(pk=self.album.pk)
+        self.assertEqual(other.allocate_photo_numbers(2), range(4, 6))
+
+    def test_outdated_instance_keeps_sequence(self):
+        outdated = Album.objects.get(pk=self.album.pk)
+        self.album.allocate_photo_numbers(5)
+
+        outdated.hidden = True
+        outdated.save()
+
+        self.album.refresh_from_db()
+        self.assertTrue(self.album.hidden)
+        self.assertEqual(self.album.photo_sequence, 5)
+
+    def test_photo_uploadto(self):
+        photo = Photo(album=self.album)
+        self.assertEqual(
+            photo_uploadto(photo, "a.png"), "photos/2017-01-01-test-album/0000.png"
+        )
+        self.assertEqual(
+            photo_uploadto(photo, "b.jpg"), "photos/2017-01-01-test-album/0001.jpg"
+        )
+
+        photo.file_number = 42
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                photo_uploadto(photo, "c.jpg"), "photos/2017-01-01-test-album/0042.jpg"
+            )
+
+
+@override_settings(THUMBNAIL_PREGENERATE=False)
+class AlbumSummaryTest(TestCase):
+    def setUp(self):
+        self.album = Album.objects.create(
+            title_en="test album",
+            title_nl="test album",
+            date=datetime(year=2017, month=1, day=1),
+            slug="2017-01-01-test-album",
+        )
+
+    def _create_photo(self, name, hidden=False):
+        return Photo.objects.create(
+            album=self.album, file=f"photos/{self.album.dirname}/{name}", hidden=hidden
+        )
+
+    def test_summary_follows_photos(self):
+        self.album.refresh_from_db()
+        self.assertEqual(self.album.photo_count, 0)
+        self.assertIsNone(self.album.cover)
+
+        photos = [self._create_photo(f"000{i}.jpg") for i in range(3)]
+        self._create_photo("0003.jpg", hidden=True)
+        self.album.refresh_from_db()
+        self.assertEqual(self.album.photo_count, 3)
+        self.assertIn(self.album.cover, photos)
+
+        cover = self.album.cover
+        cover.hidden = True
+        cover.save()
+        self.album.refresh_from_db()
+        self.assertEqual(self.album.photo_count, 2)
+        self.assertNotEqual(self.album.cover, cover)
+        self.assertIn(self.album.cover, photos)
+
+        remaining = self.album.cover
+        Photo.objects.filter(hidden=False).exclude(pk=remaining.pk).get().delete()
+        self.album.refresh_from_db()
+        self.assertEqual(self.album.photo_count, 1)
+        self.assertEqual(self.album.cover, remaining)
+
+    def test_summary_is_updated_incrementally(self):
+        photo = self._create_photo("0000.jpg")
+        # Saving a photo without changing its album or visibility only
+        # saves the photo
+        with self.assertNumQueries(1):
+            photo.save()
+
+        other_album = Album.objects.create(
+            title_en="other album",
+            title_nl="other album",
+            date=datetime(year=2017, month=1, day=2),
+            slug="2017-01-02-other-album",
+        )
+        photo.album = other_album
+        with self.assertNumQueries(3):
+            photo.save()
+        self.album.refresh_from_db()
+        other_album.refresh_from_db()
+        self.assertEqual((self.album.photo_count, self.album.cover), (0, None))
+        self.assertEqual((other_album.photo_count, other_album.cover), (1, photo))
+
+    def test_delete_album(self):
+        for i in range(10):
+            self._create_photo(f"000{i}.jpg")
+        # Removing the file saves every photo, and the summary is changed
+        # once for every photo instead of being computed again
+        with self.assertNumQueries(7 + 2 * 10):
+            self.album.delete()
+        self.assertFalse(Photo.objects.exists())
+
+    def test_chosen_cover(self):
+        photo = self._create_photo("0000.jpg", hidden=True)
+        self.album._cover = photo
+        self.album.save()
+        self.assertEqual(self.album.cover, photo)
+        self.assertEqual(self.album.photo_count, 0)
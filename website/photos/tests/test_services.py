@@ -1,20 +1,35 @@
 import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from random import Random
+from io import BytesIO
+from unittest import mock
+from zipfile import ZipFile
 
 from PIL import Image
 
 from django.test import Client, TestCase, RequestFactory, override_settings
+from django.utils import timezone
 from django.utils.datetime_safe import datetime
 from django.conf import settings
 
 from freezegun import freeze_time
 
 from members.models import Member, Membership
-from photos.models import Album
+from photos import services
+from photos.models import Album, Photo
 from photos.services import (
+    NearDuplicateIndex,
+    extract_archive,
+    find_near_duplicates,
     is_album_accessible,
-    photo_determine_rotation,
     get_annotated_accessible_albums,
+    save_photos_pipelined,
+    search_albums,
 )
+from utils.media.images import get_exif_rotation
+from utils.media.storage import DeduplicatedStorage
 
 
 @override_settings(SUSPEND_SIGNALS=True)
@@ -153,5 +168,274 @@ class DetermineRotationTest(TestCase):
                     os.path.join(settings.BASE_DIR, f"photos/fixtures/poker_{i}.jpg"),
                     "rb",
                 ) as f:
-                    rot = photo_determine_rotation(Image.open(f))
+                    rot = get_exif_rotation(Image.open(f))
                     self.assertEqual(orientations[i - 1], rot)
+
+
+@override_settings(SUSPEND_SIGNALS=True)
+class ExtractArchiveTest(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media_settings = override_settings(MEDIA_ROOT=media_root)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+        self.request = RequestFactory().post("/")
+        self.request._messages = mock.Mock()
+        self.album = Album.objects.create(
+            title_en="test album",
+            title_nl="test album",
+            date=datetime(year=2017, month=1, day=1),
+            slug="2017-01-01-test-album",
+        )
+
+    def _create_zip(self, files):
+        output_file = BytesIO()
+        with ZipFile(output_file, "w") as zip_file:
+            for name, path in files:
+                zip_file.write(path, arcname=name)
+            zip_file.writestr("notes.txt", "not a photo")
+        output_file.seek(0)
+        return output_file
+
+    def _fixture(self, name):
+        return os.path.join(settings.BASE_DIR, "photos/fixtures", name)
+
+    def _dated_photo(self):
+        path = os.path.join(settings.MEDIA_ROOT, "dated.jpg")
+        exif = Image.Exif()
+        exif[306] = "2020:05:01 12:34:56"
+        Image.new("RGB", (300, 200)).save(path, exif=exif.tobytes())
+        return path
+
+    def _extract(self, filenames):
+        archive = self._create_zip(
+            [
+                ("a.jpg", self._fixture("poker_1.jpg")),
+                ("b.jpg", self._fixture("rotated_janbeleid.jpg")),
+                ("c.png", self._fixture("thom_assessor.png")),
+                ("d.png", self._fixture("thom_assessor.png")),
+                ("e.jpg", self._dated_photo()),
+            ]
+        )
+        extract_archive(self.request, self.album, archive)
+
+        photos = Photo.objects.filter(album=self.album).order_by("file")
+        self.assertEqual(photos.count(), 4)
+        self.assertEqual([os.path.basename(p.file.name) for p in photos], filenames)
+        self.assertEqual(photos[1].rotation, 90)
+        for photo in photos:
+            self.assertEqual(len(photo._digest), 40)
+            with Image.open(photo.file.path) as image:
+                self.assertEqual(image.format, "JPEG")
+                self.assertEqual((photo.width, photo.height), image.size)
+            self.assertEqual(photo.file_size, os.path.getsize(photo.file.path))
+        self.assertIsNone(photos[0].taken_at)
+        self.assertEqual(
+            photos[3].taken_at, timezone.make_aware(datetime(2020, 5, 1, 12, 34, 56))
+        )
+
+        self.request._messages.add.assert_any_call(mock.ANY, "d.png is duplicate.", "")
+        self.request._messages.add.assert_any_call(mock.ANY, "Ignoring notes.txt", "")
+
+    @override_settings(PHOTO_UPLOAD_WORKERS=2, PHOTO_UPLOAD_BATCH_SIZE=2)
+    def test_extract_archive_pipelined(self):
+        self._extract(["0000.jpg", "0001.jpg", "0002.jpg", "0003.jpg"])
+        self.album.refresh_from_db()
+        self.assertEqual(self.album.photo_sequence, 6)
+
+    def test_upload_workers(self):
+        with mock.patch("photos.services.os.cpu_count", return_value=4):
+            with override_settings(PHOTO_UPLOAD_WORKERS=None):
+                self.assertEqual(services._get_upload_workers(), 4)
+            with override_settings(PHOTO_UPLOAD_WORKERS=8):
+                self.assertEqual(services._get_upload_workers(), 4)
+            with override_settings(PHOTO_UPLOAD_WORKERS=2):
+                self.assertEqual(services._get_upload_workers(), 2)
+
+    def test_upload_process_context(self):
+        context = services._get_upload_process_context()
+        self.assertEqual(context.get_start_method(), "forkserver")
+
+    @override_settings(PHOTO_UPLOAD_WORKERS=0)
+    def test_extract_archive_sequential(self):
+        # Every archive member gets a number, the duplicate leaves a gap
+        self._extract(["0000.jpg", "0001.jpg", "0002.jpg", "0004.jpg"])
+        self.album.refresh_from_db()
+        self.assertEqual(self.album.photo_sequence, 6)
+
+    def _extract_near_duplicates(self):
+        copy = os.path.join(settings.MEDIA_ROOT, "copy.jpg")
+        with Image.open(self._fixture("poker_1.jpg")) as image:
+            image.resize((512, 341)).save(copy, quality=40)
+
+        archive = self._create_zip([("a.jpg", self._fixture("poker_1.jpg"))])
+        extract_archive(self.request, self.album, archive)
+        other_album = Album.objects.create(
+            title_en="other album",
+            title_nl="other album",
+            date=datetime(year=2017, month=1, day=2),
+            slug="2017-01-02-other-album",
+        )
+        archive = self._create_zip(
+            [
+                ("b.jpg", copy),
+                ("c.jpg", self._fixture("janbeleid-hoe.jpg")),
+                ("d.jpg", copy),
+            ]
+        )
+        extract_archive(self.request, other_album, archive, skip_near_duplicates=True)
+
+        self.assertEqual(Photo.objects.filter(album=other_album).count(), 1)
+        self.request._messages.add.assert_any_call(mock.ANY, "b.jpg is duplicate.", "")
+        self.request._messages.add.assert_any_call(mock.ANY, "d.jpg is duplicate.", "")
+
+    @override_settings(PHOTO_UPLOAD_WORKERS=2)
+    def test_skip_near_duplicates_pipelined(self):
+        self._extract_near_duplicates()
+
+    def test_pipelined_near_duplicates_by_pk(self):
+        index = NearDuplicateIndex()
+        with open(self._fixture("poker_1.jpg"), "rb") as f:
+            files = [("a.jpg", f.read())]
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            save_photos_pipelined(executor, self.album, files, 1, mock.Mock(), index)
+
+        # Committed photos are indexed like the sequential upload does
+        photo = Photo.objects.get(album=self.album)
+        self.assertEqual(index.find(photo.perceptual_hash), [(photo.pk, 0)])
+
+    @override_settings(PHOTO_UPLOAD_WORKERS=0)
+    def test_skip_near_duplicates_sequential(self):
+        self._extract_near_duplicates()
+
+    def _extract_deduplicated(self):
+        other_album = Album.objects.create(
+            title_en="other album",
+            title_nl="other album",
+            date=datetime(year=2017, month=1, day=2),
+            slug="2017-01-02-other-album",
+        )
+        storage = DeduplicatedStorage(location=settings.MEDIA_ROOT)
+        with mock.patch.object(Photo._meta.get_field("file"), "storage", storage):
+            for album in (self.album, other_album):
+                archive = self._create_zip([("a.jpg", self._fixture("poker_1.jpg"))])
+                extract_archive(self.request, album, archive)
+
+        first, second = Photo.objects.order_by("album__date")
+        self.assertNotEqual(first.file.name, second.file.name)
+        self.assertTrue(os.path.samefile(first.file.path, second.file.path))
+
+    @override_settings(PHOTO_UPLOAD_WORKERS=2)
+    def test_deduplicated_pipelined(self):
+        self._extract_deduplicated()
+
+    @override_settings(PHOTO_UPLOAD_WORKERS=0)
+    def test_deduplicated_sequential(self):
+        self._extract_deduplicated()
+
+
+class NearDuplicateIndexTest(TestCase):
+    def test_find_matches_brute_force(self):
+        random = Random(42)
+        hashes = [f"{random.getrandbits(64):016x}" for _ in range(200)]
+        # Add copies of some hashes with a few bits flipped
+        for i in range(50):
+            value = int(hashes[i], 16)
+            for bit in random.sample(range(64), random.randint(0, 6)):
+                value ^= 1 << bit
+            hashes.append(f"{value:016x}")
+
+        index = NearDuplicateIndex(max_distance=4)
+        for key, perceptual_hash in enumerate(hashes):
+            index.add(key, perceptual_hash)
+
+        for perceptual_hash in hashes:
+            expected = {
+                key: bin(int(perceptual_hash, 16) ^ int(other, 16)).count("1")
+                for key, other in enumerate(hashes)
+            }
+            expected = {k: d for k, d in expected.items() if d <= 4}
+            found = index.find(perceptual_hash)
+            self.assertEqual(dict(found), expected)
+            self.assertEqual([d for _key, d in found], sorted(d for _key, d in found))
+
+    @override_settings(SUSPEND_SIGNALS=True)
+    def test_find_near_duplicates(self):
+        album = Album.objects.create(
+            title_en="test album",
+            title_nl="test album",
+            date=datetime(year=2017, month=1, day=1),
+            slug="2017-01-01-test-album",
+        )
+        first = Photo.objects.create(album=album, perceptual_hash="00000000000000ff")
+        second = Photo.objects.create(album=album, perceptual_hash="00000000000000fe")
+        Photo.objects.create(album=album, perceptual_hash="ffffffffffffff00")
+        Photo.objects.create(album=album, perceptual_hash="")
+
+        self.assertEqual(
+            find_near_duplicates(Photo.objects.all()), [(first.pk, second.pk, 1)]
+        )
+
+
+class SearchAlbumsTest(TestCase):
+    def _create_album(self, title_en, title_nl, date):
+        return Album.objects.create(
+            title_en=title_en, title_nl=title_nl, date=date, slug=title_en
+        )
+
+    def _search(self, query):
+        return list(search_albums(Album.objects.all(), query))
+
+    def test_search(self):
+        party = self._create_album(
+            "Pre-party", "Voorfeest", datetime(year=2018, month=9, day=5)
+        )
+        members = self._create_album(
+            "General members meeting",
+            "Algemene ledenvergadering",
+            datetime(year=2018, month=10, day=1),
+        )
+        cafe = self._create_album(
+            "Café evening", "Café avond", datetime(year=2019, month=9, day=5)
+        )
+
+        for query, expected in [
+            ("", [cafe, members, party]),
+            ("party", [party]),
+            ("voorf", [party]),
+            ("MEMBERS meeting", [members]),
+            ("members party", []),
+            ("cafe", [cafe]),
+            ("2018-09", [party]),
+            ("2018", [members, party]),
+        ]:
+            with self.subTest(query=query):
+                self.assertEqual(self._search(query), expected)
+
+    def test_ranking(self):
+        word = self._create_album("Feest", "Feest", datetime(2017, 1, 1))
+        prefix = self._create_album("Feestweek", "Feestweek", datetime(2018, 1, 1))
+        substring = self._create_album("Party", "Voorfeest", datetime(2019, 1, 1))
+
+        # Complete words rank higher than prefixes and substrings
+        albums = list(search_albums(Album.objects.all(), "feest"))
+        self.assertEqual(albums, [word, prefix, substring])
+        self.assertEqual([album.search_rank for album in albums], [3, 2, 1])
+
+    def test_index_updated(self):
+        album = self._create_album("Lustrum", "Lustrum", datetime(2019, 1, 1))
+        album.title_en = "Gala"
+        album.save()
+
+        self.assertEqual(self._search("lustrum"), [album])
+        self.assertEqual(self._search("gala"), [album])
+        album.title_nl = "Gala"
+        album.save()
+        self.assertEqual(self._search("lustrum"), [])
+        self.assertEqual(
+            set(album.search_terms.values_list("term", "suffix")),
+            {("gala", False), ("ala", True), ("la", True), ("a", True)}
+            | {("2019-01-01", False)},
+        )
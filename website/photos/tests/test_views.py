@@ -1,11 +1,17 @@
 import os
+import shutil
+import tempfile
 
 from datetime import date
+from io import BytesIO
+from zipfile import ZipFile
 
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
 from members.models import Member, Membership
 from photos.models import Album, Photo
@@ -72,6 +78,26 @@ class AlbumIndexTest(TestCase):
             self.assertEqual(len(response.context["albums"]), 16)
             self.assertEqual(response.context["page_range"], range(1, 6))
 
+    def test_index_queries(self):
+        for i in range(32):
+            album = Album.objects.create(
+                title_en="test_album_%d" % i,
+                title_nl="test_album_%d" % i,
+                date=date(year=2018, month=9, day=5),
+                slug="test_album_%d" % i,
+            )
+            photo = Photo.objects.create(
+                album=album, file=f"photos/{album.dirname}/0000.jpg"
+            )
+            Album.objects.filter(pk=album.pk).update(default_cover=photo, photo_count=1)
+
+        # The covers are loaded together with the albums
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("photos:index"))
+        photo_queries = [q for q in queries if "photos_photo" in q["sql"]]
+        self.assertEqual(len(photo_queries), 1)
+        self.assertEqual(response.context["albums"][0].photo_count, 1)
+
     def test_empty_page(self):
         Album.objects.create(
             title_en="test_album",
@@ -188,6 +214,61 @@ class AlbumTest(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.context["album"], self.album)
         self.assertEqual(len(response.context["photos"]), 10)
+        self.assertIsNone(response.context["next_url"])
+
+    def test_next_page(self):
+        Membership.objects.create(
+            type=Membership.MEMBER,
+            user=self.member,
+            since=date(year=2015, month=1, day=1),
+            until=None,
+        )
+        Photo.objects.bulk_create(
+            Photo(album=self.album, file=f"photos/test_album/{i:04}.jpg")
+            for i in range(50)
+        )
+
+        response = self.client.get(reverse("photos:album", args=(self.album.slug,)))
+        self.assertEqual(len(response.context["photos"]), 48)
+        self.assertIn(
+            reverse("album-photos", args=[self.album.pk]), response.context["next_url"]
+        )
+        response = self.client.get(response.context["next_url"])
+        self.assertEqual(
+            [photo["pk"] for photo in response.json()["results"]],
+            list(
+                Photo.objects.filter(album=self.album)
+                .order_by("file")
+                .values_list("pk", flat=True)[48:]
+            ),
+        )
+
+    @override_settings(THUMBNAIL_FORMATS=["webp"])
+    def test_next_page_image_format(self):
+        Membership.objects.create(
+            type=Membership.MEMBER,
+            user=self.member,
+            since=date(year=2015, month=1, day=1),
+            until=None,
+        )
+        Photo.objects.bulk_create(
+            Photo(album=self.album, file=f"photos/test_album/{i:04}.jpg")
+            for i in range(50)
+        )
+
+        response = self.client.get(
+            reverse("photos:album", args=(self.album.slug,)),
+            HTTP_ACCEPT="text/html,image/webp,*/*;q=0.8",
+        )
+        self.assertIn("Accept", response["Vary"])
+        self.assertIn("image_formats=webp", response.context["next_url"])
+
+        # The script only accepts JSON, the parameter picks the format
+        response = self.client.get(
+            response.context["next_url"], HTTP_ACCEPT="application/json"
+        )
+        for photo in response.json()["results"]:
+            self.assertIn(".jpg.webp?", photo["file"]["medium"])
 
     def test_unaccessible(self):
         Membership.objects.create(
@@ -253,6 +334,23 @@ class SharedAlbumTest(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.context["album"], self.album)
         self.assertEqual(len(response.context["photos"]), 10)
+        self.assertIsNone(response.context["next_url"])
+
+    def test_next_page(self):
+        Photo.objects.bulk_create(
+            Photo(album=self.album, file=f"photos/test_album/{i:04}.jpg")
+            for i in range(50)
+        )
+
+        response = self.client.get(
+            reverse(
+                "photos:shared-album", args=(self.album.slug, self.album.access_token,)
+            )
+        )
+        self.assertEqual(len(response.context["photos"]), 48)
+        self.assertIn(f"token={self.album.access_token}", response.context["next_url"])
+        response = self.client.get(response.context["next_url"])
+        self.assertEqual(len(response.json()["results"]), 2)
 
 
 @override_settings(SUSPEND_SIGNALS=True)
@@ -376,6 +474,56 @@ class AlbumDownloadTest(_DownloadBaseTestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response["Content-Type"], "application/zip")
 
+        with ZipFile(BytesIO(b"".join(response.streaming_content))) as zip_file:
+            self.assertEqual(
+                zip_file.namelist(), [os.path.basename(self.photo.file.name)]
+            )
+            self.assertIsNone(zip_file.testzip())
+
+    def test_download_excludes_hidden(self):
+        self.client.force_login(self.member)
+        self.photo.hidden = True
+        self.photo.save()
+
+        response = self.client.get(
+            reverse("photos:album-download", args=(self.album.slug,))
+        )
+        with ZipFile(BytesIO(b"".join(response.streaming_content))) as zip_file:
+            self.assertEqual(zip_file.namelist(), [])
+
+    def test_download_cached(self):
+        self.client.force_login(self.member)
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        album_cache_dir = os.path.join(cache_dir, self.album.dirname)
+
+        with override_settings(PHOTO_ALBUM_DOWNLOAD_CACHE_DIR=cache_dir):
+            response = self.client.get(
+                reverse("photos:album-download", args=(self.album.slug,))
+            )
+            content = b"".join(response.streaming_content)
+            cached = os.listdir(album_cache_dir)
+            self.assertEqual(len(cached), 1)
+            cache_path = os.path.join(album_cache_dir, cached[0])
+            with open(cache_path, "rb") as f:
+                self.assertEqual(f.read(), content)
+            self.assertEqual(os.stat(cache_path).st_mode & 0o777, 0o644)
+
+            response = self.client.get(
+                reverse("photos:album-download", args=(self.album.slug,))
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(os.listdir(album_cache_dir), cached)
+
+            self.photo.hidden = True
+            self.photo.save()
+            response = self.client.get(
+                reverse("photos:album-download", args=(self.album.slug,))
+            )
+            b"".join(response.streaming_content)
+            self.assertEqual(len(os.listdir(album_cache_dir)), 1)
+            self.assertNotEqual(os.listdir(album_cache_dir), cached)
+
     def test_logged_out(self):
         response = self.client.get(
             reverse("photos:album-download", args=(self.album.slug,))
@@ -1,36 +1,44 @@
 import os
-from tempfile import gettempdir
-from zipfile import ZipFile
 
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import EmptyPage, Paginator
-from django.http import Http404
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, render
-from django.utils.translation import get_language
-from django_sendfile import sendfile
+from django.urls import reverse
+from rest_framework.utils.urls import replace_query_param
 
+from photos.api.pagination import AlbumPhotosPagination
 from photos.models import Album, Photo
 from photos.services import (
+    cache_album_zip,
     check_shared_album_token,
+    get_album_download_cache_path,
     get_annotated_accessible_albums,
     is_album_accessible,
+    search_albums,
+    stream_album_zip,
 )
+from utils.media.sendfile import sendfile
+from utils.media.services import get_accepted_thumbnail_format, get_request_accept
 
 COVER_FILENAME = "cover.jpg"
 
 
 @login_required
 def index(request):
-    keywords = request.GET.get("keywords", "").split()
+    query = request.GET.get("keywords", "")
+    keywords = query.split()
 
     # Only show published albums
-    albums = Album.objects.filter(hidden=False)
-    for key in keywords:
-        albums = albums.filter(**{f"title_{get_language()}__icontains": key})
-
+    albums = Album.objects.filter(hidden=False).select_related(
+        "_cover", "default_cover"
+    )
     albums = get_annotated_accessible_albums(request, albums)
 
-    albums = albums.order_by("-date")
+    if keywords:
+        albums = search_albums(albums, query)
+    else:
+        albums = albums.order_by("-date")
     paginator = Paginator(albums, 16)
 
     page = request.GET.get("page")
@@ -63,8 +71,31 @@ def index(request):
     )
 
 
-def _render_album_page(request, album):
-    context = {"album": album, "photos": album.photo_set.filter(hidden=False)}
+def _render_album_page(request, album, token=None):
+    """
+    Render the first page of photos of an album, the following
+    pages are loaded from the API while the user scrolls
+    """
+    pagination = AlbumPhotosPagination()
+    photos = list(
+        album.photo_set.filter(hidden=False)
+        .select_related("album")
+        .order_by(pagination.ordering)[: pagination.page_size]
+    )
+
+    next_url = None
+    if len(photos) == pagination.page_size:
+        url = request.build_absolute_uri(reverse("album-photos", args=[album.pk]))
+        if token is not None:
+            url = replace_query_param(url, "token", token)
+        # The API picks the thumbnail format from this parameter, since
+        # the Accept header of the script only lists JSON
+        image_format = get_accepted_thumbnail_format(get_request_accept(request))
+        if image_format is not None:
+            url = replace_query_param(url, "image_formats", image_format)
+        next_url = pagination.get_link_after(url, photos[-1])
+
+    context = {"album": album, "photos": photos, "next_url": next_url}
     return render(request, "photos/album.html", context)
 
 
@@ -79,7 +110,7 @@ def album(request, slug):
 def shared_album(request, slug, token):
     album = get_object_or_404(Album, slug=slug)
     check_shared_album_token(album, token)
-    return _render_album_page(request, album)
+    return _render_album_page(request, album, token)
 
 
 def _photo_path(album, filename):
@@ -99,14 +130,22 @@ def _download(request, album, filename):
 
 def _album_download(request, album):
     """This function provides a layer of indirection for shared albums"""
-    albumpath = os.path.join(album.photospath, album.dirname)
-    zipfilename = os.path.join(gettempdir(), "{}.zip".format(album.dirname))
-    if not os.path.exists(zipfilename):
-        with ZipFile(zipfilename, "w") as f:
-            pictures = [os.path.join(albumpath, x) for x in os.listdir(albumpath)]
-            for picture in pictures:
-                f.write(picture, arcname=os.path.basename(picture))
-    return sendfile(request, zipfilename, attachment=True)
+    photos = album.photo_set.filter(hidden=False)
+    zipfilename = "{}.zip".format(album.dirname)
+
+    cache_path = get_album_download_cache_path(album, photos)
+    if cache_path is not None and os.path.isfile(cache_path):
+        return sendfile(
+            request, cache_path, attachment=True, attachment_filename=zipfilename
+        )
+
+    content = stream_album_zip(photos)
+    if cache_path is not None:
+        content = cache_album_zip(content, cache_path)
+
+    response = StreamingHttpResponse(content, content_type="application/zip")
+    response["Content-Disposition"] = 'attachment; filename="{}"'.format(zipfilename)
+    return response
 
 
 @login_required
@@ -1,52 +1,44 @@
+from django.db.models import Count
+
 from events.services import is_organiser
-from .models import Product, Order, PizzaEvent
+from utils.statistics import cached_statistics
+from .models import Order, PizzaEvent
 
 
-def gen_stats_pizza_orders():
+def _count_orders(orders):
     """
-    Generate statistics about number of orders per product
+    Count the orders of the five most ordered products in one query
+    :param orders: queryset of the orders to count
     :return: Dict with key, value being resp. name, order count of a product.
     """
-    total = {}
-
-    for product in Product.objects.all():
-        total.update(
-            {product.name: Order.objects.filter(product=product).count(),}
-        )
-
     return {
-        i[0]: i[1]
-        for i in sorted(total.items(), key=lambda x: x[1], reverse=True)[:5]
-        if i[1] > 0
+        row["product__name"]: row["count"]
+        for row in orders.values("product__name")
+        .annotate(count=Count("pk"))
+        .order_by("-count", "product__name")[:5]
     }
 
 
+@cached_statistics("pizza_orders")
+def gen_stats_pizza_orders():
+    """
+    Generate statistics about number of orders per product
+    :return: Dict with key, value being resp. name, order count of a product.
+    """
+    return _count_orders(Order.objects.all())
+
+
 def gen_stats_current_pizza_orders():
     """
     Generate statistics about number of orders
     per product of the active pizza event
     :return: Dict with key, value being resp. name, order count of a product.
     """
-    total = {}
-
     current_pizza_event = PizzaEvent.current()
     if not current_pizza_event:
         return None
 
-    for product in Product.objects.filter():
-        total.update(
-            {
-                product.name: Order.objects.filter(
-                    product=product, pizza_event=current_pizza_event,
-                ).count(),
-            }
-        )
-
-    return {
-        i[0]: i[1]
-        for i in sorted(total.items(), key=lambda x: x[1], reverse=True)[:5]
-        if i[1] > 0
-    }
+    return _count_orders(Order.objects.filter(pizza_event=current_pizza_event))
 
 
 def can_change_order(member, pizza_event):
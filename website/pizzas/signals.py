@@ -1,7 +1,9 @@
 """The signals checked by the pizzas package"""
 from django.db.models.signals import post_save, post_delete, pre_delete, pre_save
+from django.dispatch import receiver
 
 from utils.models.signals import suspendingreceiver
+from utils.statistics import clear_statistics
 
 
 @suspendingreceiver(
@@ -41,3 +43,16 @@ def pre_order_delete(sender, instance, **kwargs):
     """Re-add user to reminder to on order deletion"""
     if instance.pizza_event.end_reminder and not instance.pizza_event.end_reminder.sent:
         instance.pizza_event.end_reminder.users.add(instance.member)
+
+
+# This receiver keeps a cache correct, so it is never suspended
+@receiver(post_save, sender="pizzas.Order", dispatch_uid="pizzas_order_statistics_save")
+@receiver(
+    post_delete, sender="pizzas.Order", dispatch_uid="pizzas_order_statistics_delete"
+)
+@receiver(
+    post_save, sender="pizzas.Product", dispatch_uid="pizzas_product_statistics_save"
+)
+def clear_order_statistics_cache(sender, instance, **kwargs):
+    """Remove the cached statistics of the orders"""
+    clear_statistics("pizza_orders")
@@ -11,8 +11,9 @@ from freezegun import freeze_time
 from activemembers.models import Committee
 from members.models import Member
 from events.models import Event
-from pizzas.models import PizzaEvent, Order
+from pizzas.models import PizzaEvent, Order, Product
 from pizzas import services
+from utils.statistics import clear_statistics
 
 
 @freeze_time("2018-03-21")
@@ -159,3 +160,26 @@ class PizzaEventTestCase(TestCase):
         # refresh member to defeat cache
         member = Member.objects.get(pk=self.member.pk)
         self.assertTrue(services.can_change_order(member, self.pizzaEvent))
+
+    # Cache locally to count only the queries that compute the statistics
+    @override_settings(STATISTICS_CACHE="default")
+    def test_gen_stats_pizza_orders(self):
+        clear_statistics("pizza_orders")
+        products = [
+            Product.objects.create(name=name, description_en="desc", price=5.00)
+            for name in ["a", "b", "c"]
+        ]
+        Order.objects.create(pizza_event=self.pizzaEvent, product=products[1])
+        Order.objects.create(pizza_event=self.pizzaEvent, product=products[1])
+        Order.objects.create(pizza_event=self.pizzaEvent, product=products[0])
+
+        with self.assertNumQueries(1):
+            self.assertEqual(services.gen_stats_pizza_orders(), {"b": 2, "a": 1})
+            services.gen_stats_pizza_orders()
+        self.assertEqual(services.gen_stats_current_pizza_orders(), {"b": 2, "a": 1})
+
+        # A new order clears the cache
+        Order.objects.create(pizza_event=self.pizzaEvent, product=products[0])
+        self.assertEqual(
+            list(services.gen_stats_pizza_orders().items()), [("a", 2), ("b", 2)]
+        )
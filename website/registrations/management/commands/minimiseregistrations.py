@@ -13,5 +13,10 @@ class Command(BaseCommand):
             help="Dry run instead of saving data",
         )
 
+    def _report_progress(self, done, total):
+        self.stdout.write(f"Removed {done}/{total} registrations")
+
     def handle(self, *args, **options):
-        services.execute_data_minimisation(options["dry-run"])
+        services.execute_data_minimisation(
+            options["dry-run"], progress=self._report_progress
+        )
@@ -7,6 +7,7 @@ from django.conf import settings
 from django.contrib.admin.models import LogEntry, CHANGE
 from django.contrib.admin.options import get_content_type_for_model
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from django.db.models import Q, QuerySet
 from django.utils import timezone
 
@@ -441,12 +442,16 @@ def process_payment(payment: Payment) -> None:
         entry.save()
 
 
-def execute_data_minimisation(dry_run=False):
+def execute_data_minimisation(dry_run=False, progress=None):
     """
     Delete completed or rejected registrations that were modified
     at least 31 days ago
 
+    The registrations are deleted in batches of
+    ``settings.DATA_MINIMISATION_BATCH_SIZE``, each in its own transaction.
     :param dry_run: does not really remove data if True
+    :param progress: function that is called with the number of processed
+                     registrations and the total after every batch, optional
     :return: number of removed registrations
     """
     deletion_period = timezone.now() - timezone.timedelta(days=31)
@@ -457,4 +462,15 @@ def execute_data_minimisation(dry_run=False):
 
     if dry_run:
         return objects.count()
-    return objects.delete()[0]
+
+    pks = list(objects.values_list("pk", flat=True))
+    batch_size = settings.DATA_MINIMISATION_BATCH_SIZE
+    deleted = 0
+    for start in range(0, len(pks), batch_size):
+        with transaction.atomic():
+            deleted += Entry.objects.filter(
+                pk__in=pks[start : start + batch_size]
+            ).delete()[0]
+        if progress:
+            progress(min(start + batch_size, len(pks)), len(pks))
+    return deleted
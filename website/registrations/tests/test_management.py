@@ -21,6 +21,6 @@ class ManagementMinimiseTest(TestCase):
     @mock.patch("registrations.services.execute_data_minimisation")
     def test_handle(self, execute_data_minimisation):
         Command().handle({}, **{"dry-run": False})
-        execute_data_minimisation.assert_called_with(False)
+        execute_data_minimisation.assert_called_with(False, progress=mock.ANY)
         Command().handle({}, **{"dry-run": True})
-        execute_data_minimisation.assert_called_with(True)
+        execute_data_minimisation.assert_called_with(True, progress=mock.ANY)
@@ -583,6 +583,22 @@ class ServicesTest(TestCase):
                     services.process_payment(payment)
                     self.assertFalse(create_membership.called)
 
+    @freeze_time("2019-01-01")
+    @override_settings(DATA_MINIMISATION_BATCH_SIZE=1)
+    def test_execute_data_minimisation_batches(self):
+        with freeze_time("2018-09-01"):
+            Entry.objects.filter(pk__in=[self.e0.pk, self.e1.pk]).update(
+                status=Entry.STATUS_COMPLETED, updated_at=timezone.now()
+            )
+
+        progress = mock.Mock()
+        self.assertEqual(services.execute_data_minimisation(True, progress), 2)
+        progress.assert_not_called()
+        # The registration is deleted together with its entry
+        self.assertEqual(services.execute_data_minimisation(False, progress), 3)
+        progress.assert_has_calls([mock.call(1, 2), mock.call(2, 2)])
+        self.assertFalse(Entry.objects.filter(pk__in=[self.e0.pk, self.e1.pk]))
+
     @freeze_time("2019-01-01")
     def test_execute_data_minimisation(self):
         with self.subTest("No processed entries"):
@@ -10,6 +10,7 @@ from django.db import models
 from django.urls import reverse
 from django.utils.text import slugify
 
+from utils.media.services import clear_thumbnail_manifest
 from utils.threading import PopenAndCall
 
 
@@ -74,6 +75,9 @@ class Thabloid(models.Model):
         )
 
     def post_extract(self):
+        # The pages are regenerated under the same names
+        clear_thumbnail_manifest(os.path.join(settings.MEDIA_ROOT, self.cover))
+
         pages = os.listdir(
             os.path.join(settings.MEDIA_ROOT, os.path.dirname(self.page_url()))
         )
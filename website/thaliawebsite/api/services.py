@@ -1,6 +1,32 @@
 from django.conf import settings
 
-from utils.media.services import get_media_url, get_thumbnail_url
+from utils.media.services import (
+    THUMBNAIL_FORMAT_TYPES,
+    get_media_url,
+    get_request_accept,
+    get_thumbnail_url,
+)
+
+
+def get_image_accept(request):
+    """
+    Get the image types that an API client can show
+
+    The Accept header of API clients lists the types of the response
+    itself, so clients name the thumbnail formats they support in the
+    `image_formats` query parameter, like `?image_formats=avif,webp`.
+    :param request: the request
+    :return: an Accept header with these image types, or the Accept
+             header of the request if the parameter is missing
+    """
+    image_formats = request.GET.get("image_formats")
+    if image_formats is None:
+        return get_request_accept(request)
+    return ",".join(
+        THUMBNAIL_FORMAT_TYPES[image_format]
+        for image_format in image_formats.split(",")
+        if image_format in THUMBNAIL_FORMAT_TYPES
+    )
 
 
 def create_image_thumbnail_dict(
@@ -15,16 +41,17 @@ def create_image_thumbnail_dict(
     fit_large=True,
 ):
     if file:
+        accept = get_image_accept(request)
         return {
             "full": request.build_absolute_uri(get_media_url(file)),
             "small": request.build_absolute_uri(
-                get_thumbnail_url(file, size_small, fit=fit_small)
+                get_thumbnail_url(file, size_small, fit=fit_small, accept=accept)
             ),
             "medium": request.build_absolute_uri(
-                get_thumbnail_url(file, size_medium, fit=fit_medium)
+                get_thumbnail_url(file, size_medium, fit=fit_medium, accept=accept)
             ),
             "large": request.build_absolute_uri(
-                get_thumbnail_url(file, size_large, fit=fit_large)
+                get_thumbnail_url(file, size_large, fit=fit_large, accept=accept)
             ),
         }
     return {
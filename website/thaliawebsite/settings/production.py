@@ -57,6 +57,12 @@ if not settings.DEBUG:
 SENDFILE_URL = "/media/sendfile/"
 SENDFILE_ROOT = "/concrexit/media/"
 
+# Album downloads must be cached inside SENDFILE_ROOT to be served by nginx
+PHOTO_ALBUM_DOWNLOAD_CACHE_DIR = "/concrexit/media/album-downloads/"
+
+# Serve smaller thumbnails to clients that support them
+THUMBNAIL_FORMATS = ["avif", "webp"]
+
 STATIC_URL = "/static/"
 STATIC_ROOT = "/concrexit/static"
 
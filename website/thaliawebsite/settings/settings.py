@@ -68,7 +68,7 @@ INSTALLED_APPS = [
     "documents.apps.DocumentsConfig",
     "activemembers.apps.ActiveMembersConfig",
     "photos.apps.PhotosConfig",
-    "utils",
+    "utils.apps.UtilsConfig",
     "mailinglists.apps.MailinglistsConfig",
     "merchandise.apps.MerchandiseConfig",
     "thabloid.apps.ThabloidConfig",
@@ -104,6 +104,7 @@ MIDDLEWARE = [
     "django.middleware.locale.LocaleMiddleware",
     # Our middleware
     "members.middleware.MemberMiddleware",
+    "utils.media.middleware.ThumbnailFormatMiddleware",
 ]
 
 ROOT_URLCONF = "thaliawebsite.urls"
@@ -209,7 +210,17 @@ LOCALE_PATHS = ("locale",)
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 MEDIA_URL = "/media/"  # Public is included by the db fields
 
+# Set to "utils.media.storage.DeduplicatedStorage" to store the content of
+# equal files only once, see utils/media/storage.py
+DEFAULT_FILE_STORAGE = "django.core.files.storage.FileSystemStorage"
+
+# Serve media with X-Accel-Redirect (nginx) or X-Sendfile (Apache) in
+# production, see utils/media/sendfile.py
 SENDFILE_BACKEND = "django_sendfile.backends.development"
+# Private media urls stay the same for windows of this many seconds,
+# and are valid for at least the maximum age after they are created
+MEDIA_SIGNATURE_WINDOW = 60 * 60
+MEDIA_SIGNATURE_MAX_AGE = 60 * 60 * 3
 
 STATIC_URL = "/static/"
 STATIC_ROOT = os.path.join(BASE_DIR, "static")
@@ -244,6 +255,30 @@ MEMBERSHIP_PRICES = {
     "year": 7.5,
     "study": 30,
 }
+# Caches, every process has its own default cache while the shared cache is
+# stored in the database, create its table with `./manage.py createcachetable`
+CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "shared": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "cache",
+    },
+}
+# Cache that holds the statistics of members, events and pizza orders, it must
+# be shared by all processes since any of them may clear the statistics
+STATISTICS_CACHE = "shared"
+STATISTICS_TIMEOUT = 60 * 60 * 24
+# Number of members or registrations of which the data is minimised at once
+DATA_MINIMISATION_BATCH_SIZE = 500
+# Number of processes that render the emails of bulk mailings to members.
+# None uses one process per CPU core, 0 renders them sequentially.
+MAILING_WORKERS = None
+# Number of emails of a bulk mailing that are sent and recorded at once,
+# spread over this number of connections to the mail server
+MAILING_BATCH_SIZE = 100
+MAILING_CONNECTIONS = 2
+# Maximum number of emails of a bulk mailing sent per second, None for no limit
+MAILING_RATE = 10
 
 THUMBNAIL_SIZES = {
     "small": "150x150",
@@ -251,6 +286,24 @@ THUMBNAIL_SIZES = {
     "large": "1024x768",
     "slide": "2000x430",
 }
+# Generate all thumbnail sizes of uploaded images in the background
+THUMBNAIL_PREGENERATE = True
+THUMBNAIL_PREGENERATE_WORKERS = 2
+# Cache that holds the manifest of generated thumbnails, it must be shared by
+# all processes since any of them may replace an original
+THUMBNAIL_MANIFEST_CACHE = "shared"
+# Cache that limits how often the access times of thumbnails are updated
+THUMBNAIL_ACCESS_CACHE = "default"
+THUMBNAIL_MANIFEST_TIMEOUT = 60 * 60 * 24
+# Seconds to wait for another worker that is generating the same thumbnail
+THUMBNAIL_LOCK_TIMEOUT = 10
+# Maximum total size of all private thumbnails in bytes, see `evictthumbnails`
+THUMBNAIL_CACHE_QUOTA = None
+# Seconds between updates of the access time of a thumbnail
+THUMBNAIL_ACCESS_INTERVAL = 60 * 60
+# Formats to create additional thumbnail variants in, in order of preference.
+# Clients get the first one they accept, formats Pillow cannot write are skipped.
+THUMBNAIL_FORMATS = []
 
 # Firebase config
 FIREBASE_CREDENTIALS = os.environ.get("FIREBASE_CREDENTIALS", "{}")
@@ -309,6 +362,17 @@ GOOGLE_PLACES_API_KEY = os.environ.get("GOOGLE_PLACES_API_KEY", "")
 
 # Photos settings
 PHOTO_UPLOAD_SIZE = 2560, 1440
+# Number of processes used to decode and resize photos from uploaded archives,
+# at most one per CPU core. Uploads are handled by the web server, so keep this
+# small. 0 processes archives sequentially, None uses one per CPU core.
+PHOTO_UPLOAD_WORKERS = 2
+# Number of photos that are committed to the database at once
+PHOTO_UPLOAD_BATCH_SIZE = 50
+# Directory where album downloads are cached, None disables caching
+PHOTO_ALBUM_DOWNLOAD_CACHE_DIR = None
+# Maximum number of bits (of 64) in which the perceptual hashes of
+# near-duplicate photos differ
+PHOTO_NEAR_DUPLICATE_DISTANCE = 4
 
 # TinyMCE config
 TINYMCE_JS_URL = "/static/tinymce/js/tinymce/tinymce.min.js"
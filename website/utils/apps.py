@@ -0,0 +1,14 @@
+"""Configuration for the utils package"""
+from django.apps import AppConfig
+
+
+class UtilsConfig(AppConfig):
+    """AppConfig for the utils package"""
+
+    name = "utils"
+
+    def ready(self):
+        """Imports the signals when the app is ready"""
+        from .media import signals
+
+        signals.connect_image_signals()
@@ -0,0 +1,124 @@
+"""
+Provides the command to measure how fast thumbnails are created
+"""
+import multiprocessing
+import os
+import time
+
+from PIL import Image, ImageOps
+from django.core.management.base import BaseCommand, CommandError
+
+from utils.media.images import create_thumbnail_image
+from utils.media.services import IMAGE_EXTENSIONS
+
+
+def _full_resolution_thumbnail(path, size, fit):
+    """Create a thumbnail by decoding the full image, like we used to"""
+    image = Image.open(path)
+    dimensions = tuple(int(dim) for dim in size.split("x"))
+    if not fit:
+        ratio = min([a / b for a, b in zip(dimensions, image.size)])
+        dimensions = tuple(int(ratio * x) for x in image.size)
+    return ImageOps.fit(image, dimensions, Image.ANTIALIAS)
+
+
+def _read_memory_status(field):
+    """
+    :param field: the field of /proc/self/status to read, like `VmRSS`
+    :return: the value of the field in kB
+    """
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith(f"{field}:"):
+                return int(line.split()[1])
+    raise CommandError(f"Cannot measure {field}")
+
+
+def _measure(method, paths, size, fit):
+    """
+    Create a thumbnail of every image and measure the time and memory
+    :return: tuple of the seconds per image and the peak memory in kB
+    """
+    # Reset the peak resident memory, so the memory used to start
+    # this process is not counted (Linux only)
+    with open("/proc/self/clear_refs", "w") as clear_refs:
+        clear_refs.write("5")
+    baseline = _read_memory_status("VmRSS")
+
+    timings = []
+    for path in paths:
+        start = time.perf_counter()
+        method(path, size, fit).load()
+        timings.append(time.perf_counter() - start)
+    return timings, _read_memory_status("VmHWM") - baseline
+
+
+class Command(BaseCommand):
+    """Command to compare full and reduced resolution thumbnailing"""
+
+    help = (
+        "Creates thumbnails of a set of images by fully decoding them and "
+        "by decoding them at a reduced resolution, and reports the time "
+        "per image and the peak memory usage of both."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "paths", nargs="+", help="Images or directories containing images",
+        )
+        parser.add_argument(
+            "--size",
+            default="150x150",
+            help="Size of the thumbnails, formatted like `widthxheight`",
+        )
+        parser.add_argument(
+            "--no-fit",
+            action="store_false",
+            dest="fit",
+            default=True,
+            help="Keep the aspect ratio instead of cropping",
+        )
+
+    def _find_images(self, paths):
+        for path in paths:
+            if os.path.isdir(path):
+                for root, _dirs, filenames in os.walk(path):
+                    for filename in sorted(filenames):
+                        if filename.lower().endswith(IMAGE_EXTENSIONS):
+                            yield os.path.join(root, filename)
+            else:
+                yield path
+
+    def handle(self, *args, **options):
+        paths = list(self._find_images(options["paths"]))
+        if not paths:
+            raise CommandError("No images found")
+
+        # Every method gets a new process, so the memory used by
+        # the first method does not hide the usage of the second
+        context = multiprocessing.get_context("spawn")
+        results = {}
+        for name, method in (
+            ("full resolution", _full_resolution_thumbnail),
+            ("reduced resolution", create_thumbnail_image),
+        ):
+            with context.Pool(1) as pool:
+                results[name] = pool.apply(
+                    _measure, (method, paths, options["size"], options["fit"])
+                )
+
+        self.stdout.write(f"Created {len(paths)} thumbnails of {options['size']}")
+        for name, (timings, peak) in results.items():
+            self.stdout.write(
+                f"{name}: {sum(timings) / len(timings) * 1000:.1f} ms per image, "
+                f"{max(timings) * 1000:.1f} ms slowest, "
+                f"{peak / 1024:.1f} MB peak memory"
+            )
+
+        full_timings, full_peak = results["full resolution"]
+        reduced_timings, reduced_peak = results["reduced resolution"]
+        self.stdout.write(
+            f"Reduced resolution decoding is "
+            f"{sum(full_timings) / sum(reduced_timings):.1f}x as fast and uses "
+            f"{reduced_peak / max(full_peak, 1) * 100:.0f}% of the memory"
+        )
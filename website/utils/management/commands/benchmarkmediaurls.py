@@ -0,0 +1,73 @@
+"""
+Provides the command to measure how fast private media urls are signed
+"""
+import time
+
+from django.conf import settings
+from django.core import signing
+from django.core.management.base import BaseCommand
+
+from utils.media import signatures
+from utils.media.services import _get_media_info, get_media_url
+
+
+def _dumps_media_url(path):
+    """Get the url of a private media file signed with a dict, like we used to"""
+    return (
+        f"{settings.MEDIA_URL}private/{path}"
+        f"?sig={signing.dumps(_get_media_info(path))}"
+    )
+
+
+def _measure(method, paths, repeat):
+    """
+    Get the url of every path a number of times
+    :return: the number of urls per second
+    """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for path in paths:
+            method(path)
+    return len(paths) * repeat / (time.perf_counter() - start)
+
+
+class Command(BaseCommand):
+    """Command to compare dict signatures and time-windowed signatures"""
+
+    help = (
+        "Creates the urls of private media files with the signed dicts we "
+        "used before and with time-windowed signatures, and reports the "
+        "number of urls created per second."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--count", type=int, default=1000, help="Number of different files",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=5,
+            help="Number of times the url of every file is created",
+        )
+
+    def handle(self, *args, **options):
+        paths = [f"photos/benchmark/{i:05}.jpg" for i in range(options["count"])]
+
+        signatures._sign.cache_clear()
+        results = [
+            ("signed dict", _measure(_dumps_media_url, paths, options["repeat"])),
+            ("time-windowed, first use", _measure(get_media_url, paths, 1)),
+            (
+                "time-windowed, cached",
+                _measure(get_media_url, paths, options["repeat"]),
+            ),
+        ]
+
+        self.stdout.write(f"Created the urls of {len(paths)} files")
+        for name, per_second in results:
+            self.stdout.write(f"{name}: {per_second:.0f} urls/s")
+        self.stdout.write(
+            f"Cached time-windowed signatures are "
+            f"{results[2][1] / results[0][1]:.1f}x as fast as signed dicts"
+        )
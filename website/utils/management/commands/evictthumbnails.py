@@ -0,0 +1,56 @@
+"""
+Provides the command to keep the thumbnails within their quota
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from utils.media.services import evict_thumbnails
+
+
+class Command(BaseCommand):
+    """Command to remove the least recently used thumbnails"""
+
+    help = (
+        "Removes the least recently used private thumbnails until they "
+        "together fit in THUMBNAIL_CACHE_QUOTA. Removed thumbnails are "
+        "generated again when they are requested. Public thumbnails are "
+        "never removed, since the web server serves them directly."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            dest="dry-run",
+            default=False,
+            help="Only report the thumbnails that would be removed",
+        )
+        parser.add_argument(
+            "--quota",
+            type=int,
+            default=None,
+            help="Quota in bytes, defaults to THUMBNAIL_CACHE_QUOTA",
+        )
+
+    def handle(self, *args, **options):
+        quota = options["quota"]
+        if quota is None:
+            quota = settings.THUMBNAIL_CACHE_QUOTA
+        if quota is None:
+            raise CommandError("No quota configured in THUMBNAIL_CACHE_QUOTA")
+
+        evicted, total = evict_thumbnails(quota, options["dry-run"])
+
+        if options["dry-run"]:
+            for path in evicted:
+                self.stdout.write(path)
+            self.stdout.write(f"{len(evicted)} thumbnails would be removed")
+        else:
+            self.stdout.write(f"Removed {len(evicted)} thumbnails")
+
+        self.stdout.write(f"{total} of {quota} bytes used")
+        if total > quota:
+            self.stderr.write(
+                "The remaining thumbnails have all been used recently, "
+                "consider increasing the quota"
+            )
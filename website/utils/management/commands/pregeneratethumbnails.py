@@ -0,0 +1,74 @@
+"""
+Provides the command to generate missing thumbnails ahead of time
+"""
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+
+from utils.media.services import create_thumbnail, find_stale_thumbnails
+
+
+class Command(BaseCommand):
+    """Command to generate all missing or outdated thumbnails"""
+
+    help = (
+        "Generates the missing or outdated thumbnails of all images "
+        "in the media root in parallel."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            dest="dry-run",
+            default=False,
+            help="Only report the thumbnails that would be generated",
+        )
+        parser.add_argument(
+            "--size",
+            action="append",
+            dest="sizes",
+            default=None,
+            help="Only generate this size, formatted like `widthxheight`. "
+            "Can be given multiple times. Defaults to all THUMBNAIL_SIZES.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Number of worker processes, defaults to the number of CPUs",
+        )
+
+    def handle(self, *args, **options):
+        thumbnails = list(find_stale_thumbnails(options["sizes"]))
+        total = len(thumbnails)
+
+        if options["dry-run"]:
+            for _original, thumbnail, *_variant in thumbnails:
+                self.stdout.write(thumbnail)
+            self.stdout.write(f"{total} thumbnails would be generated")
+            return
+
+        start = time.monotonic()
+        done = 0
+        failed = 0
+        with ProcessPoolExecutor(max_workers=options["workers"]) as executor:
+            futures = {
+                executor.submit(create_thumbnail, *thumbnail): thumbnail
+                for thumbnail in thumbnails
+            }
+            for future in as_completed(futures):
+                done += 1
+                try:
+                    future.result()
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(f"Could not generate {futures[future][1]}: {e}")
+                if done % 100 == 0 or done == total:
+                    self.stdout.write(f"Generated {done}/{total} thumbnails")
+
+        self.stdout.write(
+            f"Generated {total - failed} thumbnails in "
+            f"{time.monotonic() - start:.1f} seconds, {failed} failed"
+        )
@@ -0,0 +1,50 @@
+"""
+Provides the command to remove stored contents that are not used anymore
+"""
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+
+from utils.media.storage import (
+    DeduplicatedStorage,
+    get_object_stats,
+    remove_unused_objects,
+)
+
+
+class Command(BaseCommand):
+    """Command to collect the garbage of the deduplicated media storage"""
+
+    help = (
+        "Removes the objects of the deduplicated media storage that no file "
+        "refers to anymore and reports how much space deduplication saves."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            default=False,
+            help="Only report which objects would be removed",
+        )
+
+    def handle(self, *args, **options):
+        if not isinstance(default_storage, DeduplicatedStorage):
+            raise CommandError("The default file storage is not deduplicated")
+
+        count, freed = remove_unused_objects(
+            default_storage.location, options["dry_run"]
+        )
+        self.stdout.write(
+            "{} unused objects {} removed, freeing {:.1f} MB".format(
+                count,
+                "would be" if options["dry_run"] else "were",
+                freed / 1024 / 1024,
+            )
+        )
+
+        objects, references, saved = get_object_stats(default_storage.location)
+        self.stdout.write(
+            "{} files refer to {} objects, saving {:.1f} MB".format(
+                references, objects, saved / 1024 / 1024
+            )
+        )
@@ -0,0 +1,141 @@
+"""
+Image processing shared by the thumbnails and the photo uploads
+
+Camera JPEGs are large: fully decoding a 24 megapixel photo takes about
+70MB of memory, only to throw most of it away when resizing. JPEG can be
+decoded directly at 1/2, 1/4 or 1/8 of its resolution, which is much
+faster and uses a fraction of the memory. We use that (Pillow's draft
+mode) to decode every image at the smallest resolution that is still
+large enough for a high quality resize.
+"""
+from datetime import datetime
+
+from PIL import ExifTags, Image, ImageOps
+from PIL.JpegImagePlugin import JpegImageFile
+
+# Decode at least this many times the target size, so the final
+# resize still has enough pixels to produce a sharp image
+DRAFT_REDUCING_GAP = 2
+
+EXIF_ORIENTATION = {
+    1: 0,
+    2: 0,
+    3: 180,
+    4: 180,
+    5: 90,
+    6: 90,
+    7: 270,
+    8: 270,
+}
+
+
+def _get_exif(image):
+    """
+    :param image: the PIL image
+    :return: dict of the EXIF tags of a JPEG image by name
+    """
+    if isinstance(image, JpegImageFile) and image._getexif():
+        return {
+            ExifTags.TAGS[k]: v
+            for k, v in image._getexif().items()
+            if k in ExifTags.TAGS
+        }
+    return {}
+
+
+def get_exif_rotation(image):
+    """
+    Determine the rotation of an image from its EXIF orientation
+    :param image: the PIL image
+    :return: the rotation in degrees
+    """
+    exif = _get_exif(image)
+    if exif.get("Orientation"):
+        return EXIF_ORIENTATION[exif.get("Orientation")]
+    return 0
+
+
+def get_exif_taken_at(image):
+    """
+    Determine when a photo was taken from its EXIF data
+    :param image: the PIL image
+    :return: the naive local datetime, or None if it is unknown
+    """
+    exif = _get_exif(image)
+    for tag in ("DateTimeOriginal", "DateTimeDigitized", "DateTime"):
+        value = exif.get(tag)
+        if not isinstance(value, str):
+            continue
+        try:
+            return datetime.strptime(value.strip("\x00 "), "%Y:%m:%d %H:%M:%S")
+        except ValueError:
+            continue
+    return None
+
+
+def _draft(image, size):
+    """
+    Let a JPEG image be decoded at the smallest resolution that is still
+    large enough to be resized to a size. This does nothing for other
+    formats or images that have already been decoded.
+    :param image: the PIL image
+    :param size: the (width, height) the image will be resized to
+    """
+    image.draft(None, tuple(max(dim, 1) * DRAFT_REDUCING_GAP for dim in size))
+
+
+def resize_image(image, size):
+    """
+    Shrink an image to fit within a size, keeping the aspect ratio.
+    Images that are smaller are not enlarged.
+    :param image: the PIL image, as returned by `Image.open`
+    :param size: the maximum (width, height)
+    :return: tuple of the resized RGB image and its EXIF rotation
+    """
+    _draft(image, size)
+    rotation = get_exif_rotation(image)
+    # Image.thumbnail does not upscale an image that is smaller
+    image.thumbnail(size, Image.ANTIALIAS)
+    return image.convert("RGB"), rotation
+
+
+def create_thumbnail_image(fp, size, fit):
+    """
+    Decode an image and create a thumbnail from it
+    :param fp: a filename or file object
+    :param size: size of the thumbnail formatted like `widthxheight`
+    :param fit: False to keep the aspect ratio, True to crop
+    :return: the thumbnail as PIL image
+    """
+    image = Image.open(fp)
+    original_size = image.size
+    dimensions = tuple(int(dim) for dim in size.split("x"))
+    if not fit:
+        ratio = min([a / b for a, b in zip(dimensions, original_size)])
+        dimensions = tuple(int(ratio * x) for x in original_size)
+
+    if dimensions == original_size:
+        return image
+
+    _draft(image, dimensions)
+    return ImageOps.fit(image, dimensions, Image.ANTIALIAS)
+
+
+def get_perceptual_hash(image):
+    """
+    Calculate the difference hash (dHash) of an image
+
+    Unlike a cryptographic hash, images that look alike, for example
+    a photo and a recompressed or resized copy of it, have hashes that
+    only differ in a few bits.
+    :param image: the PIL image
+    :return: the 64 bit hash formatted as 16 hexadecimal characters
+    """
+    pixels = list(image.convert("L").resize((9, 8), Image.ANTIALIAS).getdata())
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            value = (value << 1) | (left > right)
+    return f"{value:016x}"
@@ -0,0 +1,18 @@
+"""Middleware provided by the utils.media package"""
+from django.utils.cache import patch_vary_headers
+
+
+class ThumbnailFormatMiddleware:
+    """
+    Adds `Vary: Accept` to responses that link to thumbnails in a format
+    that was picked with the Accept header of the request
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if getattr(request, "_thumbnail_format_negotiated", False):
+            patch_vary_headers(response, ("Accept",))
+        return response
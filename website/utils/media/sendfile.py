@@ -0,0 +1,170 @@
+"""
+Serve files from the media root
+
+This wraps `django_sendfile`. The response always carries an ETag and
+Last-Modified header, so browsers that have the file already get a
+`304 Not Modified`. In production the file itself is sent by the web
+server (`X-Accel-Redirect` for nginx or `X-Sendfile` for Apache), as
+configured with `SENDFILE_BACKEND`. Without such a backend the file is
+served from Python, including support for a single HTTP Range.
+"""
+import os
+import re
+
+import django_sendfile
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+
+# Backends that do not hand the file to the web server
+PYTHON_BACKENDS = (
+    "django_sendfile.backends.development",
+    "django_sendfile.backends.simple",
+)
+
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def get_file_etag(stat):
+    """
+    The ETag of a file, in the same format as nginx uses for static files
+    :param stat: the result of `os.stat` for the file
+    :return: the quoted ETag
+    """
+    return '"{:x}-{:x}"'.format(int(stat.st_mtime), stat.st_size)
+
+
+def _parse_range(header, size):
+    """
+    Parse a Range header with a single range of bytes
+    :param header: the value of the Range header
+    :param size: the size of the file
+    :return: tuple of the first and last byte, None if the whole file
+             should be sent or False if the range cannot be satisfied
+    """
+    match = RANGE_PATTERN.match(header.replace(" ", ""))
+    if not match or match.groups() == ("", ""):
+        # Multiple ranges or another unit, send the whole file
+        return None
+
+    first, last = match.groups()
+    if first == "":
+        # The last bytes of the file
+        first, last = max(size - int(last), 0), size - 1
+    else:
+        first = int(first)
+        last = min(int(last), size - 1) if last else size - 1
+
+    if first > last or first >= size:
+        return False
+    return first, last
+
+
+def _if_range_passes(request, etag, last_modified):
+    """
+    Check whether a Range request still applies to the current file
+    :return: False if the If-Range header refers to another version
+    """
+    if_range = request.META.get("HTTP_IF_RANGE")
+    if not if_range:
+        return True
+    if if_range.startswith(('"', "W/")):
+        # Weak ETags never match for ranges
+        return parse_etags(if_range) == [etag]
+    return parse_http_date_safe(if_range) == last_modified
+
+
+def _read_range(file, first, last, block_size=FileResponse.block_size):
+    file.seek(first)
+    remaining = last - first + 1
+    while remaining > 0:
+        data = file.read(min(block_size, remaining))
+        if not data:
+            break
+        remaining -= len(data)
+        yield data
+
+
+def _serve(request, filename, stat, etag, last_modified, **kwargs):
+    """Serve a file from Python, supporting a single HTTP Range"""
+    byte_range = None
+    if "HTTP_RANGE" in request.META and _if_range_passes(request, etag, last_modified):
+        byte_range = _parse_range(request.META["HTTP_RANGE"], stat.st_size)
+
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{stat.st_size}"
+        return response
+
+    response = FileResponse(
+        open(filename, "rb"),
+        as_attachment=kwargs["attachment"],
+        filename=kwargs["attachment_filename"] or os.path.basename(filename),
+    )
+    if byte_range is not None:
+        first, last = byte_range
+        response.streaming_content = _read_range(response.file_to_stream, first, last)
+        response.status_code = 206
+        response["Content-Range"] = f"bytes {first}-{last}/{stat.st_size}"
+        response["Content-Length"] = last - first + 1
+    return response
+
+
+def sendfile(
+    request, filename, attachment=False, attachment_filename=None, max_age=None
+):
+    """
+    Create the response that sends a file
+
+    :param request: the request
+    :param filename: the absolute path of the file
+    :param attachment: True to let the browser download the file
+    :param attachment_filename: the name the file is downloaded as,
+                                defaults to the name of the file
+    :param max_age: the number of seconds that browsers may use their copy
+                    without asking if it is still current, or None to let
+                    them ask every time
+    :return: the response
+    """
+    if not os.path.isfile(filename):
+        raise Http404("Media not found.")
+
+    stat = os.stat(filename)
+    etag = get_file_etag(stat)
+    last_modified = int(stat.st_mtime)
+
+    validators = HttpResponse()
+    validators["ETag"] = etag
+    validators["Last-Modified"] = http_date(last_modified)
+    if max_age is not None:
+        patch_cache_control(validators, private=True, max_age=max_age)
+    else:
+        # Browsers may keep the file, but must check it is still current
+        patch_cache_control(validators, private=True, no_cache=True)
+
+    response = get_conditional_response(request, etag, last_modified, validators)
+    if response is not validators:
+        return response
+
+    if settings.SENDFILE_BACKEND in PYTHON_BACKENDS:
+        response = _serve(
+            request,
+            filename,
+            stat,
+            etag,
+            last_modified,
+            attachment=attachment,
+            attachment_filename=attachment_filename,
+        )
+    else:
+        response = django_sendfile.sendfile(
+            request,
+            filename,
+            attachment=attachment,
+            attachment_filename=attachment_filename,
+        )
+    response["Accept-Ranges"] = "bytes"
+    for header in ("ETag", "Last-Modified", "Cache-Control"):
+        response[header] = validators[header]
+    return response
@@ -1,10 +1,39 @@
+import fcntl
+import hashlib
+import logging
 import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
 
-from django.db.models.fields.files import ImageFieldFile
+from PIL import Image
+
+from django.db import transaction
+from django.db.models.fields.files import FieldFile, ImageFieldFile
 from django.conf import settings
-from django.core import signing
+from django.core.cache import caches
 from django.urls import reverse
 
+from utils.media.images import create_thumbnail_image
+from utils.media.signatures import sign
+
+logger = logging.getLogger(__name__)
+
+_thumbnail_executor = None
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".gif")
+
+THUMBNAIL_FORMAT_TYPES = {
+    "avif": "image/avif",
+    "webp": "image/webp",
+}
+
+
+class ThumbnailLockTimeout(Exception):
+    """Raised when another worker takes too long to generate a thumbnail"""
+
 
 def get_media_url(path, attachment=False):
     """
@@ -18,39 +47,119 @@ def get_media_url(path, attachment=False):
     if isinstance(path, ImageFieldFile):
         path = path.name
 
-    parts = path.split("/")
     query = ""
     url_path = path
-    sig_info = {
-        "visibility": "private" if parts[0] != "public" else "public",
-        "serve_path": os.path.join(settings.MEDIA_ROOT, path),
-        "attachment": attachment,
-    }
+    sig_info = _get_media_info(path, attachment)
 
     if sig_info["visibility"] == "private":
         # Add private to path and calculate signature
         url_path = f"private/{path}"
-        query = f"?sig={signing.dumps(sig_info)}"
+        query = f"?sig={sign(sig_info)}"
 
     return f"{settings.MEDIA_URL}{url_path}{query}"
 
 
-def get_thumbnail_url(path, size, fit=True):
+def _get_media_info(path, attachment=False):
     """
-    Get the thumbnail url of a media file. NEVER use this with user input.
-    If the thumbnail exists this function will return the url of the
-    media file, with signature if necessary. Does it not yet exist a route
-    that executes the :func:`utils.media.views.generate_thumbnail`
-    will be the output.
-    :param path: the location of the file
+    Assemble the information that describes a media file
+    :param path: the location of the file, relative to the media root
+    :param attachment: True if the file is a forced download
+    :return: the signature info of the file
+    """
+    return {
+        "visibility": "private" if path.split("/")[0] != "public" else "public",
+        "serve_path": os.path.join(settings.MEDIA_ROOT, path),
+        "attachment": attachment,
+    }
+
+
+@lru_cache(maxsize=None)
+def _can_save_format(image_format):
+    Image.init()
+    return Image.registered_extensions().get(f".{image_format}") in Image.SAVE
+
+
+def get_thumbnail_formats():
+    """
+    Get the formats that thumbnail variants are created in
+    :return: the formats of `THUMBNAIL_FORMATS` that can be written
+    """
+    return [
+        image_format
+        for image_format in settings.THUMBNAIL_FORMATS
+        if image_format in THUMBNAIL_FORMAT_TYPES and _can_save_format(image_format)
+    ]
+
+
+def get_accepted_thumbnail_format(accept):
+    """
+    Pick the preferred thumbnail format that a client accepts
+
+    Only formats that the client names explicitly are used, since
+    clients that send a wildcard do not necessarily support them.
+    :param accept: the value of the Accept header of the client
+    :return: the format, or None to use the format of the original
+    """
+    if not accept:
+        return None
+
+    accepted = set()
+    for media_range in accept.split(","):
+        media_type, *params = [part.strip() for part in media_range.split(";")]
+        if "q=0" not in params and "q=0.0" not in params:
+            accepted.add(media_type.lower())
+
+    for image_format in get_thumbnail_formats():
+        if THUMBNAIL_FORMAT_TYPES[image_format] in accepted:
+            return image_format
+    return None
+
+
+def get_request_accept(request):
+    """
+    Get the Accept header of a request to pick thumbnail formats with
+
+    The response is marked, so
+    :class:`utils.media.middleware.ThumbnailFormatMiddleware` adds
+    `Vary: Accept` and shared caches keep the variants apart.
+    :param request: the request
+    :return: the Accept header, or None if there is none
+    """
+    if get_thumbnail_formats():
+        # Mark the Django request, also when given a REST framework request
+        getattr(request, "_request", request)._thumbnail_format_negotiated = True
+    return request.META.get("HTTP_ACCEPT")
+
+
+def get_accept_header(context):
+    """
+    Get the Accept header of the request a template is rendered for
+    :param context: the template context
+    :return: the Accept header, or None if there is no request
+    """
+    request = context.get("request")
+    if request is None:
+        return None
+    return get_request_accept(request)
+
+
+def _get_manifest_entry_name(size, fit, image_format=None):
+    name = "{}_{}".format(size, int(fit))
+    if image_format:
+        name += f".{image_format}"
+    return name
+
+
+def _get_thumbnail_info(path, size, fit, image_format=None):
+    """
+    Assemble the information that describes a thumbnail
+    :param path: the location of the file, relative to the media root
     :param size: size of the image
     :param fit: False to keep the aspect ratio, True to crop
-    :return: direct media url or generate-thumbnail path
+    :param image_format: the format of the variant, None for the format
+                         of the original
+    :return: the signature info of the thumbnail
     """
-    if isinstance(path, ImageFieldFile):
-        path = path.name
-
-    query = ""
     size_fit = "{}_{}".format(size, int(fit))
     parts = path.split("/")
 
@@ -68,8 +177,19 @@ def get_thumbnail_url(path, size, fit=True):
         sig_info["visibility"] = "private"
 
     sig_info["thumb_path"] = f'thumbnails/{size_fit}/{sig_info["path"]}'
-    url_path = f'{sig_info["visibility"]}/thumbnails/' f'{size_fit}/{sig_info["path"]}'
+    if image_format:
+        sig_info["format"] = image_format
+        sig_info["thumb_path"] += f".{image_format}"
+    sig_info["serve_path"] = get_thumbnail_paths(sig_info)[1]
+    return sig_info
+
 
+def get_thumbnail_paths(sig_info):
+    """
+    Get the locations of the original and the thumbnail on disk
+    :param sig_info: the signature info of the thumbnail
+    :return: tuple of the full original path and the full thumbnail path
+    """
     if sig_info["visibility"] == "public":
         full_original_path = os.path.join(
             settings.MEDIA_ROOT, "public", sig_info["path"]
@@ -80,29 +200,407 @@ def get_thumbnail_url(path, size, fit=True):
     else:
         full_original_path = os.path.join(settings.MEDIA_ROOT, sig_info["path"])
         full_thumb_path = os.path.join(settings.MEDIA_ROOT, sig_info["thumb_path"])
+    return full_original_path, full_thumb_path
+
+
+def _get_thumbnail_manifest_key(full_original_path):
+    digest = hashlib.sha1(full_original_path.encode("utf-8")).hexdigest()
+    return f"thumbnail-manifest-{digest}"
+
+
+def get_thumbnail_manifest(full_original_path):
+    """
+    Get the thumbnails of an original that are known to exist and be up to date
+    :param full_original_path: the location of the original on disk
+    :return: dict mapping `{size}_{fit}` and `{size}_{fit}.{format}` to the
+             time at which the thumbnail was recorded
+    """
+    cache = caches[settings.THUMBNAIL_MANIFEST_CACHE]
+    return cache.get(_get_thumbnail_manifest_key(full_original_path), {})
+
+
+def _is_thumbnail_recorded(full_original_path, entry_name):
+    recorded_at = get_thumbnail_manifest(full_original_path).get(entry_name)
+    # Entries expire individually, this guarantees that the thumbnail
+    # eviction never removes a thumbnail that is still in a manifest
+    return (
+        recorded_at is not None
+        and recorded_at > time.time() - settings.THUMBNAIL_MANIFEST_TIMEOUT
+    )
+
+
+def record_thumbnail(full_original_path, full_thumb_path, size, fit, image_format=None):
+    """
+    Record in the manifest that an up to date thumbnail exists
+    :param full_original_path: the location of the original on disk
+    :param full_thumb_path: the location of the thumbnail on disk
+    :param size: size of the thumbnail
+    :param fit: False to keep the aspect ratio, True to crop
+    :param image_format: the format of the variant, None for the original
+    """
+    cache = caches[settings.THUMBNAIL_MANIFEST_CACHE]
+    key = _get_thumbnail_manifest_key(full_original_path)
+    manifest = cache.get(key, {})
+    manifest[_get_manifest_entry_name(size, fit, image_format)] = time.time()
+    cache.set(key, manifest, settings.THUMBNAIL_MANIFEST_TIMEOUT)
+    touch_thumbnail(full_thumb_path)
+
+
+def touch_thumbnail(full_thumb_path):
+    """
+    Mark a thumbnail as recently used by updating its access time
+
+    This happens at most once per `THUMBNAIL_ACCESS_INTERVAL` for every
+    thumbnail, the access times are used to evict the least recently
+    used thumbnails. The modification time is left untouched since it is
+    used to detect outdated thumbnails.
+    :param full_thumb_path: the location of the thumbnail on disk
+    """
+    cache = caches[settings.THUMBNAIL_ACCESS_CACHE]
+    digest = hashlib.sha1(full_thumb_path.encode("utf-8")).hexdigest()
+    if not cache.add(
+        f"thumbnail-access-{digest}", True, settings.THUMBNAIL_ACCESS_INTERVAL
+    ):
+        return
+
+    try:
+        stat = os.stat(full_thumb_path)
+        os.utime(full_thumb_path, ns=(time.time_ns(), stat.st_mtime_ns))
+    except FileNotFoundError:
+        pass
+
 
-    sig_info["serve_path"] = full_thumb_path
+def clear_thumbnail_manifest(full_original_path):
+    """
+    Forget all thumbnails of an original, so they are checked
+    on disk again the next time they are requested
+
+    This must be called whenever an original is replaced under the same
+    name, otherwise its outdated thumbnails are served until the entries
+    expire.
+    :param full_original_path: the location of the original on disk
+    """
+    cache = caches[settings.THUMBNAIL_MANIFEST_CACHE]
+    cache.delete(_get_thumbnail_manifest_key(full_original_path))
 
-    # Check if we need to generate, then redirect to the generating route,
-    # otherwise just return the serving file path
-    if not os.path.isfile(full_thumb_path) or (
+
+def is_thumbnail_stale(full_original_path, full_thumb_path):
+    """
+    Check if a thumbnail does not exist or is older than its original
+    :param full_original_path: the location of the original on disk
+    :param full_thumb_path: the location of the thumbnail on disk
+    :return: True if the thumbnail needs to be (re)generated
+    """
+    return not os.path.isfile(full_thumb_path) or (
         os.path.exists(full_original_path)
         and os.path.getmtime(full_original_path) > os.path.getmtime(full_thumb_path)
-    ):
-        # Put all image info in signature for the generate view
-        query = f"?sig={signing.dumps(sig_info)}"
-        # We provide a URL instead of calling it as a function, so that using
-        # it means kicking off a new GET request. If we would generate all
-        # thumbnails inline, loading an album overview would have high latency.
-        return (
-            reverse(
-                "generate-thumbnail", args=[os.path.join(size_fit, sig_info["path"])]
+    )
+
+
+@contextmanager
+def _thumbnail_lock(full_thumb_path):
+    """
+    Lock a thumbnail so only one worker, across all processes, generates it
+
+    The locks are striped over a fixed set of lock files, so we never
+    have to clean them up.
+    :param full_thumb_path: the location of the thumbnail on disk
+    """
+    lock_dir = os.path.join(tempfile.gettempdir(), "thumbnail-locks")
+    os.makedirs(lock_dir, exist_ok=True)
+    digest = hashlib.sha1(full_thumb_path.encode("utf-8")).hexdigest()
+    deadline = time.monotonic() + settings.THUMBNAIL_LOCK_TIMEOUT
+
+    with open(os.path.join(lock_dir, f"{digest[:3]}.lock"), "a") as lock_file:
+        while True:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if time.monotonic() > deadline:
+                    raise ThumbnailLockTimeout(full_thumb_path)
+                time.sleep(0.05)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _save_image_atomically(image, path):
+    """
+    Save an image to a temporary file and move it into place, so a
+    partially written image is never served
+    :param image: the PIL image
+    :param path: the final location of the image
+    """
+    directory, filename = os.path.split(path)
+    # Keep the extension so PIL knows which format to use
+    fd, temp_path = tempfile.mkstemp(
+        dir=directory, prefix=".", suffix=os.path.splitext(filename)[1]
+    )
+    os.close(fd)
+    try:
+        image.save(temp_path)
+        os.chmod(temp_path, settings.FILE_UPLOAD_PERMISSIONS or 0o644)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+def create_thumbnail(full_original_path, full_thumb_path, size, fit, image_format=None):
+    """
+    Create a thumbnail from an original if it is missing or outdated
+
+    If another worker is already generating the same thumbnail this
+    waits for it to finish instead of doing the work twice.
+    :param full_original_path: the location of the original on disk
+    :param full_thumb_path: the location of the thumbnail on disk
+    :param size: size of the thumbnail formatted like `widthxheight`
+    :param fit: False to keep the aspect ratio, True to crop
+    :param image_format: the format of the variant, None for the format
+                         of the original. The thumbnail is written in the
+                         format that matches its extension.
+    :return: True if the thumbnail was generated
+    :raises ThumbnailLockTimeout: if the other worker takes too long
+    """
+    # Check if directory for thumbnail exists, if not create it
+    os.makedirs(os.path.dirname(full_thumb_path), exist_ok=True)
+    # Skip generating the thumbnail if it exists
+    if not is_thumbnail_stale(full_original_path, full_thumb_path):
+        record_thumbnail(full_original_path, full_thumb_path, size, fit, image_format)
+        return False
+
+    with _thumbnail_lock(full_thumb_path):
+        # Another worker may have generated it while we were waiting
+        if not is_thumbnail_stale(full_original_path, full_thumb_path):
+            record_thumbnail(
+                full_original_path, full_thumb_path, size, fit, image_format
             )
-            + query
+            return False
+
+        # Create a thumbnail from the original_path, saved to thumb_path
+        thumb = create_thumbnail_image(full_original_path, size, fit)
+        _save_image_atomically(thumb, full_thumb_path)
+
+    record_thumbnail(full_original_path, full_thumb_path, size, fit, image_format)
+    return True
+
+
+def _get_thumbnail_variants(sizes, fits):
+    """
+    :return: generator of the (size, fit, format) of every thumbnail
+             of an image, the format is None for the format of the original
+    """
+    if sizes is None:
+        sizes = settings.THUMBNAIL_SIZES.values()
+    image_formats = [None] + get_thumbnail_formats()
+    for size in sizes:
+        for fit in fits:
+            for image_format in image_formats:
+                yield size, fit, image_format
+
+
+def generate_thumbnails(path, sizes=None, fits=(True, False)):
+    """
+    Generate all missing or outdated thumbnails of a media file,
+    including the variants in `THUMBNAIL_FORMATS`
+    :param path: the location of the file, relative to the media root
+    :param sizes: the sizes to generate, defaults to all `THUMBNAIL_SIZES`
+    :param fits: the fit options to generate every size with
+    :return: the number of thumbnails that were generated
+    """
+    if isinstance(path, FieldFile):
+        path = path.name
+
+    generated = 0
+    for size, fit, image_format in _get_thumbnail_variants(sizes, fits):
+        full_original_path, full_thumb_path = get_thumbnail_paths(
+            _get_thumbnail_info(path, size, fit, image_format)
+        )
+        if not os.path.exists(full_original_path):
+            return generated
+        if create_thumbnail(
+            full_original_path, full_thumb_path, size, fit, image_format
+        ):
+            generated += 1
+    return generated
+
+
+def _get_thumbnail_dirs():
+    return [
+        os.path.join(settings.MEDIA_ROOT, "thumbnails"),
+        os.path.join(settings.MEDIA_ROOT, "public", "thumbnails"),
+    ]
+
+
+def evict_thumbnails(quota, dry_run=False):
+    """
+    Remove the least recently used private thumbnails until they fit in
+    the quota
+
+    Public thumbnails are served by the web server directly, which does
+    not generate them again, so they are never removed. Thumbnails that
+    were used within `THUMBNAIL_MANIFEST_TIMEOUT` and
+    `THUMBNAIL_ACCESS_INTERVAL` are never removed either, since they might
+    still be listed in the manifest.
+    :param quota: the maximum total size of the private thumbnails in bytes
+    :param dry_run: only report the thumbnails that would be removed
+    :return: tuple of the list of removed thumbnails and the total size
+             of the remaining private thumbnails
+    """
+    thumbnails = []
+    total = 0
+    for root, _dirs, files in os.walk(os.path.join(settings.MEDIA_ROOT, "thumbnails")):
+        for filename in files:
+            # Skip thumbnails that are still being written
+            if filename.startswith("."):
+                continue
+            path = os.path.join(root, filename)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            total += stat.st_size
+            thumbnails.append((stat.st_atime, stat.st_size, path))
+
+    horizon = (
+        time.time()
+        - settings.THUMBNAIL_MANIFEST_TIMEOUT
+        - settings.THUMBNAIL_ACCESS_INTERVAL
+    )
+    evicted = []
+    for _atime, size, path in sorted(thumbnails):
+        if total <= quota:
+            break
+        try:
+            # It might have been used since we started
+            if os.stat(path).st_atime > horizon:
+                break
+            if not dry_run:
+                os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        evicted.append(path)
+    return evicted, total
+
+
+def find_stale_thumbnails(sizes=None, fits=(True, False)):
+    """
+    Find all missing or outdated thumbnails of the images in the media root
+    :param sizes: the sizes to check, defaults to all `THUMBNAIL_SIZES`
+    :param fits: the fit options to check every size with
+    :return: generator of (full original path, full thumbnail path, size,
+             fit, format)
+    """
+    variants = list(_get_thumbnail_variants(sizes, fits))
+    thumbnail_dirs = _get_thumbnail_dirs()
+
+    for root, dirs, files in os.walk(settings.MEDIA_ROOT):
+        dirs[:] = sorted(d for d in dirs if os.path.join(root, d) not in thumbnail_dirs)
+        for filename in sorted(files):
+            if not filename.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            path = os.path.relpath(os.path.join(root, filename), settings.MEDIA_ROOT)
+            for size, fit, image_format in variants:
+                full_original_path, full_thumb_path = get_thumbnail_paths(
+                    _get_thumbnail_info(path, size, fit, image_format)
+                )
+                if is_thumbnail_stale(full_original_path, full_thumb_path):
+                    yield (
+                        full_original_path,
+                        full_thumb_path,
+                        size,
+                        fit,
+                        image_format,
+                    )
+
+
+def _generate_thumbnails_in_background(path):
+    try:
+        generate_thumbnails(path)
+    except Exception:
+        logger.exception("Could not generate thumbnails for %s", path)
+
+
+def pregenerate_thumbnails(path):
+    """
+    Generate all thumbnails of a media file in a background thread
+    once the current transaction is committed, so the first page
+    that shows the file does not have to generate them.
+    :param path: the location of the file, relative to the media root
+    """
+    global _thumbnail_executor
+    if not settings.THUMBNAIL_PREGENERATE:
+        return
+    if isinstance(path, FieldFile):
+        path = path.name
+    if not path:
+        return
+
+    if _thumbnail_executor is None:
+        _thumbnail_executor = ThreadPoolExecutor(
+            max_workers=settings.THUMBNAIL_PREGENERATE_WORKERS
         )
+    transaction.on_commit(
+        lambda: _thumbnail_executor.submit(_generate_thumbnails_in_background, path)
+    )
+
+
+def get_thumbnail_url(path, size, fit=True, accept=None):
+    """
+    Get the thumbnail url of a media file. NEVER use this with user input.
+    If the thumbnail exists this function will return the url of the
+    media file, with signature if necessary. Does it not yet exist a route
+    that executes the :func:`utils.media.views.generate_thumbnail`
+    will be the output.
+    :param path: the location of the file
+    :param size: size of the image
+    :param fit: False to keep the aspect ratio, True to crop
+    :param accept: the Accept header of the client, used to pick
+                   the best format from `THUMBNAIL_FORMATS`
+    :return: direct media url or generate-thumbnail path
+    """
+    if isinstance(path, ImageFieldFile):
+        path = path.name
+
+    query = ""
+    image_format = get_accepted_thumbnail_format(accept)
+    entry_name = _get_manifest_entry_name(size, fit, image_format)
+    sig_info = _get_thumbnail_info(path, size, fit, image_format)
+    url_path = f'{sig_info["visibility"]}/{sig_info["thumb_path"]}'
+    full_original_path, full_thumb_path = get_thumbnail_paths(sig_info)
+
+    # The manifest lets us skip checking the thumbnail on the filesystem
+    # if it is known to be up to date
+    if _is_thumbnail_recorded(full_original_path, entry_name):
+        touch_thumbnail(full_thumb_path)
+    else:
+        # Check if we need to generate, then redirect to the generating route,
+        # otherwise just return the serving file path
+        if is_thumbnail_stale(full_original_path, full_thumb_path):
+            # Put all image info in signature for the generate view
+            query = f"?sig={sign(sig_info)}"
+            # We provide a URL instead of calling it as a function, so that
+            # using it means kicking off a new GET request. If we would
+            # generate all thumbnails inline, loading an album overview
+            # would have high latency.
+            return (
+                reverse(
+                    "generate-thumbnail",
+                    args=[os.path.relpath(sig_info["thumb_path"], "thumbnails")],
+                )
+                + query
+            )
+
+        if os.path.exists(full_original_path):
+            record_thumbnail(
+                full_original_path, full_thumb_path, size, fit, image_format
+            )
 
     if sig_info["visibility"] == "private":
         # Put all image info in signature for serve view
-        query = f"?sig={signing.dumps(sig_info)}"
+        query = f"?sig={sign(sig_info)}"
 
     return f"{settings.MEDIA_URL}{url_path}{query}"
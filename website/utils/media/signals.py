@@ -0,0 +1,64 @@
+"""The signals defined by the utils.media package"""
+from functools import lru_cache
+
+from django.apps import apps
+from django.db import models
+from django.db.models.signals import post_init, post_save
+
+from utils.media.services import clear_thumbnail_manifest, pregenerate_thumbnails
+from utils.models.signals import suspendingreceiver
+
+
+@lru_cache(maxsize=None)
+def _get_image_fields(model):
+    return [
+        field
+        for field in model._meta.concrete_fields
+        if isinstance(field, models.ImageField)
+    ]
+
+
+def post_image_init(sender, instance, **kwargs):
+    """Remember the file names of the images of an object"""
+    names = {}
+    for field in _get_image_fields(sender):
+        # Read the raw value, the descriptor would create a file object
+        value = instance.__dict__.get(field.attname)
+        names[field.attname] = getattr(value, "name", value)
+    instance._original_image_names = names
+
+
+def connect_image_signals():
+    """
+    Track the file names of the images of all models that have them,
+    without adding a receiver to the objects of other models
+    """
+    for model in apps.get_models():
+        if _get_image_fields(model):
+            post_init.connect(
+                post_image_init,
+                sender=model,
+                dispatch_uid=f"utils_media_image_init_{model._meta.label}",
+            )
+
+
+@suspendingreceiver(post_save, dispatch_uid="utils_media_image_save")
+def post_image_save(
+    sender, instance, created=False, raw=False, update_fields=None, **kwargs
+):
+    """Pre-generate the thumbnails of the images of a saved object that changed"""
+    if raw:
+        return
+
+    original_names = getattr(instance, "_original_image_names", {})
+    for field in _get_image_fields(sender):
+        if update_fields is not None and field.name not in update_fields:
+            continue
+
+        file = getattr(instance, field.attname)
+        if not created and file.name == original_names.get(field.attname):
+            continue
+        original_names[field.attname] = file.name
+        if file:
+            clear_thumbnail_manifest(file.path)
+            pregenerate_thumbnails(file)
@@ -0,0 +1,88 @@
+"""
+Sign the urls of private media files
+
+A signature is a short token of the form `<window>.<mac>`. The window is
+the number of the period of `MEDIA_SIGNATURE_WINDOW` seconds in which the
+signature was created and the mac is a keyed hash of the signature info
+and the window. Within a window a file always gets the same url, so
+browsers can cache it, and the signature of every file is computed only
+once per process. A signature is valid until `MEDIA_SIGNATURE_MAX_AGE`
+seconds after the end of its window.
+
+The signature info is not part of the token, the view that checks it
+reconstructs the info from the requested path instead.
+"""
+import base64
+import json
+import time
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+KEY_SALT = "utils.media.signatures"
+
+# Number of signatures that are remembered by every process
+CACHE_SIZE = 16384
+
+
+def _get_window(timestamp=None):
+    if timestamp is None:
+        timestamp = time.time()
+    return int(timestamp) // settings.MEDIA_SIGNATURE_WINDOW
+
+
+def _encode_window(window):
+    digits = "0123456789abcdefghijklmnopqrstuvwxyz"
+    encoded = ""
+    while True:
+        window, digit = divmod(window, 36)
+        encoded = digits[digit] + encoded
+        if not window:
+            return encoded
+
+
+def _create_signature(items, window):
+    message = json.dumps([items, window], separators=(",", ":"))
+    mac = salted_hmac(KEY_SALT, message).digest()[:16]
+    return "{}.{}".format(
+        _encode_window(window), base64.urlsafe_b64encode(mac).decode().rstrip("=")
+    )
+
+
+# Signatures that are checked are not remembered, since their
+# info is derived from the requested path
+_sign = lru_cache(maxsize=CACHE_SIZE)(_create_signature)
+
+
+def sign(sig_info):
+    """
+    Sign the information that describes how to serve a media file
+    :param sig_info: dict with the signature info, with only strings,
+                     numbers and booleans as values
+    :return: the signature, which is the same for the rest of the window
+    """
+    return _sign(tuple(sorted(sig_info.items())), _get_window())
+
+
+def is_valid(signature, sig_info):
+    """
+    Check whether a signature was created for the signature info
+    and has not expired yet
+    :param signature: the signature of the request
+    :param sig_info: dict with the signature info
+    :return: True if the signature is valid
+    """
+    encoded_window, _, _mac = signature.partition(".")
+    try:
+        window = int(encoded_window, 36)
+    except ValueError:
+        return False
+
+    current = _get_window()
+    max_windows = settings.MEDIA_SIGNATURE_MAX_AGE // settings.MEDIA_SIGNATURE_WINDOW
+    if not current - max_windows <= window <= current:
+        return False
+    return constant_time_compare(
+        signature, _create_signature(tuple(sorted(sig_info.items())), window)
+    )
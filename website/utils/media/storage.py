@@ -0,0 +1,146 @@
+"""
+Store files with the same content only once
+
+:class:`DeduplicatedStorage` saves every file as a hard link to an object in
+`MEDIA_ROOT/objects/` that is named after the SHA-256 digest of its content.
+Files keep their regular names, so everything that derives the visibility or
+other paths from the name of a file keeps working, but the same content only
+takes up disk space once. The filesystem counts the references to an object:
+an object with only its own link left is not used by any file anymore and is
+removed by the `removeunusedmedia` management command. Deleting or replacing
+a file never affects other files with the same content, it only removes one
+of the links.
+"""
+import hashlib
+import os
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+
+# Directory in the storage location that holds the objects
+OBJECTS_DIR = "objects"
+
+
+class DeduplicatedStorage(FileSystemStorage):
+    """
+    Filesystem storage that stores the content of equal files only once
+
+    All files and objects must be on the same filesystem, because
+    hard links cannot cross filesystems.
+    """
+
+    def get_object_path(self, digest):
+        """
+        :param digest: the SHA-256 digest of the content
+        :return: the location of the object with the content
+        """
+        return os.path.join(self.location, OBJECTS_DIR, digest[:2], digest[2:])
+
+    def _link_object(self, path, digest):
+        """
+        Make a file the object of its content if there is no object yet
+        :return: the location of the object
+        """
+        object_path = self.get_object_path(digest)
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+        try:
+            os.link(path, object_path)
+        except FileExistsError:
+            pass
+        return object_path
+
+    def _save(self, name, content):
+        objects_dir = os.path.join(self.location, OBJECTS_DIR)
+        os.makedirs(objects_dir, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=objects_dir)
+        try:
+            digest = hashlib.sha256()
+            with os.fdopen(fd, "wb") as file:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    file.write(chunk)
+            if self.file_permissions_mode is not None:
+                os.chmod(temp_path, self.file_permissions_mode)
+
+            while True:
+                object_path = self._link_object(temp_path, digest.hexdigest())
+                full_path = self.path(name)
+                os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                try:
+                    os.link(object_path, full_path)
+                    break
+                except FileExistsError:
+                    name = self.get_available_name(name)
+                except FileNotFoundError:
+                    # The object was unused and has just been removed,
+                    # so create it again
+                    continue
+        finally:
+            os.remove(temp_path)
+        return name.replace("\\", "/")
+
+
+def find_unused_objects(location):
+    """
+    Find the objects that are not referenced by any file anymore
+    :param location: the location of the storage
+    :return: generator of tuples of the full path and size of the objects
+    """
+    objects_dir = os.path.join(location, OBJECTS_DIR)
+    if not os.path.isdir(objects_dir):
+        return
+    # Files directly in the objects directory are still being saved
+    for prefix in sorted(os.listdir(objects_dir)):
+        prefix_dir = os.path.join(objects_dir, prefix)
+        if not os.path.isdir(prefix_dir):
+            continue
+        for filename in sorted(os.listdir(prefix_dir)):
+            path = os.path.join(prefix_dir, filename)
+            stat = os.stat(path)
+            if stat.st_nlink == 1:
+                yield path, stat.st_size
+
+
+def remove_unused_objects(location, dry_run=False):
+    """
+    Remove the objects that are not referenced by any file anymore
+
+    A file that is saved at the same time may still get a link to an
+    object that is being removed. It then keeps its content, only the
+    next file with the same content is not deduplicated with it.
+    :param location: the location of the storage
+    :param dry_run: True to only report which objects would be removed
+    :return: tuple of the number of removed objects and the bytes freed
+    """
+    count = 0
+    freed = 0
+    for path, size in find_unused_objects(location):
+        if not dry_run:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+        count += 1
+        freed += size
+    return count, freed
+
+
+def get_object_stats(location):
+    """
+    Measure how much space deduplication saves
+    :param location: the location of the storage
+    :return: tuple of the number of objects, the number of files that
+             refer to them and the bytes saved
+    """
+    objects = 0
+    references = 0
+    saved = 0
+    for root, _dirs, files in os.walk(os.path.join(location, OBJECTS_DIR)):
+        if root == os.path.join(location, OBJECTS_DIR):
+            continue
+        for filename in files:
+            stat = os.stat(os.path.join(root, filename))
+            objects += 1
+            references += stat.st_nlink - 1
+            saved += max(stat.st_nlink - 2, 0) * stat.st_size
+    return objects, references, saved
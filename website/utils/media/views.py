@@ -1,27 +1,89 @@
 """Utility views"""
 import os
-from datetime import timedelta
+import re
 
-from PIL import Image, ImageOps
 from django.conf import settings
-from django.core import signing
 from django.core.exceptions import PermissionDenied
-from django.core.signing import BadSignature
-from django.http import Http404
+from django.http import Http404, HttpResponse
 from django.shortcuts import redirect
-from django_sendfile import sendfile
 
+from utils.media.sendfile import sendfile
+from utils.media.services import (
+    create_thumbnail,
+    get_thumbnail_paths,
+    ThumbnailLockTimeout,
+    THUMBNAIL_FORMAT_TYPES,
+    _get_media_info,
+    _get_thumbnail_info,
+)
+from utils.media.signatures import is_valid
 
-def _get_signature_info(request):
-    if "sig" in request.GET:
-        signature = request.GET.get("sig")
-        try:
-            return signing.loads(signature, max_age=timedelta(hours=3))
-        except BadSignature:
-            pass
+THUMBNAIL_PATH_PATTERN = re.compile(r"^(?P<size>[^/]+)_(?P<fit>[01])/(?P<path>.+)$")
+
+
+def _get_thumbnail_candidates(request_path, visibilities):
+    """
+    Get the thumbnails that a path relative to the thumbnail folder may
+    refer to. The format extension of a variant cannot be told apart from
+    the extension of an original, so both are tried.
+    :param request_path: the requested path, like `300x300_1/image.jpg`
+    :param visibilities: the visibilities the thumbnail may have
+    :return: generator of signature infos
+    """
+    match = THUMBNAIL_PATH_PATTERN.match(request_path)
+    if not match:
+        return
+    size, fit, path = match.group("size", "fit", "path")
+    for visibility in visibilities:
+        original = f"public/{path}" if visibility == "public" else path
+        yield _get_thumbnail_info(original, size, int(fit))
+        for image_format in THUMBNAIL_FORMAT_TYPES:
+            if path.endswith(f".{image_format}"):
+                yield _get_thumbnail_info(
+                    original[: -len(image_format) - 1], size, int(fit), image_format
+                )
+
+
+def _get_signature_info(request, candidates):
+    """
+    Find the signature info that the signature of the request was made for
+    :param request: the request
+    :param candidates: the signature infos the request may be for
+    :return: the signed signature info
+    :raises PermissionDenied: if the signature is missing, invalid
+                              or expired
+    """
+    signature = request.GET.get("sig")
+    if signature:
+        for sig_info in candidates:
+            if is_valid(signature, sig_info):
+                return sig_info
     raise PermissionDenied
 
 
+def _create_thumbnail(sig_info, full_original_path, full_thumb_path):
+    """
+    Create the thumbnail described by the signature if it is needed
+    :return: None, or a response asking the client to retry if another
+             worker is still generating the thumbnail
+    """
+    try:
+        create_thumbnail(
+            full_original_path,
+            full_thumb_path,
+            sig_info["size"],
+            sig_info["fit"],
+            sig_info.get("format"),
+        )
+    except ThumbnailLockTimeout:
+        # Another worker is still generating this thumbnail, let the
+        # client try again shortly instead of tying up this worker
+        response = HttpResponse(status=503)
+        response["Retry-After"] = 1
+        return response
+    return None
+
+
 def private_media(request, request_path):
     """
     Serve private media files
@@ -30,17 +92,35 @@ def private_media(request, request_path):
     """
     # Get image information from signature
     # raises PermissionDenied if bad signature
-    info = _get_signature_info(request)
-
-    if not os.path.isfile(info["serve_path"]) or not info["serve_path"].endswith(
-        request_path
-    ):
-        # 404 if the file does not exist
-        raise Http404("Media not found.")
-
-    # Serve the file
+    candidates = [_get_media_info(request_path), _get_media_info(request_path, True)]
+    if request_path.startswith("thumbnails/"):
+        candidates += _get_thumbnail_candidates(
+            request_path[len("thumbnails/") :], ["private"]
+        )
+    info = _get_signature_info(request, candidates)
+
+    if not os.path.isfile(info["serve_path"]):
+        # 404 if the file does not exist, unless it is a thumbnail
+        # that was evicted and can be generated again
+        if "thumb_path" not in info:
+            raise Http404("Media not found.")
+        full_original_path, full_thumb_path = get_thumbnail_paths(info)
+        if not os.path.exists(full_original_path):
+            raise Http404("Media not found.")
+        response = _create_thumbnail(info, full_original_path, full_thumb_path)
+        if response is not None:
+            return response
+
+    # Thumbnails are generated again at the same path when their original
+    # changes, so browsers may only keep them until the url changes
+    max_age = None
+    if "thumb_path" in info:
+        max_age = settings.MEDIA_SIGNATURE_WINDOW
     return sendfile(
-        request, info["serve_path"], attachment=info.get("attachment", False)
+        request,
+        info["serve_path"],
+        attachment=info.get("attachment", False),
+        max_age=max_age,
     )
 
 
@@ -60,44 +140,18 @@ def generate_thumbnail(request, request_path):
     # Get image information from signature
     # raises PermissionDenied if bad signature
     query = ""
-    sig_info = _get_signature_info(request)
-
-    if not sig_info["thumb_path"].endswith(request_path):
-        # 404 if the file does not exist
-        raise Http404("Media not found.")
+    sig_info = _get_signature_info(
+        request, _get_thumbnail_candidates(request_path, ["private", "public"])
+    )
 
-    if sig_info["visibility"] == "public":
-        full_original_path = os.path.join(
-            settings.MEDIA_ROOT, "public", sig_info["path"]
-        )
-        full_thumb_path = os.path.join(
-            settings.MEDIA_ROOT, "public", sig_info["thumb_path"]
-        )
-    else:
-        full_original_path = os.path.join(settings.MEDIA_ROOT, sig_info["path"])
-        full_thumb_path = os.path.join(settings.MEDIA_ROOT, sig_info["thumb_path"])
+    full_original_path, full_thumb_path = get_thumbnail_paths(sig_info)
 
     if not os.path.exists(full_original_path):
         raise Http404
 
-    # Check if directory for thumbnail exists, if not create it
-    os.makedirs(os.path.dirname(full_thumb_path), exist_ok=True)
-    # Skip generating the thumbnail if it exists
-    if not os.path.isfile(full_thumb_path) or os.path.getmtime(
-        full_original_path
-    ) > os.path.getmtime(full_thumb_path):
-        # Create a thumbnail from the original_path, saved to thumb_path
-        image = Image.open(full_original_path)
-        size = tuple(int(dim) for dim in sig_info["size"].split("x"))
-        if not sig_info["fit"]:
-            ratio = min([a / b for a, b in zip(size, image.size)])
-            size = tuple(int(ratio * x) for x in image.size)
-
-        if size[0] == image.size[0] and size[1] == image.size[1]:
-            image.save(full_thumb_path)
-        else:
-            thumb = ImageOps.fit(image, size, Image.ANTIALIAS)
-            thumb.save(full_thumb_path)
+    response = _create_thumbnail(sig_info, full_original_path, full_thumb_path)
+    if response is not None:
+        return response
 
     if sig_info["visibility"] == "private":
         query = f'?sig={request.GET["sig"]}'
@@ -107,8 +161,6 @@ def generate_thumbnail(request, request_path):
     # for private images this is a call to private_media
     return redirect(
         f"{settings.MEDIA_URL}"
-        f'{sig_info["visibility"]}/thumbnails/'
-        f'{sig_info["size"]}_{sig_info["fit"]}/'
-        f'{sig_info["path"]}{query}',
+        f'{sig_info["visibility"]}/{sig_info["thumb_path"]}{query}',
         permanent=True,
     )
@@ -0,0 +1,150 @@
+"""
+Provides the tokenizer and ranking used by the search indexes
+
+A search index stores every word of a text, together with every suffix
+of that word. Looking up the terms that start with a keyword then finds
+the words that contain the keyword anywhere, which a database can do
+with an index on the terms instead of scanning every text.
+
+An index can also find words with a typo. It then stores every longer word
+with each of its letters deleted in turn as fuzzy terms. A keyword with a
+letter inserted, deleted, replaced or two letters swapped has a deletion in
+common with the word, or is one itself, which again is an indexed lookup.
+"""
+import re
+import unicodedata
+
+from django.db.models import Case, IntegerField, Q, Subquery, Value, When
+
+# Words consist of letters and digits, optionally joined by hyphens
+# so dates like 2018-09-05 are a single word
+WORD_PATTERN = re.compile(r"[^\W_]+(?:-[^\W_]+)*")
+
+# Longer words are truncated to fit in the index
+MAX_TERM_LENGTH = 64
+
+# Shorter words and keywords are not matched with typos, because almost
+# every short word is a single typo away from another word. Neither are
+# numbers, for which a typo is another number.
+MIN_FUZZY_LENGTH = 4
+
+# Ranks of a keyword that is a complete word, the start of a word, any
+# other part of a word and a word with a typo
+RANK_WORD = 3
+RANK_PREFIX = 2
+RANK_SUBSTRING = 1
+RANK_FUZZY = 0
+
+
+def normalize(text):
+    """
+    Convert text to lowercase and remove accents
+    :param text: the text
+    :return: the normalized text
+    """
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def tokenize(text):
+    """
+    Split text into normalized words
+    :param text: the text
+    :return: list of the words
+    """
+    return [word[:MAX_TERM_LENGTH] for word in WORD_PATTERN.findall(normalize(text))]
+
+
+def get_index_terms(texts):
+    """
+    Get the terms of the texts that should be stored in a search index
+    :param texts: iterable of texts
+    :return: set of tuples of a term and whether it is a suffix of a word
+    """
+    words = set()
+    for text in texts:
+        words.update(tokenize(text))
+
+    terms = {(word, False) for word in words}
+    for word in words:
+        for start in range(1, len(word)):
+            if word[start] != "-" and (word[start:], False) not in terms:
+                terms.add((word[start:], True))
+    return terms
+
+
+def _is_fuzzy(word):
+    return len(word) >= MIN_FUZZY_LENGTH and word.replace("-", "").isalpha()
+
+
+def get_deletions(word):
+    """
+    Get the words that are left when a single letter of a word is deleted
+    :param word: the word
+    :return: set of the shorter words
+    """
+    return {word[:index] + word[index + 1 :] for index in range(len(word))}
+
+
+def get_fuzzy_terms(texts):
+    """
+    Get the fuzzy terms of the texts that should be stored in a search index
+    :param texts: iterable of texts
+    :return: set of the terms
+    """
+    terms = set()
+    for text in texts:
+        for word in tokenize(text):
+            if _is_fuzzy(word):
+                terms.update(get_deletions(word))
+    return terms
+
+
+def get_keyword_filter(keyword, fuzzy=False):
+    """
+    Build a filter for the index terms that match a keyword
+    :param keyword: a single normalized word
+    :param fuzzy: whether the index has fuzzy terms, which are marked by
+                  the field `fuzzy`, and words with a typo should match
+    :return: the Q object
+    """
+    # The range lets every database use the index on the terms, while
+    # startswith keeps the match exact for any collation
+    query = Q(
+        term__gte=keyword,
+        term__lt=keyword[:-1] + chr(ord(keyword[-1]) + 1),
+        term__startswith=keyword,
+    )
+    if not fuzzy:
+        return query
+
+    query &= Q(fuzzy=False)
+    if _is_fuzzy(keyword):
+        deletions = get_deletions(keyword)
+        query |= Q(term__in=deletions | {keyword}, fuzzy=True)
+        query |= Q(term__in=deletions, suffix=False, fuzzy=False)
+    return query
+
+
+def get_keyword_rank(terms, keyword, fuzzy=False):
+    """
+    Build an expression for the rank of a keyword for every indexed object
+    :param terms: the queryset of index terms of the object in the outer
+                  query, which have the fields `term` and `suffix`
+    :param keyword: a single normalized word
+    :param fuzzy: whether the index has fuzzy terms, see `get_keyword_filter`
+    :return: a subquery that is None if the keyword does not match
+    """
+    ranks = [
+        When(term=keyword, suffix=False, then=Value(RANK_WORD)),
+        When(term__startswith=keyword, suffix=False, then=Value(RANK_PREFIX)),
+        When(term__startswith=keyword, then=Value(RANK_SUBSTRING)),
+    ]
+    if fuzzy:
+        ranks.insert(0, When(fuzzy=True, then=Value(RANK_FUZZY)))
+    matches = terms.filter(get_keyword_filter(keyword, fuzzy)).annotate(
+        rank=Case(*ranks, default=Value(RANK_FUZZY), output_field=IntegerField())
+    )
+    return Subquery(
+        matches.order_by("-rank").values("rank")[:1], output_field=IntegerField()
+    )
@@ -0,0 +1,49 @@
+"""
+Cache the statistics that are shown on the statistics page
+
+Every statistic is cached under its name and the current date, so statistics
+that depend on today, like the current memberships, are computed again every
+day. The apps clear their statistics when the objects they count change.
+"""
+from datetime import date
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+def _statistics_cache_key(name, day) -> str:
+    return f"statistics_{name}_{day.isoformat()}"
+
+
+def cached_statistics(name):
+    """
+    Decorator that caches the result of a function that computes statistics
+    :param name: the name of the statistics, used to clear them
+    """
+
+    def decorator(function):
+        @wraps(function)
+        def wrapper():
+            cache = caches[settings.STATISTICS_CACHE]
+            key = _statistics_cache_key(name, date.today())
+            data = cache.get(key)
+            if data is None:
+                data = function()
+                cache.set(key, data, settings.STATISTICS_TIMEOUT)
+            return data
+
+        return wrapper
+
+    return decorator
+
+
+def clear_statistics(*names) -> None:
+    """
+    Remove the cached statistics of today
+    :param names: the names of the statistics
+    """
+    today = date.today()
+    caches[settings.STATISTICS_CACHE].delete_many(
+        [_statistics_cache_key(name, today) for name in names]
+    )
@@ -1,13 +1,51 @@
 """Tests for the ``utils`` module"""
 import doctest
-
+import os
+import shutil
+import tempfile
+import threading
+import time
+from importlib import import_module
+from io import BytesIO, StringIO
+from unittest import mock
+
+from PIL import Image
+from django.conf import settings
+from django.core.cache import _create_cache
 from django.core.exceptions import FieldError
+from django.core.files.base import ContentFile
+from django.core.management import call_command
 from django.db import models
-from django.test import TestCase, override_settings
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, TestCase, override_settings
 from django.utils import translation
 
+from partners.models import Partner
+from thaliawebsite.api.services import create_image_thumbnail_dict, get_image_accept
+from utils.media import services as media_services
+from utils.media.images import (
+    create_thumbnail_image,
+    get_perceptual_hash,
+    resize_image,
+)
+from utils.media.middleware import ThumbnailFormatMiddleware
+from utils.media.sendfile import sendfile
+from utils.media.storage import DeduplicatedStorage, remove_unused_objects
+from utils.media.services import (
+    get_media_url,
+    get_accepted_thumbnail_format,
+    clear_thumbnail_manifest,
+    create_thumbnail,
+    evict_thumbnails,
+    find_stale_thumbnails,
+    generate_thumbnails,
+    get_request_accept,
+    get_thumbnail_manifest,
+    get_thumbnail_url,
+    ThumbnailLockTimeout,
+)
 from utils.translation import ModelTranslateMeta, MultilingualField
-from utils import snippets
+from utils import search, snippets, statistics
 
 LANGUAGES = [
     ("en", "English"),
@@ -146,3 +184,827 @@ class TestTranslateMeta(TestCase):
             class _TestItem8(models.Model, metaclass=ModelTranslateMeta):
                 text = MultilingualField(models.TextField)
                 text_nl = MultilingualField(models.TextField)
+
+
+class MediaRootMixin:
+    """Give every test an empty media root with copies of a photo"""
+
+    # Settings to override besides the media root
+    media_settings = {}
+    # Locations relative to the media root to copy the photo to
+    originals = ()
+
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        media_settings = override_settings(
+            MEDIA_ROOT=self.media_root, **self.media_settings
+        )
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+        for path in self.originals:
+            self.add_original(path)
+
+    def add_original(self, path):
+        """
+        Copy the photo into the media root
+        :param path: the location relative to the media root
+        :return: the full location of the copy
+        """
+        full_path = os.path.join(self.media_root, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        shutil.copy(
+            os.path.join(settings.BASE_DIR, "photos/fixtures/poker_1.jpg"), full_path
+        )
+        return full_path
+
+
+class ThumbnailPregenerationTest(MediaRootMixin, TestCase):
+    """Test the pre-generation of thumbnails"""
+
+    media_settings = {"THUMBNAIL_SIZES": {"small": "150x150", "medium": "300x300"}}
+    originals = ("photos/album/0000.jpg", "public/partners/logo.png")
+
+    def test_generate_thumbnails(self):
+        self.assertEqual(generate_thumbnails("photos/album/0000.jpg"), 4)
+        self.assertEqual(generate_thumbnails("photos/album/0000.jpg"), 0)
+        with Image.open(
+            os.path.join(
+                self.media_root, "thumbnails", "150x150_1", "photos/album/0000.jpg"
+            )
+        ) as image:
+            self.assertEqual(image.size, (150, 150))
+
+        self.assertEqual(generate_thumbnails("public/partners/logo.png"), 4)
+        self.assertTrue(
+            os.path.isfile(
+                os.path.join(
+                    self.media_root,
+                    "public",
+                    "thumbnails",
+                    "300x300_0",
+                    "partners/logo.png",
+                )
+            )
+        )
+
+    def test_generate_thumbnails_missing_original(self):
+        self.assertEqual(generate_thumbnails("photos/album/missing.jpg"), 0)
+
+    def test_find_stale_thumbnails(self):
+        self.assertEqual(len(list(find_stale_thumbnails())), 8)
+        generate_thumbnails("photos/album/0000.jpg")
+        stale = list(find_stale_thumbnails(sizes=["150x150"], fits=[True]))
+        self.assertEqual(
+            stale,
+            [
+                (
+                    os.path.join(self.media_root, "public", "partners/logo.png"),
+                    os.path.join(
+                        self.media_root,
+                        "public",
+                        "thumbnails",
+                        "150x150_1",
+                        "partners/logo.png",
+                    ),
+                    "150x150",
+                    True,
+                    None,
+                )
+            ],
+        )
+
+    def test_command(self):
+        out = StringIO()
+        call_command("pregeneratethumbnails", "--dry-run", stdout=out)
+        self.assertIn("8 thumbnails would be generated", out.getvalue())
+        self.assertEqual(len(list(find_stale_thumbnails())), 8)
+
+        out = StringIO()
+        call_command(
+            "pregeneratethumbnails", "--size", "150x150", "--workers", "2", stdout=out
+        )
+        self.assertIn("Generated 4/4 thumbnails", out.getvalue())
+        self.assertEqual(len(list(find_stale_thumbnails())), 4)
+
+    @mock.patch("utils.media.signals.pregenerate_thumbnails")
+    def test_image_save_signal(self, pregenerate_mock):
+        partner = Partner.objects.create(
+            name="Partner", slug="partner", logo="public/partners/logo.png"
+        )
+        pregenerate_mock.assert_called_once_with(partner.logo)
+
+        pregenerate_mock.reset_mock()
+        partner.save(update_fields=["name"])
+        partner.save()
+        Partner.objects.get(pk=partner.pk).save()
+        pregenerate_mock.assert_not_called()
+
+        partner.logo = "public/partners/other.png"
+        partner.save()
+        pregenerate_mock.assert_called_once_with(partner.logo)
+
+
+class ThumbnailManifestTest(MediaRootMixin, TestCase):
+    """Test the manifest of generated thumbnails"""
+
+    def setUp(self):
+        super().setUp()
+        self.original = self.add_original("photos/0000.jpg")
+
+    def test_generation_is_recorded(self):
+        self.assertEqual(get_thumbnail_manifest(self.original), {})
+        generate_thumbnails("photos/0000.jpg", sizes=["150x150"], fits=[True])
+        manifest = get_thumbnail_manifest(self.original)
+        self.assertEqual(list(manifest.keys()), ["150x150_1"])
+        self.assertAlmostEqual(manifest["150x150_1"], time.time(), delta=10)
+
+    def test_url_without_thumbnail_access(self):
+        url = get_thumbnail_url("photos/0000.jpg", "150x150")
+        self.assertIn("generate-thumbnail", url)
+
+        generate_thumbnails("photos/0000.jpg", sizes=["150x150"], fits=[True])
+        join = os.path.join
+        with mock.patch("utils.media.services.os") as os_mock:
+            os_mock.path.join = join
+            url = get_thumbnail_url("photos/0000.jpg", "150x150")
+            os_mock.path.isfile.assert_not_called()
+            os_mock.path.exists.assert_not_called()
+            os_mock.path.getmtime.assert_not_called()
+            os_mock.stat.assert_not_called()
+        self.assertTrue(url.startswith("/media/private/thumbnails/150x150_1/"))
+
+    def test_cleared_by_other_process(self):
+        generate_thumbnails("photos/0000.jpg", sizes=["150x150"], fits=[True])
+
+        # Another process replaces the original and clears the manifest,
+        # it has its own cache objects and local memory
+        mtime = os.path.getmtime(self.original) + 10
+        os.utime(self.original, (mtime, mtime))
+        with mock.patch.dict("django.core.cache.backends.locmem._caches", clear=True):
+            other_cache = _create_cache(settings.THUMBNAIL_MANIFEST_CACHE)
+        with mock.patch(
+            "utils.media.services.caches",
+            {settings.THUMBNAIL_MANIFEST_CACHE: other_cache},
+        ):
+            clear_thumbnail_manifest(self.original)
+
+        url = get_thumbnail_url("photos/0000.jpg", "150x150")
+        self.assertIn("generate-thumbnail", url)
+
+    def test_existing_thumbnail_is_recorded(self):
+        generate_thumbnails("photos/0000.jpg", sizes=["150x150"], fits=[True])
+        clear_thumbnail_manifest(self.original)
+
+        url = get_thumbnail_url("photos/0000.jpg", "150x150")
+        self.assertTrue(url.startswith("/media/private/thumbnails/150x150_1/"))
+        self.assertIn("150x150_1", get_thumbnail_manifest(self.original))
+
+
+class ThumbnailSingleFlightTest(MediaRootMixin, TestCase):
+    """Test that concurrent requests generate a thumbnail only once"""
+
+    def setUp(self):
+        super().setUp()
+        self.original = self.add_original("0000.jpg")
+        self.thumbnail = os.path.join(
+            self.media_root, "thumbnails", "150x150_1", "0000.jpg"
+        )
+
+    def test_concurrent_generation(self):
+        results = []
+        open_image = Image.open
+
+        def slow_open(*args, **kwargs):
+            # Make sure the other threads queue up behind the first one
+            threading.Event().wait(0.2)
+            return open_image(*args, **kwargs)
+
+        def generate():
+            results.append(
+                create_thumbnail(self.original, self.thumbnail, "150x150", True)
+            )
+
+        with mock.patch(
+            "utils.media.images.Image.open", side_effect=slow_open
+        ) as open_mock:
+            threads = [threading.Thread(target=generate) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(open_mock.call_count, 1)
+        self.assertEqual(sorted(results), [False, False, False, True])
+        self.assertEqual(
+            os.listdir(os.path.dirname(self.thumbnail)), ["0000.jpg"],
+        )
+        self.assertEqual(os.stat(self.thumbnail).st_mode & 0o777, 0o644)
+
+    @override_settings(THUMBNAIL_LOCK_TIMEOUT=0.1)
+    def test_lock_timeout(self):
+        with media_services._thumbnail_lock(self.thumbnail):
+            with self.assertRaises(ThumbnailLockTimeout):
+                create_thumbnail(self.original, self.thumbnail, "150x150", True)
+        self.assertFalse(os.path.exists(self.thumbnail))
+
+
+class ThumbnailEvictionTest(MediaRootMixin, TestCase):
+    """Test the eviction of least recently used thumbnails"""
+
+    media_settings = {"THUMBNAIL_MANIFEST_TIMEOUT": 60, "THUMBNAIL_ACCESS_INTERVAL": 60}
+
+    def setUp(self):
+        super().setUp()
+        self.thumbnails = []
+        for i in range(4):
+            self.add_original(f"photos/{i}.jpg")
+            generate_thumbnails(f"photos/{i}.jpg", sizes=["150x150"], fits=[True])
+            self.thumbnails.append(
+                os.path.join(
+                    self.media_root, "thumbnails", "150x150_1", f"photos/{i}.jpg"
+                )
+            )
+        self.size = os.path.getsize(self.thumbnails[0])
+
+    def _set_access_time(self, path, seconds_ago):
+        os.utime(path, (time.time() - seconds_ago, os.path.getmtime(path)))
+
+    def test_evict_least_recently_used(self):
+        for i, path in enumerate(self.thumbnails):
+            self._set_access_time(path, 1000 - i)
+
+        evicted, total = evict_thumbnails(2 * self.size)
+        self.assertEqual(evicted, self.thumbnails[:2])
+        self.assertEqual(total, 2 * self.size)
+        self.assertFalse(os.path.exists(self.thumbnails[0]))
+        self.assertTrue(os.path.exists(self.thumbnails[2]))
+
+    def test_recently_used_are_kept(self):
+        self._set_access_time(self.thumbnails[0], 1000)
+
+        evicted, total = evict_thumbnails(0)
+        self.assertEqual(evicted, self.thumbnails[:1])
+        self.assertEqual(total, 3 * self.size)
+
+    def test_public_thumbnails_are_kept(self):
+        self.add_original("public/partners/logo.jpg")
+        generate_thumbnails("public/partners/logo.jpg", sizes=["150x150"], fits=[True])
+        public = os.path.join(
+            self.media_root, "public", "thumbnails", "150x150_1", "partners/logo.jpg"
+        )
+        for path in self.thumbnails + [public]:
+            self._set_access_time(path, 1000)
+
+        evicted, total = evict_thumbnails(0)
+        self.assertEqual(evicted, self.thumbnails)
+        self.assertEqual(total, 0)
+        self.assertTrue(os.path.exists(public))
+
+    def test_dry_run(self):
+        for path in self.thumbnails:
+            self._set_access_time(path, 1000)
+
+        evicted, total = evict_thumbnails(0, dry_run=True)
+        self.assertEqual(len(evicted), 4)
+        self.assertEqual(total, 0)
+        for path in self.thumbnails:
+            self.assertTrue(os.path.exists(path))
+
+    def test_url_after_eviction(self):
+        self._set_access_time(self.thumbnails[0], 1000)
+        evict_thumbnails(0)
+
+        with mock.patch(
+            "utils.media.services.time.time", return_value=time.time() + 120
+        ):
+            url = get_thumbnail_url("photos/0.jpg", "150x150")
+        self.assertIn("generate-thumbnail", url)
+
+    def test_command(self):
+        out = StringIO()
+        call_command("evictthumbnails", "--quota", "0", "--dry-run", stdout=out)
+        self.assertIn("0 thumbnails would be removed", out.getvalue())
+
+
+@override_settings(THUMBNAIL_FORMATS=["avif", "webp"])
+class ThumbnailFormatTest(MediaRootMixin, TestCase):
+    """Test the thumbnail variants in modern image formats"""
+
+    browser_accept = "image/avif,image/webp,image/apng,image/*,*/*;q=0.8"
+    originals = ("photos/0000.jpg",)
+
+    def setUp(self):
+        super().setUp()
+        self.thumbnail_dir = os.path.join(self.media_root, "thumbnails", "150x150_1")
+
+    def test_accepted_format(self):
+        with mock.patch(
+            "utils.media.services._can_save_format",
+            side_effect=lambda image_format: image_format == "webp",
+        ):
+            self.assertEqual(get_accepted_thumbnail_format(self.browser_accept), "webp")
+            self.assertIsNone(get_accepted_thumbnail_format("image/*,*/*"))
+            self.assertIsNone(get_accepted_thumbnail_format("image/webp;q=0"))
+            self.assertIsNone(get_accepted_thumbnail_format(None))
+            with override_settings(THUMBNAIL_FORMATS=[]):
+                self.assertIsNone(get_accepted_thumbnail_format(self.browser_accept))
+
+        with mock.patch("utils.media.services._can_save_format", return_value=True):
+            self.assertEqual(get_accepted_thumbnail_format(self.browser_accept), "avif")
+
+    def test_generate_variants(self):
+        with mock.patch(
+            "utils.media.services._can_save_format",
+            side_effect=lambda image_format: image_format == "webp",
+        ):
+            generated = generate_thumbnails(
+                "photos/0000.jpg", sizes=["150x150"], fits=[True]
+            )
+        self.assertEqual(generated, 2)
+        self.assertTrue(
+            os.path.isfile(os.path.join(self.thumbnail_dir, "photos/0000.jpg"))
+        )
+        with Image.open(
+            os.path.join(self.thumbnail_dir, "photos/0000.jpg.webp")
+        ) as image:
+            self.assertEqual(image.format, "WEBP")
+
+    def test_url_of_variant(self):
+        url = get_thumbnail_url("photos/0000.jpg", "150x150", accept="text/html")
+        self.assertIn("/150x150_1/photos/0000.jpg?", url)
+
+        url = get_thumbnail_url(
+            "photos/0000.jpg", "150x150", accept=self.browser_accept
+        )
+        self.assertIn("generate-thumbnail/150x150_1/photos/0000.jpg.webp?", url)
+
+        response = Client().get(url)
+        self.assertEqual(response.status_code, 301)
+        self.assertIn(
+            "/media/private/thumbnails/150x150_1/photos/0000.jpg.webp?",
+            response["Location"],
+        )
+        self.assertTrue(
+            os.path.isfile(os.path.join(self.thumbnail_dir, "photos/0000.jpg.webp"))
+        )
+
+        url = get_thumbnail_url(
+            "photos/0000.jpg", "150x150", accept=self.browser_accept
+        )
+        self.assertIn("/media/private/thumbnails/150x150_1/photos/0000.jpg.webp?", url)
+
+    def test_vary_on_accept(self):
+        def view(request):
+            get_request_accept(request)
+            return HttpResponse()
+
+        request = RequestFactory().get("/", HTTP_ACCEPT=self.browser_accept)
+        response = ThumbnailFormatMiddleware(view)(request)
+        self.assertEqual(response["Vary"], "Accept")
+
+        request = RequestFactory().get("/", HTTP_ACCEPT=self.browser_accept)
+        with override_settings(THUMBNAIL_FORMATS=[]):
+            response = ThumbnailFormatMiddleware(view)(request)
+        self.assertFalse(response.has_header("Vary"))
+
+    def test_api_image_formats(self):
+        request = RequestFactory().get("/", HTTP_ACCEPT="application/json")
+        self.assertNotIn(
+            ".webp", create_image_thumbnail_dict(request, "photos/0000.jpg")["small"]
+        )
+
+        request = RequestFactory().get(
+            "/", {"image_formats": "webp,png"}, HTTP_ACCEPT="application/json"
+        )
+        self.assertEqual(get_image_accept(request), "image/webp")
+        self.assertIn(
+            ".webp", create_image_thumbnail_dict(request, "photos/0000.jpg")["small"]
+        )
+        # The parameter is part of the url, so the response does not vary
+        self.assertFalse(hasattr(request, "_thumbnail_format_negotiated"))
+
+
+class ReducedResolutionDecodingTest(TestCase):
+    """Test decoding images at a reduced resolution before resizing"""
+
+    def _jpeg(self, size, exif=None):
+        output = BytesIO()
+        Image.new("RGB", size, "red").save(output, "JPEG", exif=exif or b"")
+        output.seek(0)
+        return output
+
+    def test_resize_decodes_jpeg_at_reduced_resolution(self):
+        image = Image.open(self._jpeg((4000, 3000)))
+        decoded_sizes = []
+        thumbnail = image.thumbnail
+
+        def record_size(*args):
+            decoded_sizes.append(image.size)
+            thumbnail(*args)
+
+        with mock.patch.object(image, "thumbnail", side_effect=record_size):
+            resized, rotation = resize_image(image, (400, 400))
+        # The image was decoded at half of its size before resizing
+        self.assertEqual(decoded_sizes, [(2000, 1500)])
+        self.assertEqual(resized.size, (400, 300))
+        self.assertEqual(resized.mode, "RGB")
+        self.assertEqual(rotation, 0)
+
+    def test_resize_keeps_rotation(self):
+        with open(
+            os.path.join(settings.BASE_DIR, "photos/fixtures/poker_6.jpg"), "rb"
+        ) as f:
+            _resized, rotation = resize_image(Image.open(f), (100, 100))
+        self.assertEqual(rotation, 90)
+
+    def test_resize_does_not_enlarge(self):
+        resized, _rotation = resize_image(
+            Image.open(self._jpeg((300, 200))), (400, 400)
+        )
+        self.assertEqual(resized.size, (300, 200))
+
+    def test_thumbnail(self):
+        thumb = create_thumbnail_image(self._jpeg((4000, 3000)), "150x150", True)
+        self.assertEqual(thumb.size, (150, 150))
+
+        thumb = create_thumbnail_image(self._jpeg((4000, 3000)), "150x150", False)
+        self.assertEqual(thumb.size, (150, 112))
+
+    def test_thumbnail_png(self):
+        output = BytesIO()
+        Image.new("RGBA", (600, 300)).save(output, "PNG")
+        output.seek(0)
+        thumb = create_thumbnail_image(output, "300x300", False)
+        self.assertEqual(thumb.size, (300, 150))
+        self.assertEqual(thumb.mode, "RGBA")
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command(
+            "benchmarkimages",
+            os.path.join(settings.BASE_DIR, "photos/fixtures/poker_1.jpg"),
+            stdout=out,
+        )
+        self.assertIn("Created 1 thumbnails of 150x150", out.getvalue())
+        self.assertIn("full resolution: ", out.getvalue())
+        self.assertIn("reduced resolution: ", out.getvalue())
+
+
+class PerceptualHashTest(TestCase):
+    """Test the perceptual hash of images"""
+
+    def _distance(self, first, second):
+        return bin(int(first, 16) ^ int(second, 16)).count("1")
+
+    def test_similar_images(self):
+        path = os.path.join(settings.BASE_DIR, "photos/fixtures/poker_1.jpg")
+        with Image.open(path) as image:
+            original = get_perceptual_hash(image)
+            output = BytesIO()
+            image.resize((400, 267)).save(output, "JPEG", quality=30)
+        with Image.open(output) as copy:
+            self.assertLessEqual(self._distance(original, get_perceptual_hash(copy)), 4)
+
+        path = os.path.join(settings.BASE_DIR, "photos/fixtures/janbeleid-hoe.jpg")
+        with Image.open(path) as other:
+            self.assertGreater(self._distance(original, get_perceptual_hash(other)), 10)
+
+    def test_format(self):
+        self.assertEqual(get_perceptual_hash(Image.new("RGB", (100, 100))), "0" * 16)
+
+
+class SearchTermsTest(TestCase):
+    """Test the terms stored in the search indexes"""
+
+    def test_tokenize(self):
+        self.assertEqual(
+            search.tokenize("Café-night: ALV_2018 (2018-09-05)"),
+            ["cafe-night", "alv", "2018", "2018-09-05"],
+        )
+
+    def test_index_terms(self):
+        self.assertEqual(
+            search.get_index_terms(["ALV", "lv"]),
+            {("alv", False), ("lv", False), ("v", True)},
+        )
+        self.assertEqual(
+            search.get_index_terms(["a-b"]), {("a-b", False), ("b", True)},
+        )
+
+    def test_fuzzy_terms(self):
+        self.assertEqual(search.get_deletions("abc"), {"bc", "ac", "ab"})
+        self.assertEqual(
+            search.get_fuzzy_terms(["Jöhn Doe"]), {"ohn", "jhn", "jon", "joh"}
+        )
+
+
+class SendfileTest(TestCase):
+    """Test serving media files with validators and ranges"""
+
+    def setUp(self):
+        self.rf = RequestFactory()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, "document.pdf")
+        with open(self.path, "wb") as file:
+            file.write(bytes(range(100)))
+        os.utime(self.path, (1500000000, 1500000000))
+
+    def _get(self, max_age=None, **headers):
+        response = sendfile(self.rf.get("/", **headers), self.path, max_age=max_age)
+        content = b""
+        if response.streaming:
+            content = b"".join(response.streaming_content)
+            response.close()
+        return response, content
+
+    def test_full(self):
+        response, content = self._get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(content, bytes(range(100)))
+        self.assertEqual(response["ETag"], '"59682f00-64"')
+        self.assertEqual(response["Last-Modified"], "Fri, 14 Jul 2017 02:40:00 GMT")
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertEqual(response["Content-Type"], "application/pdf")
+        self.assertIn("no-cache", response["Cache-Control"])
+
+    def test_max_age(self):
+        response, _content = self._get(max_age=3600)
+        self.assertIn("max-age=3600", response["Cache-Control"])
+        self.assertNotIn("immutable", response["Cache-Control"])
+
+    def test_not_modified(self):
+        response, content = self._get(HTTP_IF_NONE_MATCH='"59682f00-64"')
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], '"59682f00-64"')
+        self.assertEqual(content, b"")
+
+        response, _content = self._get(
+            HTTP_IF_MODIFIED_SINCE="Fri, 14 Jul 2017 02:40:00 GMT"
+        )
+        self.assertEqual(response.status_code, 304)
+
+        response, _content = self._get(HTTP_IF_NONE_MATCH='"other"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_ranges(self):
+        for header, expected in [
+            ("bytes=10-19", range(10, 20)),
+            ("bytes=90-", range(90, 100)),
+            ("bytes=-5", range(95, 100)),
+            ("bytes=95-200", range(95, 100)),
+        ]:
+            with self.subTest(header=header):
+                response, content = self._get(HTTP_RANGE=header)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(content, bytes(expected))
+                self.assertEqual(int(response["Content-Length"]), len(expected))
+                self.assertEqual(
+                    response["Content-Range"],
+                    f"bytes {expected[0]}-{expected[-1]}/100",
+                )
+
+        response, _content = self._get(HTTP_RANGE="bytes=100-")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], "bytes */100")
+
+        # Multiple ranges and outdated ranges get the whole file
+        response, content = self._get(HTTP_RANGE="bytes=0-1,5-6")
+        self.assertEqual(response.status_code, 200)
+        response, content = self._get(
+            HTTP_RANGE="bytes=0-1", HTTP_IF_RANGE='"59682f00-63"'
+        )
+        self.assertEqual(response.status_code, 200)
+        response, content = self._get(
+            HTTP_RANGE="bytes=0-1", HTTP_IF_RANGE='"59682f00-64"'
+        )
+        self.assertEqual(response.status_code, 206)
+
+    @override_settings(
+        SENDFILE_BACKEND="django_sendfile.backends.nginx",
+        SENDFILE_URL="/media/sendfile",
+    )
+    def test_nginx(self):
+        # django_sendfile loads the backend only once
+        get_backend = import_module("django_sendfile.sendfile")._get_sendfile
+        get_backend.clear()
+        self.addCleanup(get_backend.clear)
+        with override_settings(SENDFILE_ROOT=os.path.dirname(self.path)):
+            response, content = self._get()
+            self.assertEqual(
+                response["X-Accel-Redirect"], "/media/sendfile/document.pdf"
+            )
+            self.assertEqual(response["ETag"], '"59682f00-64"')
+            self.assertEqual(content, b"")
+
+            response, _content = self._get(HTTP_IF_NONE_MATCH='"59682f00-64"')
+            self.assertEqual(response.status_code, 304)
+
+
+@override_settings(MEDIA_SIGNATURE_WINDOW=3600, MEDIA_SIGNATURE_MAX_AGE=7200)
+class MediaSignatureTest(MediaRootMixin, TestCase):
+    """Test the time-windowed signatures of private media urls"""
+
+    originals = ("photos/0000.jpg",)
+
+    def setUp(self):
+        super().setUp()
+        # The start of a window
+        self.time = 1500001200
+
+        time_patch = mock.patch(
+            "utils.media.signatures.time.time", side_effect=lambda: self.time
+        )
+        time_patch.start()
+        self.addCleanup(time_patch.stop)
+
+    def test_url_is_stable_within_window(self):
+        url = get_media_url("photos/0000.jpg")
+        self.assertRegex(
+            url, r"^/media/private/photos/0000.jpg\?sig=[0-9a-z]+\.[\w-]{22}$"
+        )
+        self.time += 1000
+        self.assertEqual(get_media_url("photos/0000.jpg"), url)
+        self.time += 3600
+        self.assertNotEqual(get_media_url("photos/0000.jpg"), url)
+        self.assertNotEqual(
+            get_media_url("photos/0000.jpg", attachment=True),
+            get_media_url("photos/0000.jpg"),
+        )
+
+    def test_serve(self):
+        url = get_media_url("photos/0000.jpg", attachment=True)
+        response = Client().get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("attachment", response["Content-Disposition"])
+        response.close()
+
+        response = Client().get(get_media_url("photos/0000.jpg"))
+        self.assertNotIn("attachment", response["Content-Disposition"])
+        response.close()
+
+    def test_expired(self):
+        url = get_media_url("photos/0000.jpg")
+        self.time += 3 * 3600 - 1
+        response = Client().get(url)
+        self.assertEqual(response.status_code, 200)
+        response.close()
+
+        self.time += 1
+        self.assertEqual(Client().get(url).status_code, 403)
+
+    def test_tampered(self):
+        url = get_media_url("photos/0000.jpg")
+        path, sig = url.split("?sig=")
+        client = Client()
+        self.assertEqual(client.get(path).status_code, 403)
+        self.assertEqual(
+            client.get(path.replace("0000", "0001") + "?sig=" + sig).status_code, 403
+        )
+        self.assertEqual(client.get(path + "?sig=" + sig[:-1]).status_code, 403)
+        self.assertEqual(
+            client.get(path + "?sig=zzzz" + sig[sig.index(".") :]).status_code, 403
+        )
+
+    def test_thumbnail(self):
+        url = get_thumbnail_url("photos/0000.jpg", "150x150")
+        self.assertIn("generate-thumbnail", url)
+        response = Client().get(url)
+        self.assertEqual(response.status_code, 301)
+
+        # The thumbnail is served with the same signature
+        self.assertEqual(
+            response["Location"], get_thumbnail_url("photos/0000.jpg", "150x150")
+        )
+        response = Client().get(response["Location"])
+        self.assertEqual(response.status_code, 200)
+        # Browsers keep the thumbnail until its url changes
+        self.assertIn(
+            f"max-age={settings.MEDIA_SIGNATURE_WINDOW}", response["Cache-Control"]
+        )
+        self.assertNotIn("immutable", response["Cache-Control"])
+        response.close()
+
+        # The signature of one thumbnail is not valid for another
+        url = get_thumbnail_url("photos/0000.jpg", "300x300")
+        self.assertEqual(
+            Client().get(url.replace("300x300", "150x150")).status_code, 403
+        )
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command("benchmarkmediaurls", "--count", "10", "--repeat", "2", stdout=out)
+        self.assertIn("Created the urls of 10 files", out.getvalue())
+        self.assertIn("time-windowed, cached", out.getvalue())
+
+
+class DeduplicatedStorageTest(TestCase):
+    """Test storing the content of equal files only once"""
+
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.location)
+        self.storage = DeduplicatedStorage(location=self.location)
+
+    def _objects(self):
+        objects_dir = os.path.join(self.location, "objects")
+        return [
+            os.path.join(root, filename)
+            for root, _dirs, files in os.walk(objects_dir)
+            if root != objects_dir
+            for filename in files
+        ]
+
+    def test_equal_files_share_content(self):
+        first = self.storage.save("public/partners/logo.png", ContentFile(b"logo"))
+        second = self.storage.save("documents/logo.png", ContentFile(b"logo"))
+        other = self.storage.save("documents/other.png", ContentFile(b"other"))
+        self.assertEqual(first, "public/partners/logo.png")
+        self.assertEqual(second, "documents/logo.png")
+
+        self.assertTrue(
+            os.path.samefile(self.storage.path(first), self.storage.path(second))
+        )
+        self.assertFalse(
+            os.path.samefile(self.storage.path(first), self.storage.path(other))
+        )
+        self.assertEqual(len(self._objects()), 2)
+        self.assertEqual(os.stat(self.storage.path(first)).st_nlink, 3)
+        # Only the objects are left in the objects directory
+        self.assertEqual(len(os.listdir(os.path.join(self.location, "objects"))), 2)
+
+    def test_existing_name(self):
+        first = self.storage.save("documents/logo.png", ContentFile(b"logo"))
+        second = self.storage.save("documents/logo.png", ContentFile(b"other"))
+        self.assertNotEqual(first, second)
+        with self.storage.open(first) as file:
+            self.assertEqual(file.read(), b"logo")
+        with self.storage.open(second) as file:
+            self.assertEqual(file.read(), b"other")
+
+    def test_remove_unused_objects(self):
+        first = self.storage.save("documents/first.pdf", ContentFile(b"pdf"))
+        second = self.storage.save("documents/second.pdf", ContentFile(b"pdf"))
+
+        self.storage.delete(first)
+        self.assertEqual(remove_unused_objects(self.location), (0, 0))
+        with self.storage.open(second) as file:
+            self.assertEqual(file.read(), b"pdf")
+
+        self.storage.delete(second)
+        self.assertEqual(remove_unused_objects(self.location, dry_run=True), (1, 3))
+        self.assertEqual(len(self._objects()), 1)
+        self.assertEqual(remove_unused_objects(self.location), (1, 3))
+        self.assertEqual(self._objects(), [])
+
+        # The content is stored again after it was removed
+        third = self.storage.save("documents/third.pdf", ContentFile(b"pdf"))
+        self.assertEqual(os.stat(self.storage.path(third)).st_nlink, 2)
+
+    def test_command(self):
+        self.storage.save("documents/first.pdf", ContentFile(b"pdf"))
+        self.storage.save("documents/second.pdf", ContentFile(b"pdf"))
+        out = StringIO()
+        with mock.patch(
+            "utils.management.commands.removeunusedmedia.default_storage", self.storage,
+        ):
+            call_command("removeunusedmedia", "--dry-run", stdout=out)
+        self.assertIn("0 unused objects would be removed", out.getvalue())
+        self.assertIn("2 files refer to 1 objects", out.getvalue())
+
+
+class CachedStatisticsTest(TestCase):
+    """Test caching statistics in the cache shared by all processes"""
+
+    def setUp(self):
+        self.computed = 0
+        statistics.clear_statistics("test")
+
+    def _compute(self):
+        self.computed += 1
+        return {"count": self.computed}
+
+    def test_cached(self):
+        get_statistics = statistics.cached_statistics("test")(self._compute)
+        self.assertEqual(get_statistics(), {"count": 1})
+        self.assertEqual(get_statistics(), {"count": 1})
+
+        statistics.clear_statistics("test")
+        self.assertEqual(get_statistics(), {"count": 2})
+
+    def test_cleared_by_other_process(self):
+        get_statistics = statistics.cached_statistics("test")(self._compute)
+        self.assertEqual(get_statistics(), {"count": 1})
+
+        # Another process has its own cache objects and local memory
+        with mock.patch.dict("django.core.cache.backends.locmem._caches", clear=True):
+            other_cache = _create_cache(settings.STATISTICS_CACHE)
+        with mock.patch(
+            "utils.statistics.caches", {settings.STATISTICS_CACHE: other_cache}
+        ):
+            statistics.clear_statistics("test")
+
+        self.assertEqual(get_statistics(), {"count": 2})